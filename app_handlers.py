@@ -1,12 +1,13 @@
 import json
 import os
-import shutil
+import hashlib
 import bpy
 from bpy.app.handlers import persistent
 from .system import get_addon_path
 from .preferences import get_prefs
-from .categories import load_categories
-from .utils import dedupe
+from .categories import load_category_tree, append_categories
+from .catalog import get_catalog, LIBRARY_DEFAULT
+from .usage import preload_quick_bar_previews
 
 
 def mt_am_initialise_on_activation(dummy):
@@ -32,76 +33,118 @@ def mt_am_initialise_on_activation(dummy):
         "data"
     )
 
-    # Write the absolute filepath to the default assets included with the asset manager
-    # to our asset description file
     asset_types = ['objects', 'collections', 'materials']
-    set_asset_desc_filepaths(prefs.default_assets_path, asset_types)
-
-    # Create user asset and categories files if none exist and update existing one with
-    # new bundled assets if they do.
-    asset_types.append('categories')
 
     # check data directory exists
     if not os.path.exists(user_data_path):
         os.makedirs(user_data_path)
 
+    # Only merge bundled data that has changed since we last merged it into the user data.
+    # The stamps are recorded in the user catalog so a new catalog always gets a full merge
+    catalog = get_catalog()
+    stamps = json.loads(catalog.get_meta('bundled_stamps', '{}'))
+    old_stamps = dict(stamps)
+    changed = get_changed_bundled_files(
+        default_data_path,
+        [name + '.json' for name in asset_types + ['categories']],
+        stamps)
+
+    # Add new bundled assets to the user catalog. Assets already in the catalog are kept
     for name in asset_types:
         filename = name + '.json'
-        # if user asset file doesn't exist create it
-        if not os.path.exists(os.path.join(user_data_path, filename)):
-            shutil.copy2(os.path.join(default_data_path, filename), user_data_path)
-        # else update existing asset file with new bundled assets
-        else:
-            # load asset descs from user file
-            with open(os.path.join(user_data_path, filename)) as json_file:
+        if filename in changed:
+            with open(os.path.join(default_data_path, filename)) as json_file:
                 descs = json.load(json_file)
-            # append the asset descs from asset manager file
+
+            # Paths to the default assets included with the asset manager are resolved
+            # from the add-on directory when they are accessed
+            set_asset_desc_filepaths(descs)
+            catalog.insert_many(name, descs, replace=False)
+
+    # Add new bundled categories to the user categories. Categories already
+    # in the user categories are kept
+    with catalog.lock():
+        filename = 'categories.json'
+        categories = load_category_tree()
+        if filename in changed or not len(categories):
             with open(os.path.join(default_data_path, filename)) as json_file:
-                descs.extend(json.load(json_file))
-            # deduplicate
-            descs = list(dedupe(descs, key=lambda d: d['Slug']))
-            # write data file
-            with open(os.path.join(user_data_path, filename), "w") as write_file:
-                json.dump(descs, write_file, indent=4)
+                added = categories.merge(json.load(json_file))
+            if added:
+                append_categories(categories, added)
+
+    stamps.update(changed)
+    if stamps != old_stamps:
+        catalog.set_meta('bundled_stamps', json.dumps(stamps))
+
+    reset_asset_descriptions(props, asset_types)
 
-    load_asset_descriptions(props, asset_types)
 
 @persistent
 def mt_am_initialise_on_load(dummy):
     props = bpy.context.scene.mt_am_props
     create_properties()
     asset_types = ['objects', 'collections', 'materials']
-    load_asset_descriptions(props, asset_types)
+    reset_asset_descriptions(props, asset_types)
 
-def set_asset_desc_filepaths(assets_path, asset_types):
-    """Stores the path to the associated asset type in asset description .json file
+def set_asset_desc_filepaths(asset_descs):
+    """Set the passed in asset descriptions to resolve their paths from the bundled assets folder.
 
     Args:
-        assets_path (str): path to assets folder
-        asset_types (str): type of asset
+        asset_descs (list[dict]): asset descriptions
     """
-    for asset_type in asset_types:
-        json_file = os.path.join(
-            assets_path,
-            "data",
-            asset_type + ".json")
-
-        if os.path.exists(json_file):
-            with open(json_file) as read_file:
-                assets = json.load(read_file)
-
-            for asset in assets:
-                asset["FilePath"] = os.path.join(
-                    assets_path,
-                    asset_type,
-                    asset["FileName"])
-                asset["PreviewImagePath"] = os.path.join(
-                    assets_path,
-                    asset_type,
-                    asset["PreviewImageName"])
-
-            with open(json_file, "w") as write_file:
-                json.dump(assets, write_file, indent=4)
+    for asset in asset_descs:
+        asset.pop("FilePath", None)
+        asset.pop("PreviewImagePath", None)
+        asset["Library"] = LIBRARY_DEFAULT
+
+
+def get_changed_bundled_files(default_data_path, filenames, stamps):
+    """Return the bundled data files that have changed since they were last merged.
+
+    A file whose path, modification time and size match its stamp costs a single
+    stat call. The file is only hashed if these differ, so touching a file without
+    changing its contents does not trigger a merge.
+
+    Stamps of files whose contents are unchanged are refreshed in place.
+
+    Args:
+        default_data_path (str): path to bundled data folder
+        filenames (list[str]): data file names
+        stamps (dict{filename: dict{Path, MTime, Size, Hash}}): stamps from last merge
+
+    Returns:
+        dict{filename: dict{Path, MTime, Size, Hash}}: new stamps of changed files
+    """
+    changed = {}
+    for filename in filenames:
+        path = os.path.join(default_data_path, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+
+        stamp = stamps.get(filename, {})
+        if stamp.get('Path') == path \
+                and stamp.get('MTime') == stat.st_mtime \
+                and stamp.get('Size') == stat.st_size:
+            continue
+
+        with open(path, 'rb') as read_file:
+            file_hash = hashlib.sha1(read_file.read()).hexdigest()
+
+        new_stamp = {
+            'Path': path,
+            'MTime': stat.st_mtime,
+            'Size': stat.st_size,
+            'Hash': file_hash}
+
+        if stamp.get('Path') == path and stamp.get('Hash') == file_hash:
+            # contents are unchanged so just record the new stat values
+            stamps[filename] = new_stamp
+            continue
+
+        changed[filename] = new_stamp
+    return changed
 
 
 def create_properties():
@@ -117,9 +160,13 @@ def create_properties():
     bar_props['dragged_asset'] = None
     bar_props['missing_preview_image'] = load_missing_preview_image()
 
-    categories = load_categories()
+    categories = load_category_tree()
     props.categories = categories  # all categories
-    props.child_cats = categories  # child categories of active category
+    props.child_cats = categories.children('')  # child categories of active category
+
+    # load the previews of the Recent and Frequent assets once Blender has finished starting up
+    if not bpy.app.timers.is_registered(preload_quick_bar_previews):
+        bpy.app.timers.register(preload_quick_bar_previews, first_interval=1.0)
 
 
 def load_missing_preview_image():
@@ -135,26 +182,15 @@ def load_missing_preview_image():
     return None
 
 
-def load_asset_descriptions(props, asset_types):
-    """Load asset descriptions from .json file.
+def reset_asset_descriptions(props, asset_types):
+    """Clear the in memory asset descriptions so they are reloaded from the catalog when next accessed.
 
     Args:
         props (mt_am_props): asset manager props
         asset_types (list[str]): list of asset types
     """
-    prefs = get_prefs()
-    descs = []
     for a_type in asset_types:
-        json_path = os.path.join(
-            prefs.user_assets_path,
-            "data",
-            a_type + ".json")
-
-        if os.path.exists(json_path):
-            with open(json_path) as json_file:
-                descs = (json.load(json_file))
-
-        setattr(props, a_type, descs)
+        setattr(props, a_type, None)
 
 
 bpy.app.handlers.depsgraph_update_pre.append(mt_am_initialise_on_activation)
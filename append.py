@@ -1,6 +1,39 @@
 import os
 import bpy
-from .utils import material_is_unique
+from .utils import material_is_unique, get_file_hash
+
+# custom properties that link a spawned datablock back to its library asset
+SLUG_PROP = 'mt_am_slug'
+TYPE_PROP = 'mt_am_type'
+FILE_HASH_PROP = 'mt_am_file_hash'
+
+
+def tag_datablock(datablock, asset, asset_type):
+    """Record the library asset a datablock was appended from in its custom properties.
+
+    Args:
+        datablock (bpy.types.ID): appended object, collection or material
+        asset (dict): asset description
+        asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+    """
+    datablock[SLUG_PROP] = asset['Slug']
+    datablock[TYPE_PROP] = asset_type
+    datablock[FILE_HASH_PROP] = get_file_hash(asset['FilePath']) or ""
+
+
+def get_datablock_asset(datablock):
+    """Return the library asset a datablock was appended from.
+
+    Args:
+        datablock (bpy.types.ID): object, collection or material
+
+    Returns:
+        tuple(asset_type, slug): asset, or None if the datablock wasn't appended from the library
+    """
+    slug = datablock.get(SLUG_PROP)
+    if slug is None:
+        return None
+    return datablock.get(TYPE_PROP), slug
 
 
 def append_material(context, asset, link=False):
@@ -37,8 +70,11 @@ def append_material(context, asset, link=False):
             # if not unique remove newly added material and return original material
             if not unique:
                 bpy.data.materials.remove(imported_mat)
+                if get_datablock_asset(matched_material) is None:
+                    tag_datablock(matched_material, asset, 'materials')
                 return matched_material
 
+            tag_datablock(imported_mat, asset, 'materials')
             return imported_mat
 
     return None
@@ -109,6 +145,7 @@ def append_object(context, asset, link=False):
 
             # rename object to pretty name
             obj.name = asset["Name"]
+            tag_datablock(obj, asset, 'objects')
 
             return obj
 
@@ -158,6 +195,7 @@ def append_collection(context, asset, link=False):
 
             # rename collection to pretty name
             collection.name = asset["Name"]
+            tag_datablock(collection, asset, 'collections')
 
             # we need to ensure that any other objects that have been added as a side
             # effect have a fake user set otherwise things start breaking when we resave
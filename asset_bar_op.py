@@ -4,8 +4,9 @@ from math import floor
 from bpy.types import Operator
 from bpy.props import StringProperty
 from .preferences import get_prefs
-from .categories import get_child_cats, get_parent_cat_slug, get_category, load_categories
 from .assets import get_assets_by_cat, append_preview_images
+from .search import search_assets, filter_assets
+from .usage import is_virtual_category, get_virtual_category
 from .ui_bar import MT_UI_AM_Asset_Bar
 from .ui_asset import MT_AM_UI_Asset
 from .ui_nav_arrow import MT_UI_AM_Left_Nav_Arrow, MT_UI_AM_Right_Nav_Arrow
@@ -44,7 +45,7 @@ class MT_OT_AM_Asset_Bar(Operator):
         # update categories
         self.update_categories(context)
 
-        if props.active_category:
+        if props.active_category or props.search_text.strip():
             # Check to see if we are already displaying asset bar
             # and add asset bar draw handler and modal handler if not
             if not MT_OT_AM_Asset_Bar.asset_bar:
@@ -108,15 +109,21 @@ class MT_OT_AM_Asset_Bar(Operator):
         return {'PASS_THROUGH'}
 
     def init_assets(self, context, reset_index=True):
-        """Initialise assets based on current active category.
+        """Initialise assets based on the search text or current active category.
 
         Args:
             context (bpy.context): context
             reset_index (bool, optional): WHether to reset the asset bar index to 0. Defaults to True.
         """
         props = context.scene.mt_am_props
-        # get current assets based on active category
-        current_assets = get_assets_by_cat(props.active_category["Slug"])
+        # show a page of search results while searching, otherwise the assets in the active category
+        if props.search_text.strip():
+            current_assets = search_assets(props, props.search_text, props.search_page)[0]
+        elif props.active_category:
+            current_assets = filter_assets(props, get_assets_by_cat(
+                props.active_category["Slug"], props.include_subcategories, props.asset_order))
+        else:
+            current_assets = []
 
         # make sure preview images are appended
         append_preview_images(current_assets)
@@ -124,7 +131,7 @@ class MT_OT_AM_Asset_Bar(Operator):
         # instantiate a thumbnail for each asset in current assets
         prefs = get_prefs()
         assets = []
-        for asset in current_assets:
+        for index, asset in enumerate(current_assets):
             new_asset = MT_AM_UI_Asset(
                 50,
                 50,
@@ -132,7 +139,7 @@ class MT_OT_AM_Asset_Bar(Operator):
                 prefs.asset_item_dimensions,
                 asset,
                 MT_OT_AM_Asset_Bar.asset_bar,
-                current_assets.index(asset),
+                index,
                 self)
             assets.append(new_asset)
 
@@ -164,18 +171,21 @@ class MT_OT_AM_Asset_Bar(Operator):
         am_props = context.scene.mt_am_props
         categories = am_props.categories
 
+        # the Recent and Frequent categories have no parent or children
+        if is_virtual_category(self.category_slug):
+            am_props.parent_category = ""
+            am_props.active_category = get_virtual_category(self.category_slug)
+            am_props.child_cats = []
+            return
+
         # update parent category
-        context.scene.mt_am_props.parent_category = get_parent_cat_slug(
-            categories,
-            self.category_slug)
+        context.scene.mt_am_props.parent_category = categories.parent_slug(self.category_slug)
 
         # update active_category
-        context.scene.mt_am_props.active_category = get_category(categories, self.category_slug)
+        context.scene.mt_am_props.active_category = categories.get(self.category_slug)
 
         # get child categories and update side bar
-        am_props['child_cats'] = get_child_cats(
-            categories,
-            self.category_slug)
+        am_props.child_cats = categories.children(self.category_slug)
 
     def register_asset_bar_draw_handler(self, args, context):
         """Register the draw handler for the asset bar.
@@ -227,9 +237,7 @@ class MT_OT_AM_Asset_Bar(Operator):
         props.parent_category = ""
 
         # get child categories and update side bar
-        props['child_cats'] = get_child_cats(
-            props.categories,
-            "")
+        props.child_cats = props.categories.children("")
         return {"FINISHED"}
 
     def draw_callback_asset_bar(self, op, context):
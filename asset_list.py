@@ -0,0 +1,332 @@
+"""Contains the in memory container for the asset descriptions of one asset type."""
+import os
+import heapq
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+
+def get_file_size(asset_desc):
+    """Return the size of the .blend file of an asset, or 0 if it doesn't exist."""
+    try:
+        return os.path.getsize(asset_desc['FilePath'])
+    except (OSError, KeyError):
+        return 0
+
+
+# use counts the MOST_USED order sorts by, (asset_type, slug): count. Replaced, never changed
+# in place, whenever usage.py reads new lines from the usage log
+_use_counts = {'counts': {}}
+
+
+def set_use_counts(use_counts):
+    """Set the use counts the MOST_USED order sorts by.
+
+    Kept MOST_USED orders sorted by the previous counts are dropped and sorted
+    again the next time they are listed.
+
+    Args:
+        use_counts (dict{tuple(asset_type, slug): int}): use counts. Must not be changed afterwards
+    """
+    _use_counts['counts'] = use_counts
+
+
+def get_use_count(asset_desc):
+    """Return the number of times an asset had been used when the use counts were last set."""
+    return _use_counts['counts'].get((asset_desc['Type'].lower(), asset_desc['Slug']), 0)
+
+
+# sort key of each order assets can be listed in. Assets with equal keys stay in library order
+ASSET_ORDERS = {
+    'NAME': lambda desc: desc['Name'].lower(),
+    'DATE_ADDED': lambda desc: -(desc.get('DateAdded') or 0),
+    'FILE_SIZE': lambda desc: -get_file_size(desc),
+    'MOST_USED': lambda desc: -get_use_count(desc)}
+
+
+class AssetList:
+    """Ordered asset descriptions of one asset type, indexed by slug and category.
+
+    Iterates like a list. Descriptions are held in a dict keyed by slug so they
+    can be looked up, replaced and removed without searching the library, and
+    each category keeps its own list of descriptions in library order so listing
+    or counting the assets in a category doesn't scan the whole library.
+
+    Change the descriptions through the methods here rather than by setting
+    Category directly so the indices stay in sync.
+
+    The first time a category is listed in one of the ASSET_ORDERS its
+    descriptions are sorted and kept, with their sort keys, so listing it again
+    doesn't sort. Added, edited and removed descriptions are inserted into or
+    removed from the kept orders by binary search. The MOST_USED orders are
+    dropped instead when the use counts change.
+    """
+
+    def __init__(self, asset_descs=()):
+        self._by_slug = {}
+        self._by_category = {}
+        self._sorted = {}  # category slug: {order: tuple(list[sort key], list[AssetDescription])}
+        self._use_counts = None  # use counts the kept MOST_USED orders were sorted by
+        self.extend(asset_descs)
+
+    def __iter__(self):
+        return iter(self._by_slug.values())
+
+    def __len__(self):
+        return len(self._by_slug)
+
+    def __contains__(self, slug):
+        return slug in self._by_slug
+
+    def __repr__(self):
+        return 'AssetList(%r)' % list(self._by_slug.values())
+
+    def get(self, slug, default=None):
+        """Return the asset description with the slug.
+
+        Args:
+            slug (str): asset slug
+            default (optional): value to return if there is no such asset. Defaults to None.
+
+        Returns:
+            AssetDescription: asset description
+        """
+        return self._by_slug.get(slug, default)
+
+    def slugs(self):
+        """Return the slugs of all assets in library order."""
+        return list(self._by_slug)
+
+    def in_category(self, cat_slug):
+        """Return the asset descriptions in a category.
+
+        Args:
+            cat_slug (str): category slug
+
+        Returns:
+            list[AssetDescription]: asset descriptions in library order
+        """
+        return list(self._by_category.get(cat_slug, ()))
+
+    def in_categories(self, cat_slugs):
+        """Return the asset descriptions in several categories.
+
+        Args:
+            cat_slugs (list[str]): category slugs
+
+        Returns:
+            list[AssetDescription]: asset descriptions, by category in the order given
+        """
+        by_category = self._by_category
+        return [desc for cat_slug in cat_slugs for desc in by_category.get(cat_slug, ())]
+
+    def sorted_in_categories(self, cat_slugs, order):
+        """Return the asset descriptions in several categories in one of the ASSET_ORDERS.
+
+        The kept order of each category is merged rather than sorting them all.
+
+        Args:
+            cat_slugs (list[str]): category slugs
+            order (ENUM in ASSET_ORDERS): order
+
+        Returns:
+            list[AssetDescription]: asset descriptions
+        """
+        orders = [self._get_sorted(order, cat_slug) for cat_slug in cat_slugs]
+        orders = [(keys, descs) for keys, descs in orders if descs]
+        if len(orders) == 1:
+            return list(orders[0][1])
+        merged = heapq.merge(*[zip(keys, descs) for keys, descs in orders], key=itemgetter(0))
+        return [desc for key, desc in merged]
+
+    def _check_use_counts(self):
+        """Drop the kept MOST_USED orders if the use counts have been set since they were sorted."""
+        use_counts = _use_counts['counts']
+        if self._use_counts is not use_counts:
+            for cat_orders in self._sorted.values():
+                cat_orders.pop('MOST_USED', None)
+            self._use_counts = use_counts
+
+    def _get_sorted(self, order, cat_slug):
+        """Return the kept order of a category, sorting it if it hasn't been listed in this order yet."""
+        self._check_use_counts()
+        cat_orders = self._sorted.setdefault(cat_slug, {})
+        sort = cat_orders.get(order)
+        if sort is None:
+            key_func = ASSET_ORDERS[order]
+            items = sorted(
+                ((key_func(desc), desc) for desc in self._by_category.get(cat_slug, ())),
+                key=itemgetter(0))
+            sort = cat_orders[order] = ([key for key, desc in items], [desc for key, desc in items])
+        return sort
+
+    def _sort_insert(self, asset_desc):
+        """Insert a description into the kept orders of its category."""
+        self._check_use_counts()
+        for order, (keys, descs) in self._sorted.get(asset_desc['Category'], {}).items():
+            key = ASSET_ORDERS[order](asset_desc)
+            # after equal keys, as the description is the last in library order
+            i = bisect_right(keys, key)
+            keys.insert(i, key)
+            descs.insert(i, asset_desc)
+
+    def _sort_remove(self, asset_desc):
+        """Remove a description from the kept orders of its category.
+
+        Call before changing any fields of the description so its keys can be found.
+        """
+        self._check_use_counts()
+        for order, (keys, descs) in self._sorted.get(asset_desc['Category'], {}).items():
+            key = ASSET_ORDERS[order](asset_desc)
+            i = bisect_left(keys, key)
+            end = bisect_right(keys, key, i)
+            while i < end and descs[i] is not asset_desc:
+                i += 1
+            if i == end:
+                # the key has changed since it was sorted, e.g. the file was saved again
+                i = next((j for j, desc in enumerate(descs) if desc is asset_desc), None)
+            if i is not None:
+                del keys[i]
+                del descs[i]
+
+    def count(self, cat_slug):
+        """Return the number of assets in a category.
+
+        Args:
+            cat_slug (str): category slug
+
+        Returns:
+            int: number of assets
+        """
+        return len(self._by_category.get(cat_slug, ()))
+
+    def append(self, asset_desc):
+        """Add an asset description to the end of the list and its category.
+
+        An existing description with the same slug is replaced.
+        """
+        if asset_desc['Slug'] in self._by_slug:
+            self.replace(asset_desc)
+            return
+        self._by_slug[asset_desc['Slug']] = asset_desc
+        self._by_category.setdefault(asset_desc['Category'], []).append(asset_desc)
+        self._sort_insert(asset_desc)
+
+    def extend(self, asset_descs):
+        """Add asset descriptions to the end of the list and their categories."""
+        for desc in asset_descs:
+            self.append(desc)
+
+    def reset(self, asset_descs):
+        """Replace all asset descriptions.
+
+        Args:
+            asset_descs (list[AssetDescription]): asset descriptions
+        """
+        self._by_slug = {}
+        self._by_category = {}
+        self._sorted = {}
+        self.extend(asset_descs)
+
+    def replace(self, asset_desc):
+        """Replace the asset description with the same slug, keeping its position.
+
+        Args:
+            asset_desc (AssetDescription): new asset description
+        """
+        old_desc = self._by_slug[asset_desc['Slug']]
+        self._sort_remove(old_desc)
+        self._by_slug[asset_desc['Slug']] = asset_desc
+        if old_desc['Category'] == asset_desc['Category']:
+            cat_descs = self._by_category[old_desc['Category']]
+            for i, desc in enumerate(cat_descs):
+                if desc is old_desc:
+                    cat_descs[i] = asset_desc
+                    break
+        else:
+            self._drop(old_desc['Category'], {old_desc['Slug']})
+            self._by_category.setdefault(asset_desc['Category'], []).append(asset_desc)
+        self._sort_insert(asset_desc)
+
+    def update(self, slug, **fields):
+        """Set fields of an asset description in place.
+
+        Args:
+            slug (str): asset slug
+            **fields: fields to set. Slug can't be changed.
+
+        Returns:
+            AssetDescription: the updated asset description
+        """
+        desc = self._by_slug[slug]
+        cat_slug = fields.pop('Category', desc['Category'])
+        fields.pop('Slug', None)
+        self._sort_remove(desc)
+        for key, value in fields.items():
+            desc[key] = value
+        self._sort_insert(desc)
+        if cat_slug != desc['Category']:
+            self.move_many([slug], cat_slug)
+        return desc
+
+    def remove_many(self, slugs):
+        """Remove asset descriptions.
+
+        Takes time proportional to the number of assets removed and the size of
+        the categories they were in.
+
+        Args:
+            slugs (iterable[str]): slugs of assets to remove
+
+        Returns:
+            list[AssetDescription]: removed asset descriptions
+        """
+        removed = []
+        by_category = {}
+        for slug in slugs:
+            desc = self._by_slug.pop(slug, None)
+            if desc is not None:
+                self._sort_remove(desc)
+                removed.append(desc)
+                by_category.setdefault(desc['Category'], set()).add(slug)
+
+        for cat_slug, cat_slugs in by_category.items():
+            self._drop(cat_slug, cat_slugs)
+        return removed
+
+    def move_many(self, slugs, cat_slug):
+        """Move asset descriptions to another category.
+
+        Args:
+            slugs (iterable[str]): slugs of assets to move
+            cat_slug (str): slug of category to move them to
+
+        Returns:
+            list[AssetDescription]: moved asset descriptions
+        """
+        moved = []
+        by_category = {}
+        for slug in slugs:
+            desc = self._by_slug.get(slug)
+            if desc is not None and desc['Category'] != cat_slug:
+                self._sort_remove(desc)
+                moved.append(desc)
+                by_category.setdefault(desc['Category'], set()).add(slug)
+
+        for old_cat_slug, cat_slugs in by_category.items():
+            self._drop(old_cat_slug, cat_slugs)
+
+        if moved:
+            target = self._by_category.setdefault(cat_slug, [])
+            for desc in moved:
+                desc['Category'] = cat_slug
+                target.append(desc)
+                self._sort_insert(desc)
+        return moved
+
+    def _drop(self, cat_slug, slugs):
+        """Remove the descriptions with the slugs from the index of a category."""
+        kept = [desc for desc in self._by_category.get(cat_slug, ()) if desc['Slug'] not in slugs]
+        if kept:
+            self._by_category[cat_slug] = kept
+        else:
+            self._by_category.pop(cat_slug, None)
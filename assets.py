@@ -1,31 +1,47 @@
 import os
 import bpy
 from bpy.props import StringProperty, EnumProperty
-from .categories import get_category
+from .catalog import get_catalog
+from .usage import is_virtual_category, get_used_assets, get_usage_log
 
-def get_assets_by_cat(cat_slug):
+def get_assets_by_cat(cat_slug, recursive=False, order='LIBRARY'):
     """Return a list of asset descriptions belonging to the category.
 
+    If the asset descriptions of the type the category contains haven't been
+    loaded yet and they are listed in library order we only read the category
+    from the catalog rather than loading them all.
+
+    The Recent and Frequent virtual categories are always listed most recent
+    or most used first.
+
     Args:
         cat_slug (string): category slug
+        recursive (bool, optional): include the assets in all sub categories. Defaults to False.
+        order (ENUM in {'LIBRARY'} or ASSET_ORDERS, optional): order to list assets in. Defaults to 'LIBRARY'.
 
     Returns:
         list: asset descriptions
     """
     props = bpy.context.scene.mt_am_props
 
-    category = get_category(props.categories, cat_slug)
+    if is_virtual_category(cat_slug):
+        return get_used_assets(props, cat_slug)
+
+    category = props.categories.get(cat_slug)
     assets = []
-    if "Contains" in category:
-        if category['Contains'] == 'OBJECTS':
-            assets = [obj for obj in props.objects if obj['Category'] == category['Slug']]
-            return assets
-        if category['Contains'] == 'COLLECTIONS':
-            assets = [coll for coll in props.collections if coll['Category'] == category['Slug']]
-            return assets
-        if category['Contains'] == 'MATERIALS':
-            assets = [mat for mat in props.materials if mat['Category'] == category['Slug']]
-            return assets
+    if category and "Contains" in category:
+        if category['Contains'] in ('OBJECTS', 'COLLECTIONS', 'MATERIALS'):
+            asset_type = category['Contains'].lower()
+            cat_slugs = props.categories.subtree(cat_slug) if recursive else [cat_slug]
+            if order != 'LIBRARY':
+                if order == 'MOST_USED':
+                    # read uses recorded by other instances so the counts sorted by are current
+                    get_usage_log()
+                return getattr(props, asset_type).sorted_in_categories(cat_slugs, order)
+            if not props.asset_descs_loaded(asset_type):
+                catalog = get_catalog()
+                return [desc for slug in cat_slugs for desc in catalog.load_category(asset_type, slug)]
+            return getattr(props, asset_type).in_categories(cat_slugs)
         return assets
     return assets
 
@@ -36,7 +52,12 @@ def append_preview_images(assets):
     Args:
         assets (list): asset descriptions
     """
+    # images stay loaded once appended so only stat the ones that aren't
+    loaded = set(os.path.normcase(bpy.path.abspath(image.filepath)) for image in bpy.data.images)
     for asset in assets:
         image_path = asset['PreviewImagePath']
-        if os.path.exists(image_path) and os.path.isfile(image_path):
+        if os.path.normcase(image_path) in loaded:
+            continue
+        # isfile is False for missing paths so this is one stat per asset
+        if os.path.isfile(image_path):
             bpy.data.images.load(image_path, check_existing=True)
@@ -73,13 +73,23 @@ def get_ordered_classes_to_register(modules):
 def get_register_deps_dict(modules):
     deps_dict = {}
     classes_to_register = set(iter_classes_to_register(modules))
+    classes_by_idname = {cls.bl_idname: cls for cls in classes_to_register if hasattr(cls, "bl_idname")}
     for cls in classes_to_register:
         deps_dict[cls] = set(iter_own_register_deps(cls, classes_to_register))
+        deps_dict[cls].update(iter_own_deps_from_parent_id(cls, classes_by_idname))
     return deps_dict
 
 def iter_own_register_deps(cls, own_classes):
     yield from (dep for dep in iter_register_deps(cls) if dep in own_classes)
 
+def iter_own_deps_from_parent_id(cls, classes_by_idname):
+    if bpy.types.Panel in cls.__bases__:
+        parent_idname = getattr(cls, "bl_parent_id", None)
+        if parent_idname is not None:
+            parent_cls = classes_by_idname.get(parent_idname)
+            if parent_cls is not None:
+                yield parent_cls
+
 def iter_register_deps(cls):
     for value in typing.get_type_hints(cls, {}, {}).values():
         dependency = get_dependency_from_annotation(value)
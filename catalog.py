@@ -0,0 +1,1323 @@
+"""Contains the catalog backend that stores MakeTile asset descriptions on disk.
+
+Asset descriptions used to live in one .json file per asset type which had to be
+parsed and rewritten in full every time a single asset was added, edited or removed.
+The catalog stores them in a local SQLite database instead, with indexed Slug,
+Category and Type columns so that single records can be inserted, updated and
+deleted without touching the rest of the library.
+
+Alternatively the catalog can be stored as one .json shard per category plus a
+small manifest, so that browsing or changing a category only reads or rewrites
+the shard for that category.
+
+Several Blender instances can share a catalog. Every change is made while holding
+an advisory lock file in the data folder and only rewrites the records it changes,
+so changes made by other instances in the meantime are kept.
+"""
+import os
+import sys
+import json
+import sqlite3
+import time
+import uuid
+import threading
+from copy import deepcopy
+from collections import OrderedDict
+from bpy.types import Operator
+from bpy.props import StringProperty
+from .preferences import get_prefs
+
+ASSET_TYPES = ['objects', 'collections', 'materials']
+
+# Version 2 stores asset file paths relative to the library the asset belongs to.
+# Version 3 records the catalog revision each asset was last changed in.
+SCHEMA_VERSION = 3
+
+# How many revisions deleted assets are remembered for by the SQLite catalog
+TOMBSTONE_REVISIONS = 1000
+
+# Seconds to wait for another Blender instance to release the catalog lock
+LOCK_TIMEOUT = 30.0
+
+# Seconds after which a lock file is assumed to have been left by a crashed instance
+LOCK_STALE = 120.0
+
+# Seconds between touches of the lock file while it is held, so it never looks stale
+LOCK_REFRESH = LOCK_STALE / 4
+
+# Libraries an asset can belong to. USER is the user assets path and DEFAULT
+# the assets bundled with the add-on.
+LIBRARY_USER = 'USER'
+LIBRARY_DEFAULT = 'DEFAULT'
+
+# path key, file name key pairs
+PATH_KEYS = (
+    ('FilePath', 'FileName'),
+    ('PreviewImagePath', 'PreviewImageName'))
+
+# Root folder of each library. Updated by get_catalog()
+library_roots = {}
+
+_catalogs = {}
+
+# Callables called with (asset_type, asset count, seconds) each time an asset type is
+# loaded from the catalog by load_asset_descs()
+load_hooks = []
+
+
+class AssetDescription:
+    """MakeTile asset description as loaded from the catalog.
+
+    Descriptions are stored in __slots__ rather than a dict and the fields that
+    are shared by many assets (Category, Type, Library, Author, License and Tags)
+    are interned so each distinct value is only held in memory once. Keys that
+    aren't known fields, such as RootObject, are kept in a small extra dict.
+    Item access works like a dict so descriptions can be used wherever a dict
+    description is expected.
+
+    The catalog only stores FilePath and PreviewImagePath if they are not in the
+    asset type folder of the library the asset belongs to, and then only relative
+    to the library root. Both are resolved to absolute paths when they are accessed
+    so moving a library doesn't require the catalog to be rewritten.
+    """
+
+    FIELDS = (
+        'Name', 'Slug', 'Category', 'Type', 'Library', 'FileName', 'FilePath',
+        'PreviewImageName', 'PreviewImagePath', 'Description', 'URI', 'Author',
+        'License', 'Tags')
+
+    INTERNED_FIELDS = frozenset(('Category', 'Type', 'Library', 'Author', 'License'))
+
+    __slots__ = FIELDS + ('_extra',)
+
+    def __init__(self, asset_desc=None, **kwargs):
+        self._extra = None
+        if isinstance(asset_desc, AssetDescription):
+            asset_desc = asset_desc.to_dict()
+        if asset_desc:
+            self.update(asset_desc)
+        if kwargs:
+            self.update(kwargs)
+
+    def __getitem__(self, key):
+        if key in ('FilePath', 'PreviewImagePath'):
+            return self.resolve_path(key)
+        if key in self.FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            if key == 'Tags':
+                value = tuple(sys.intern(tag) for tag in value)
+            elif key in self.INTERNED_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        try:
+            if key in self.FIELDS:
+                delattr(self, key)
+            else:
+                del self._extra[key]
+        except (AttributeError, KeyError, TypeError):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self.FIELDS:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, AssetDescription):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'AssetDescription(%r)' % self.to_dict()
+
+    def __deepcopy__(self, memo):
+        return AssetDescription(deepcopy(self.to_dict(), memo))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        """Return the keys that are set on the description."""
+        keys = [key for key in self.FIELDS if hasattr(self, key)]
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def update(self, other):
+        """Set keys from a dict or another asset description."""
+        for key in other.keys():
+            self[key] = other[key]
+
+    def copy(self):
+        """Return a copy of the description."""
+        return AssetDescription(self)
+
+    def to_dict(self):
+        """Return the description as a dict with paths as they are stored in the catalog."""
+        desc = {key: getattr(self, key) for key in self.FIELDS if hasattr(self, key)}
+        if 'Tags' in desc:
+            desc['Tags'] = list(desc['Tags'])
+        if self._extra:
+            desc.update(self._extra)
+        return desc
+
+    def resolve_path(self, key):
+        """Return the absolute path stored under key.
+
+        Args:
+            key (ENUM in {'FilePath', 'PreviewImagePath'}): path key
+
+        Returns:
+            str: absolute path
+        """
+        root = library_roots.get(getattr(self, 'Library', LIBRARY_USER), '')
+        path = getattr(self, key, None)
+        if path is None:
+            name_key = dict(PATH_KEYS)[key]
+            path = os.path.join(self['Type'].lower(), self[name_key])
+        return os.path.join(root, path)
+
+
+class CatalogChanges:
+    """Changes to the asset descriptions of one asset type since a catalog revision.
+
+    Attributes:
+        upserted (list[AssetDescription]): descriptions that were added or changed
+        deleted (list[tuple(slug, category)]): descriptions that were removed from a category
+        replaced_categories (set[str]): categories whose descriptions were all
+            replaced. Descriptions in these categories that aren't in upserted were removed.
+    """
+
+    __slots__ = ('upserted', 'deleted', 'replaced_categories')
+
+    def __init__(self):
+        self.upserted = []
+        self.deleted = []
+        self.replaced_categories = set()
+
+    def touched_categories(self):
+        """Return the slugs of all categories whose contents have changed."""
+        categories = set(self.replaced_categories)
+        categories.update(desc['Category'] for desc in self.upserted)
+        categories.update(cat_slug for slug, cat_slug in self.deleted)
+        return categories
+
+    def removed_slugs(self, categories):
+        """Return the slugs of the descriptions that were removed.
+
+        Args:
+            categories (dict{slug: category}): category of each description known
+                before the changes, to find those removed from replaced categories
+
+        Returns:
+            set[str]: slugs
+        """
+        upserted = set(desc['Slug'] for desc in self.upserted)
+        removed = set(slug for slug, cat_slug in self.deleted if slug not in upserted)
+        if self.replaced_categories:
+            removed.update(
+                slug for slug, cat_slug in categories.items()
+                if cat_slug in self.replaced_categories and slug not in upserted)
+        return removed
+
+
+def compact_asset_desc(asset_desc, roots):
+    """Return a copy of the asset description suitable for storing in the catalog.
+
+    Absolute FilePath and PreviewImagePath values are replaced with the library the
+    asset belongs to and dropped if they point to the asset type folder of that
+    library, or stored relative to the library root if they don't.
+
+    Args:
+        asset_desc (dict): asset description
+        roots (dict{library: str}): root folder of each library
+
+    Returns:
+        dict: asset description
+    """
+    if isinstance(asset_desc, AssetDescription):
+        desc = asset_desc.to_dict()
+    else:
+        desc = dict(asset_desc)
+    for path_key, name_key in PATH_KEYS:
+        if path_key not in desc:
+            continue
+        path = os.path.normpath(desc.pop(path_key))
+        for library, root in roots.items():
+            root = os.path.normpath(root)
+            if os.path.normcase(path).startswith(os.path.normcase(root) + os.sep):
+                desc['Library'] = library
+                path = os.path.relpath(path, root)
+                break
+        desc.setdefault(name_key, os.path.basename(path))
+        if path != os.path.join(desc['Type'].lower(), desc[name_key]):
+            desc[path_key] = path
+    return desc
+
+
+class CatalogLockTimeout(Exception):
+    """Raised when a lock can't be acquired within its timeout."""
+
+
+class CatalogLock:
+    """Advisory lock shared by all Blender instances using a catalog.
+
+    The lock is a file created exclusively in the catalog data folder, which works
+    the same way on every platform. The lock is re-entrant within a process so
+    catalog methods can be called while it is held.
+
+    The file holds a token unique to each acquisition. While the lock is held a
+    background thread touches the file, so only a lock whose holder has crashed
+    goes without changing for LOCK_STALE seconds and is broken by a waiting
+    instance. The file is only removed on release if it still holds our token.
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._depth = 0
+        self._token = None
+        self._released = None
+
+    def __enter__(self):
+        if self._depth == 0:
+            self._acquire()
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        if self._depth == 0:
+            self._released.set()
+            try:
+                # another instance may have broken the lock if we were stalled
+                if self._read_owner() == self._token:
+                    os.remove(self.path)
+            except OSError:
+                pass
+            self._token = None
+
+    def _read_owner(self):
+        """Return the token in the lock file."""
+        with open(self.path) as read_file:
+            return read_file.read()
+
+    def _refresh(self, token, released):
+        """Touch the lock file until it is released, so waiting instances don't think it is stale."""
+        while not released.wait(LOCK_REFRESH):
+            try:
+                if self._read_owner() == token:
+                    os.utime(self.path)
+            except OSError:
+                pass
+
+    def _break_stale(self):
+        """Remove the lock file if it has been left by a crashed instance.
+
+        Waiting instances take turns breaking the lock by creating a second file
+        exclusively, and check the lock still holds the token they found stale,
+        so one can't remove a lock another has just taken.
+        """
+        try:
+            if time.time() - os.path.getmtime(self.path) <= LOCK_STALE:
+                return
+            owner = self._read_owner()
+        except OSError:
+            # released in the meantime
+            return
+
+        break_path = self.path + '.break'
+        try:
+            handle = os.open(break_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                # left by an instance that crashed while breaking the lock
+                if time.time() - os.path.getmtime(break_path) > self.timeout:
+                    os.remove(break_path)
+            except OSError:
+                pass
+            return
+        os.close(handle)
+        try:
+            if self._read_owner() == owner and time.time() - os.path.getmtime(self.path) > LOCK_STALE:
+                os.remove(self.path)
+        except OSError:
+            pass
+        finally:
+            try:
+                os.remove(break_path)
+            except OSError:
+                pass
+
+    def _acquire(self):
+        """Create the lock file, waiting while another instance holds it."""
+        folder = os.path.dirname(self.path)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        start = time.monotonic()
+        while True:
+            try:
+                handle = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                self._break_stale()
+                if time.monotonic() - start > self.timeout:
+                    raise CatalogLockTimeout(
+                        "Locked by another Blender instance: " + self.path)
+                time.sleep(0.05)
+            else:
+                self._token = "%d %s" % (os.getpid(), uuid.uuid4().hex)
+                os.write(handle, self._token.encode())
+                os.close(handle)
+                self._released = threading.Event()
+                threading.Thread(
+                    target=self._refresh, args=(self._token, self._released), daemon=True).start()
+                return
+
+
+class Catalog:
+    """Base class for asset catalogs.
+
+    Asset types are passed as in {'objects', 'collections', 'materials'}. Asset
+    descriptions are returned as AssetDescription and compacted with
+    compact_asset_desc() before they are stored.
+    """
+
+    def __init__(self, data_path, roots):
+        self.data_path = data_path
+        self.roots = roots
+        # the latest revision whose changes are reflected in memory
+        self.seen_revision = 0
+        self._stamp = None
+        self._lock = CatalogLock(os.path.join(data_path, 'catalog.lock'))
+
+    def lock(self):
+        """Return the advisory lock held while the catalog is changed.
+
+        Hold the lock around reading the catalog revision and making a change that
+        depends on it, e.g. choosing a unique slug and inserting the asset.
+
+        Returns:
+            CatalogLock: context manager
+        """
+        return self._lock
+
+    def exists(self):
+        """Return whether the catalog has been created on disk."""
+        raise NotImplementedError
+
+    def _stamp_path(self):
+        """Return the path of the file that changes whenever the catalog changes."""
+        raise NotImplementedError
+
+    def poll(self):
+        """Return whether the catalog has changed on disk since it was last polled.
+
+        This only stats the catalog file so is cheap enough to call from a timer.
+        """
+        try:
+            stat = os.stat(self._stamp_path())
+            stamp = (stat.st_mtime, stat.st_size)
+        except OSError:
+            stamp = None
+        changed = stamp != self._stamp
+        self._stamp = stamp
+        return changed
+
+    def revision(self):
+        """Return the current revision of the catalog. The revision increases on every change."""
+        raise NotImplementedError
+
+    def changes_since(self, revision):
+        """Return the changes made to the catalog since revision.
+
+        Args:
+            revision (int): catalog revision
+
+        Returns:
+            dict{asset_type: CatalogChanges}: changes per asset type, or None if the
+                changes are no longer known and everything should be reloaded.
+        """
+        raise NotImplementedError
+
+    def _saw_revision(self, revision):
+        """Record that a change we made ourselves is reflected in memory.
+
+        If other processes have changed the catalog since seen_revision we leave it
+        so their changes are picked up by changes_since().
+        """
+        if self.seen_revision == revision - 1:
+            self.seen_revision = revision
+
+    def get_meta(self, key, default=None):
+        """Return a value from the catalog meta data.
+
+        Args:
+            key (str): key
+            default (str, optional): value to return if key is not set. Defaults to None.
+
+        Returns:
+            str: value
+        """
+        raise NotImplementedError
+
+    def set_meta(self, key, value):
+        """Set a value in the catalog meta data.
+
+        Args:
+            key (str): key
+            value (str): value
+        """
+        raise NotImplementedError
+
+    def load(self, asset_type):
+        """Return all asset descriptions of asset_type.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+
+        Returns:
+            list[AssetDescription]: asset descriptions
+        """
+        raise NotImplementedError
+
+    def load_category(self, asset_type, cat_slug):
+        """Return all asset descriptions of asset_type that belong to the category.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            cat_slug (str): category slug
+
+        Returns:
+            list[AssetDescription]: asset descriptions
+        """
+        raise NotImplementedError
+
+    def get_many(self, asset_type, slugs):
+        """Return the asset descriptions of asset_type with the slugs, without reading the rest.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            slugs (iterable[str]): asset slugs
+
+        Returns:
+            dict{slug: AssetDescription}: asset descriptions that were found
+        """
+        raise NotImplementedError
+
+    def insert(self, asset_type, asset_desc):
+        """Insert an asset description, replacing any existing one with the same slug.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            asset_desc (dict): asset description
+        """
+        self.insert_many(asset_type, [asset_desc])
+
+    def insert_many(self, asset_type, asset_descs, replace=True):
+        """Insert asset descriptions.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            asset_descs (list[dict]): asset descriptions
+            replace (bool, optional): Replace existing descriptions with the same slug.
+                If False existing descriptions are kept. Defaults to True.
+        """
+        raise NotImplementedError
+
+    def insert_by_type(self, asset_descs_by_type, replace=True):
+        """Insert asset descriptions of several asset types as one change.
+
+        Args:
+            asset_descs_by_type (dict{asset_type: list[dict]}): asset descriptions per asset type
+            replace (bool, optional): Replace existing descriptions with the same slug.
+                If False existing descriptions are kept. Defaults to True.
+        """
+        raise NotImplementedError
+
+    def update(self, asset_type, asset_desc):
+        """Update an existing asset description in place.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            asset_desc (dict): asset description
+        """
+        self.update_many(asset_type, [asset_desc])
+
+    def update_many(self, asset_type, asset_descs):
+        """Update existing asset descriptions in place. Their category must not have changed.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            asset_descs (list[dict]): asset descriptions
+        """
+        raise NotImplementedError
+
+    def move(self, asset_type, asset_descs, cat_slug):
+        """Move asset descriptions to another category.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            asset_descs (list[dict]): asset descriptions with their current category
+            cat_slug (str): slug of category to move assets to
+        """
+        raise NotImplementedError
+
+    def delete(self, asset_type, asset_descs):
+        """Delete asset descriptions.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            asset_descs (list[dict]): asset descriptions to delete
+        """
+        raise NotImplementedError
+
+    def copy_from(self, catalog):
+        """Copy all asset descriptions and meta data from another catalog.
+
+        Args:
+            catalog (Catalog): catalog to copy from
+        """
+        for asset_type in ASSET_TYPES:
+            self.insert_many(asset_type, catalog.load(asset_type))
+        for key in ('json_migrated', 'bundled_stamps'):
+            value = catalog.get_meta(key)
+            if value is not None:
+                self.set_meta(key, value)
+
+    def _migrate_json(self):
+        """Import the legacy per type .json files the first time the catalog is opened."""
+        if self.get_meta('json_migrated'):
+            return
+        for asset_type in ASSET_TYPES:
+            json_file = os.path.join(self.data_path, asset_type + '.json')
+            if os.path.exists(json_file):
+                with open(json_file) as read_file:
+                    descs = json.load(read_file)
+                self.insert_many(
+                    asset_type,
+                    [self._locate_asset_files(desc) for desc in descs],
+                    replace=False)
+        self.set_meta('json_migrated', '1')
+
+    def _locate_asset_files(self, asset_desc):
+        """Point the paths of a version 1 description to a library folder containing its file.
+
+        Args:
+            asset_desc (dict): asset description
+
+        Returns:
+            dict: asset description
+        """
+        if os.path.exists(asset_desc.get('FilePath', '')):
+            return asset_desc
+        for root in self.roots.values():
+            type_path = os.path.join(root, asset_desc['Type'].lower())
+            if os.path.exists(os.path.join(type_path, asset_desc['FileName'])):
+                for path_key, name_key in PATH_KEYS:
+                    asset_desc[path_key] = os.path.join(type_path, asset_desc[name_key])
+                break
+        return asset_desc
+
+    def import_json(self, asset_type, json_file, replace=False):
+        """Import asset descriptions from a legacy .json file.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            json_file (str): path to .json file
+            replace (bool, optional): Replace existing descriptions with the same slug. Defaults to False.
+        """
+        with open(json_file) as read_file:
+            descs = json.load(read_file)
+        self.insert_many(asset_type, descs, replace=replace)
+
+    def export_json(self, asset_type, json_file):
+        """Export asset descriptions to a .json file in the legacy format.
+
+        Paths are exported as absolute paths so the file can be read without the catalog.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            json_file (str): path to .json file
+        """
+        descs = []
+        for asset_desc in self.load(asset_type):
+            desc = asset_desc.to_dict()
+            for path_key, name_key in PATH_KEYS:
+                desc[path_key] = asset_desc[path_key]
+            descs.append(desc)
+
+        with open(json_file, "w") as write_file:
+            json.dump(descs, write_file, indent=4)
+
+
+class SQLiteCatalog(Catalog):
+    """Asset catalog backed by a local SQLite database.
+
+    Each asset description is stored as one row. Slug, Category and Type are
+    stored in their own indexed columns and the full description is stored as
+    JSON so that assets can carry arbitrary extra keys such as RootObject.
+    """
+
+    def __init__(self, data_path, roots):
+        super().__init__(data_path, roots)
+        self.db_path = os.path.join(data_path, 'catalog.db')
+        self._conn = None
+
+    @property
+    def conn(self):
+        """Return an open connection to the catalog database, creating it if needed."""
+        if self._conn is None:
+            # another instance may be creating or migrating the catalog
+            with self.lock():
+                is_new = not os.path.exists(self.db_path)
+                self._conn = sqlite3.connect(self.db_path, timeout=LOCK_TIMEOUT)
+                self._create_schema()
+                if is_new:
+                    self.set_meta('schema_version', SCHEMA_VERSION)
+                self._migrate_schema()
+                with self._conn:
+                    self._conn.execute(
+                        "CREATE INDEX IF NOT EXISTS idx_assets_revision ON assets (Revision)")
+                self._migrate_json()
+            self.seen_revision = self.revision()
+        return self._conn
+
+    def exists(self):
+        return os.path.exists(self.db_path)
+
+    def _stamp_path(self):
+        return self.db_path
+
+    def close(self):
+        """Close the connection to the catalog database."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _create_schema(self):
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS assets (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Slug TEXT NOT NULL,
+                    Category TEXT NOT NULL,
+                    Type TEXT NOT NULL,
+                    Data TEXT NOT NULL,
+                    Revision INTEGER NOT NULL DEFAULT 0,
+                    UNIQUE (Type, Slug));
+                CREATE INDEX IF NOT EXISTS idx_assets_slug ON assets (Slug);
+                CREATE INDEX IF NOT EXISTS idx_assets_category ON assets (Category);
+                CREATE INDEX IF NOT EXISTS idx_assets_type ON assets (Type);
+                CREATE TABLE IF NOT EXISTS deleted (
+                    Slug TEXT NOT NULL,
+                    Category TEXT NOT NULL,
+                    Type TEXT NOT NULL,
+                    Revision INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS idx_deleted_revision ON deleted (Revision);
+                CREATE TABLE IF NOT EXISTS meta (
+                    Key TEXT PRIMARY KEY,
+                    Value TEXT);""")
+
+    def _migrate_schema(self):
+        """Upgrade descriptions stored with an older schema version."""
+        version = int(self.get_meta('schema_version', 1))
+        if version >= SCHEMA_VERSION:
+            return
+
+        if version < 2:
+            # Version 1 stored absolute paths. Assets whose files aren't under either
+            # library root are assigned to the library that actually contains their file.
+            with self._conn:
+                rows = self._conn.execute("SELECT id, Data FROM assets").fetchall()
+                for row_id, data in rows:
+                    desc = compact_asset_desc(self._locate_asset_files(json.loads(data)), self.roots)
+                    self._conn.execute(
+                        "UPDATE assets SET Data = ? WHERE id = ?",
+                        (json.dumps(desc), row_id))
+
+        if version < 3:
+            with self._conn:
+                self._conn.execute(
+                    "ALTER TABLE assets ADD COLUMN Revision INTEGER NOT NULL DEFAULT 0")
+
+        self.set_meta('schema_version', SCHEMA_VERSION)
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT Value FROM meta WHERE Key = ?", (key,)).fetchone()
+        if row is None:
+            return default
+        return row[0]
+
+    def set_meta(self, key, value):
+        with self.lock(), self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (Key, Value) VALUES (?, ?)", (key, str(value)))
+
+    def _next_revision(self):
+        """Increment the catalog revision. Call inside the transaction making the change."""
+        revision = self.revision() + 1
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (Key, Value) VALUES ('revision', ?)", (str(revision),))
+        return revision
+
+    def revision(self):
+        return int(self.get_meta('revision', 0))
+
+    def changes_since(self, revision):
+        if revision < int(self.get_meta('pruned_revision', 0)):
+            return None
+
+        changes = {}
+        rows = self.conn.execute(
+            "SELECT Type, Data FROM assets WHERE Revision > ? ORDER BY id", (revision,))
+        for a_type, data in rows:
+            change = changes.setdefault(a_type.lower(), CatalogChanges())
+            change.upserted.append(AssetDescription(json.loads(data)))
+
+        rows = self.conn.execute(
+            "SELECT Type, Slug, Category FROM deleted WHERE Revision > ? ORDER BY Revision", (revision,))
+        for a_type, slug, cat_slug in rows:
+            change = changes.setdefault(a_type.lower(), CatalogChanges())
+            change.deleted.append((slug, cat_slug))
+
+        return changes
+
+    def _add_tombstones(self, a_type, asset_descs, revision):
+        """Record that asset descriptions were removed from their categories."""
+        self.conn.executemany(
+            "INSERT INTO deleted (Slug, Category, Type, Revision) VALUES (?, ?, ?, ?)",
+            [(desc['Slug'], desc['Category'], a_type, revision) for desc in asset_descs])
+
+        pruned_revision = revision - TOMBSTONE_REVISIONS
+        if pruned_revision > 0:
+            cursor = self.conn.execute(
+                "DELETE FROM deleted WHERE Revision <= ?", (pruned_revision,))
+            if cursor.rowcount:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (Key, Value) VALUES ('pruned_revision', ?)",
+                    (str(pruned_revision),))
+
+    def load(self, asset_type):
+        rows = self.conn.execute(
+            "SELECT Data FROM assets WHERE Type = ? ORDER BY id",
+            (asset_type.upper(),))
+        return [AssetDescription(json.loads(row[0])) for row in rows]
+
+    def load_category(self, asset_type, cat_slug):
+        rows = self.conn.execute(
+            "SELECT Data FROM assets WHERE Type = ? AND Category = ? ORDER BY id",
+            (asset_type.upper(), cat_slug))
+        return [AssetDescription(json.loads(row[0])) for row in rows]
+
+    def get_many(self, asset_type, slugs):
+        slugs = list(slugs)
+        descs = {}
+        # stay below the limit on the number of parameters of a statement
+        for i in range(0, len(slugs), 500):
+            chunk = slugs[i:i + 500]
+            rows = self.conn.execute(
+                "SELECT Slug, Data FROM assets WHERE Type = ? AND Slug IN (%s)" % ', '.join('?' * len(chunk)),
+                [asset_type.upper()] + chunk)
+            descs.update((slug, AssetDescription(json.loads(data))) for slug, data in rows)
+        return descs
+
+    def insert_many(self, asset_type, asset_descs, replace=True):
+        self.insert_by_type({asset_type: asset_descs}, replace)
+
+    def insert_by_type(self, asset_descs_by_type, replace=True):
+        with self.lock(), self.conn:
+            revision = self._next_revision()
+            for asset_type, asset_descs in asset_descs_by_type.items():
+                self._insert_rows(asset_type.upper(), asset_descs, replace, revision)
+        self._saw_revision(revision)
+
+    def _insert_rows(self, a_type, asset_descs, replace, revision):
+        for desc in asset_descs:
+            desc = compact_asset_desc(desc, self.roots)
+            values = (desc['Category'], json.dumps(desc), revision, a_type, desc['Slug'])
+            if replace:
+                cursor = self.conn.execute(
+                    "UPDATE assets SET Category = ?, Data = ?, Revision = ? WHERE Type = ? AND Slug = ?",
+                    values)
+                if cursor.rowcount:
+                    continue
+            self.conn.execute(
+                "INSERT OR IGNORE INTO assets (Category, Data, Revision, Type, Slug) VALUES (?, ?, ?, ?, ?)",
+                values)
+
+    def update_many(self, asset_type, asset_descs):
+        a_type = asset_type.upper()
+        with self.lock(), self.conn:
+            revision = self._next_revision()
+            self._update_rows(a_type, [compact_asset_desc(desc, self.roots) for desc in asset_descs], revision)
+        self._saw_revision(revision)
+
+    def _update_rows(self, a_type, descs, revision):
+        self.conn.executemany(
+            "UPDATE assets SET Category = ?, Data = ?, Revision = ? WHERE Type = ? AND Slug = ?",
+            [(desc['Category'], json.dumps(desc), revision, a_type, desc['Slug']) for desc in descs])
+
+    def move(self, asset_type, asset_descs, cat_slug):
+        a_type = asset_type.upper()
+        moved = []
+        for desc in asset_descs:
+            desc = compact_asset_desc(desc, self.roots)
+            desc['Category'] = cat_slug
+            moved.append(desc)
+
+        with self.lock(), self.conn:
+            revision = self._next_revision()
+            # record the categories the assets were moved out of
+            self._add_tombstones(a_type, asset_descs, revision)
+            self._update_rows(a_type, moved, revision)
+        self._saw_revision(revision)
+
+    def delete(self, asset_type, asset_descs):
+        a_type = asset_type.upper()
+        with self.lock(), self.conn:
+            revision = self._next_revision()
+            self._add_tombstones(a_type, asset_descs, revision)
+            self.conn.executemany(
+                "DELETE FROM assets WHERE Type = ? AND Slug = ?",
+                [(a_type, desc['Slug']) for desc in asset_descs])
+        self._saw_revision(revision)
+
+
+class ShardedCatalog(Catalog):
+    """Asset catalog stored as one .json shard per category plus a manifest.
+
+    The manifest records the shard file and asset count of every category so
+    reading a category only parses its shard and changing assets in a category
+    only rewrites that shard and the manifest. Slugs must be unique per asset
+    type, new descriptions are only checked against the shard they are added to.
+
+    The manifest also records the revision each shard was last written in and
+    when categories were emptied so changes can be found without reading shards.
+
+    Changes re-read the manifest and the shards they touch while holding the
+    catalog lock, so records written by other instances are merged, not overwritten.
+    """
+
+    def __init__(self, data_path, roots):
+        super().__init__(data_path, roots)
+        self.shards_path = os.path.join(data_path, 'shards')
+        self.manifest_path = os.path.join(self.shards_path, 'manifest.json')
+        self._manifest = None
+        self._manifest_stamp = None
+
+    @property
+    def manifest(self):
+        """Return the manifest, creating the catalog if needed."""
+        if self._manifest is None:
+            if os.path.exists(self.manifest_path):
+                self._read_manifest()
+            else:
+                with self.lock():
+                    if os.path.exists(self.manifest_path):
+                        # created by another instance while we waited
+                        self._read_manifest()
+                    else:
+                        self._create_manifest()
+            if self._manifest['SchemaVersion'] < SCHEMA_VERSION:
+                with self.lock():
+                    self._read_manifest()
+                    self._migrate_manifest()
+            self.seen_revision = self._manifest['Revision']
+        return self._manifest
+
+    def _read_manifest(self):
+        with open(self.manifest_path) as read_file:
+            self._manifest = json.load(read_file, object_pairs_hook=OrderedDict)
+        self._manifest_stamp = self._get_manifest_stamp()
+
+    def _create_manifest(self):
+        if not os.path.exists(self.shards_path):
+            os.makedirs(self.shards_path)
+        self._manifest = OrderedDict([
+            ('SchemaVersion', SCHEMA_VERSION),
+            ('Revision', 0),
+            ('Meta', OrderedDict()),
+            ('Shards', OrderedDict((a_type.upper(), OrderedDict()) for a_type in ASSET_TYPES)),
+            ('Removed', OrderedDict((a_type.upper(), OrderedDict()) for a_type in ASSET_TYPES))])
+        self._write_manifest()
+        self._migrate_json()
+
+    def _get_manifest_stamp(self):
+        try:
+            stat = os.stat(self.manifest_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _migrate_manifest(self):
+        """Add the revision records to manifests written by older versions."""
+        if self._manifest['SchemaVersion'] >= 3:
+            return
+        self._manifest['SchemaVersion'] = SCHEMA_VERSION
+        self._manifest.setdefault('Revision', 0)
+        self._manifest.setdefault(
+            'Removed',
+            OrderedDict((a_type.upper(), OrderedDict()) for a_type in ASSET_TYPES))
+        self._write_manifest()
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def _stamp_path(self):
+        return self.manifest_path
+
+    def _reload_manifest(self):
+        """Read the manifest again in case another instance has changed the catalog."""
+        if self._manifest is None:
+            self.manifest
+        else:
+            self._read_manifest()
+
+    def _begin_change(self):
+        """Reload the manifest and increment the catalog revision. Call holding the lock."""
+        self._reload_manifest()
+        self.manifest['Revision'] += 1
+        return self.manifest['Revision']
+
+    def revision(self):
+        if self._manifest is not None and self._get_manifest_stamp() != self._manifest_stamp:
+            self._read_manifest()
+        return self.manifest['Revision']
+
+    def changes_since(self, revision):
+        self._reload_manifest()
+        changes = {}
+        for a_type, shards in self.manifest['Shards'].items():
+            change = CatalogChanges()
+            for cat_slug, shard in shards.items():
+                if shard.get('Revision', 0) > revision:
+                    change.replaced_categories.add(cat_slug)
+                    change.upserted.extend(self.load_category(a_type, cat_slug))
+            for cat_slug, removed_revision in self.manifest['Removed'][a_type].items():
+                if removed_revision > revision:
+                    change.replaced_categories.add(cat_slug)
+            if change.replaced_categories:
+                changes[a_type.lower()] = change
+        return changes
+
+    def _write_json(self, path, data):
+        """Write data to a .json file, replacing the file in one step."""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, "w") as write_file:
+            json.dump(data, write_file, indent=4)
+        os.replace(tmp_path, path)
+
+    def _write_manifest(self):
+        self._write_json(self.manifest_path, self.manifest)
+        self._manifest_stamp = self._get_manifest_stamp()
+
+    def _shard_file(self, asset_type, cat_slug):
+        """Return the path of a shard relative to the shards folder."""
+        return os.path.join(asset_type.lower(), cat_slug.replace('\\', '.') + '.json')
+
+    def _read_shard(self, asset_type, cat_slug):
+        """Return the stored asset descriptions in a category.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            cat_slug (str): category slug
+
+        Returns:
+            list[dict]: asset descriptions
+        """
+        shard = self.manifest['Shards'][asset_type.upper()].get(cat_slug)
+        if shard is None:
+            return []
+        with open(os.path.join(self.shards_path, shard['File'])) as read_file:
+            return json.load(read_file)
+
+    def _write_shard(self, asset_type, cat_slug, descs):
+        """Write the stored asset descriptions of a category to its shard.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            cat_slug (str): category slug
+            descs (list[dict]): asset descriptions
+        """
+        shards = self.manifest['Shards'][asset_type.upper()]
+        removed = self.manifest['Removed'][asset_type.upper()]
+        revision = self.manifest['Revision']
+        shard_file = self._shard_file(asset_type, cat_slug)
+        path = os.path.join(self.shards_path, shard_file)
+
+        if not descs:
+            if cat_slug in shards:
+                del shards[cat_slug]
+                removed[cat_slug] = revision
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        self._write_json(path, descs)
+        removed.pop(cat_slug, None)
+        shards[cat_slug] = OrderedDict([
+            ('File', shard_file),
+            ('Count', len(descs)),
+            ('Revision', revision)])
+
+    def get_meta(self, key, default=None):
+        return self.manifest['Meta'].get(key, default)
+
+    def set_meta(self, key, value):
+        with self.lock():
+            self._reload_manifest()
+            self.manifest['Meta'][key] = str(value)
+            self._write_manifest()
+
+    def load(self, asset_type):
+        descs = []
+        for cat_slug in self.manifest['Shards'][asset_type.upper()]:
+            descs.extend(self.load_category(asset_type, cat_slug))
+        return descs
+
+    def load_category(self, asset_type, cat_slug):
+        return [AssetDescription(desc) for desc in self._read_shard(asset_type, cat_slug)]
+
+    def get_many(self, asset_type, slugs):
+        # slugs aren't indexed by category, so read shards until every slug is found
+        slugs = set(slugs)
+        descs = {}
+        for cat_slug in self.manifest['Shards'][asset_type.upper()]:
+            if len(descs) == len(slugs):
+                break
+            descs.update(
+                (desc['Slug'], AssetDescription(desc))
+                for desc in self._read_shard(asset_type, cat_slug) if desc['Slug'] in slugs)
+        return descs
+
+    def _group_by_category(self, asset_descs):
+        """Return compacted asset descriptions grouped by category."""
+        groups = OrderedDict()
+        for desc in asset_descs:
+            desc = compact_asset_desc(desc, self.roots)
+            groups.setdefault(desc['Category'], []).append(desc)
+        return groups
+
+    def insert_many(self, asset_type, asset_descs, replace=True):
+        self.insert_by_type({asset_type: asset_descs}, replace)
+
+    def insert_by_type(self, asset_descs_by_type, replace=True):
+        with self.lock():
+            revision = self._begin_change()
+            for asset_type, asset_descs in asset_descs_by_type.items():
+                self._insert_shards(asset_type, asset_descs, replace)
+            # the manifest is written once so other instances see every type change together
+            self._write_manifest()
+        self._saw_revision(revision)
+
+    def _insert_shards(self, asset_type, asset_descs, replace):
+        existing_slugs = set()
+        if not replace:
+            existing_slugs = set(desc['Slug'] for desc in self.load(asset_type))
+
+        for cat_slug, new_descs in self._group_by_category(asset_descs).items():
+            descs = self._read_shard(asset_type, cat_slug)
+            indices = {desc['Slug']: i for i, desc in enumerate(descs)}
+            for desc in new_descs:
+                if desc['Slug'] in existing_slugs:
+                    continue
+                if desc['Slug'] in indices:
+                    if replace:
+                        descs[indices[desc['Slug']]] = desc
+                else:
+                    indices[desc['Slug']] = len(descs)
+                    descs.append(desc)
+            self._write_shard(asset_type, cat_slug, descs)
+
+    def update_many(self, asset_type, asset_descs):
+        with self.lock():
+            revision = self._begin_change()
+            for cat_slug, new_descs in self._group_by_category(asset_descs).items():
+                updated = {desc['Slug']: desc for desc in new_descs}
+                descs = [updated.get(desc['Slug'], desc) for desc in self._read_shard(asset_type, cat_slug)]
+                self._write_shard(asset_type, cat_slug, descs)
+            self._write_manifest()
+        self._saw_revision(revision)
+
+    def move(self, asset_type, asset_descs, cat_slug):
+        with self.lock():
+            revision = self._begin_change()
+            moved = []
+            for old_cat_slug, old_descs in self._group_by_category(asset_descs).items():
+                if old_cat_slug == cat_slug:
+                    continue
+                slugs = set(desc['Slug'] for desc in old_descs)
+                descs = self._read_shard(asset_type, old_cat_slug)
+                moved.extend(desc for desc in descs if desc['Slug'] in slugs)
+                self._write_shard(
+                    asset_type,
+                    old_cat_slug,
+                    [desc for desc in descs if desc['Slug'] not in slugs])
+
+            if moved:
+                for desc in moved:
+                    desc['Category'] = cat_slug
+                self._write_shard(asset_type, cat_slug, self._read_shard(asset_type, cat_slug) + moved)
+            self._write_manifest()
+        self._saw_revision(revision)
+
+    def delete(self, asset_type, asset_descs):
+        with self.lock():
+            revision = self._begin_change()
+            for cat_slug, old_descs in self._group_by_category(asset_descs).items():
+                slugs = set(desc['Slug'] for desc in old_descs)
+                self._write_shard(
+                    asset_type,
+                    cat_slug,
+                    [desc for desc in self._read_shard(asset_type, cat_slug) if desc['Slug'] not in slugs])
+            self._write_manifest()
+        self._saw_revision(revision)
+
+
+# Catalog class for each catalog layout preference
+CATALOG_LAYOUTS = OrderedDict([
+    ('SQLITE', SQLiteCatalog),
+    ('SHARDED', ShardedCatalog)])
+
+
+def get_catalog():
+    """Return the asset catalog for the current user assets path and catalog layout.
+
+    If the catalog doesn't exist yet in the chosen layout but does in another
+    it is converted.
+    """
+    prefs = get_prefs()
+    data_path = os.path.join(
+        prefs.user_assets_path,
+        "data")
+
+    library_roots[LIBRARY_USER] = prefs.user_assets_path
+    library_roots[LIBRARY_DEFAULT] = prefs.default_assets_path
+
+    layout = prefs.catalog_layout
+    try:
+        return _catalogs[(data_path, layout)]
+    except KeyError:
+        pass
+
+    catalog = CATALOG_LAYOUTS[layout](data_path, library_roots)
+    if not catalog.exists():
+        for other_layout, catalog_cls in CATALOG_LAYOUTS.items():
+            other = catalog_cls(data_path, library_roots)
+            if other_layout != layout and other.exists():
+                catalog.copy_from(other)
+                break
+
+    _catalogs[(data_path, layout)] = catalog
+    return catalog
+
+
+def load_asset_descs(asset_type):
+    """Load all asset descriptions of asset_type from the catalog and report the load time to load_hooks.
+
+    Args:
+        asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+
+    Returns:
+        list[AssetDescription]: asset descriptions
+    """
+    start = time.perf_counter()
+    descs = get_catalog().load(asset_type)
+    duration = time.perf_counter() - start
+    for hook in load_hooks:
+        hook(asset_type, len(descs), duration)
+    return descs
+
+
+def get_asset_descs(props, asset_keys):
+    """Return the asset descriptions of assets of any type without loading asset types that haven't been.
+
+    Asset types that have been loaded are looked up in memory and the rest are
+    read from the catalog one description at a time.
+
+    Args:
+        props (mt_am_props): asset manager props
+        asset_keys (list[tuple(asset_type, slug)]): assets
+
+    Returns:
+        list[AssetDescription]: asset descriptions in the order of asset_keys. Assets
+            that aren't in the catalog are left out.
+    """
+    found = {}
+    for asset_type in ASSET_TYPES:
+        slugs = [slug for a_type, slug in asset_keys if a_type == asset_type]
+        if not slugs:
+            continue
+        if props.asset_descs_loaded(asset_type):
+            asset_descs = getattr(props, asset_type)
+            descs = {slug: asset_descs.get(slug) for slug in slugs}
+        else:
+            descs = get_catalog().get_many(asset_type, slugs)
+        found.update(((asset_type, slug), desc) for slug, desc in descs.items() if desc is not None)
+    return [found[key] for key in asset_keys if key in found]
+
+
+def print_load_time(asset_type, count, duration):
+    """Print how long an asset type took to load from the catalog. Append to load_hooks to use."""
+    print(" » Loaded %d %s in %.1f ms" % (count, asset_type, duration * 1000))
+
+
+class MT_OT_AM_Export_Catalog(Operator):
+    """Export the asset catalog to .json files."""
+
+    bl_idname = "scene.mt_am_export_catalog"
+    bl_label = "Export Catalog"
+    bl_description = "Export the asset catalog as one .json file per asset type"
+
+    directory: StringProperty(
+        name="Directory",
+        subtype='DIR_PATH'
+    )
+
+    def execute(self, context):
+        catalog = get_catalog()
+        for asset_type in ASSET_TYPES:
+            catalog.export_json(
+                asset_type,
+                os.path.join(self.directory, asset_type + '.json'))
+
+        self.report({'INFO'}, "Catalog exported to " + self.directory)
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
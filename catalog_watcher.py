@@ -0,0 +1,116 @@
+import bpy
+from .catalog import get_catalog, ASSET_TYPES
+from .search import save_search_index
+from .usage import is_virtual_category
+
+# seconds between checks of the catalog for changes made by other Blender instances
+POLL_INTERVAL = 2.0
+
+
+def watch_catalog():
+    """Timer callback that applies changes other Blender instances have made to the catalog.
+
+    Polling only stats the catalog file. The catalog is only queried if the file has
+    changed and only the changed asset descriptions are applied to those in memory.
+    The search index is saved here if it has changed, rather than after every change.
+
+    Returns:
+        float: seconds until the next poll
+    """
+    save_search_index()
+
+    scene = bpy.context.scene
+    if scene is None or not hasattr(scene, 'mt_am_props'):
+        return POLL_INTERVAL
+
+    catalog = get_catalog()
+    if not catalog.exists() or not catalog.poll():
+        return POLL_INTERVAL
+
+    props = scene.mt_am_props
+    touched = sync_catalog(props, catalog)
+    if touched is None or (props.active_category and props.active_category['Slug'] in touched):
+        props.assets_updated = True
+    # assets in the Recent and Frequent categories can be in any category
+    elif touched and props.active_category and is_virtual_category(props.active_category['Slug']):
+        props.assets_updated = True
+    return POLL_INTERVAL
+
+
+def sync_catalog(props, catalog):
+    """Apply changes other Blender instances have made to the catalog to the asset descriptions in memory.
+
+    Call holding the catalog lock before making a change that depends on the
+    asset descriptions in memory, such as choosing a unique slug.
+
+    Args:
+        props (mt_am_props): asset manager props
+        catalog (Catalog): catalog
+
+    Returns:
+        set[str]: slugs of categories whose contents have changed, or None if
+            all asset descriptions have been reset.
+    """
+    revision = catalog.revision()
+    if revision == catalog.seen_revision:
+        return set()
+
+    changes = catalog.changes_since(catalog.seen_revision)
+    catalog.seen_revision = revision
+
+    if changes is None:
+        # the changes are no longer recorded so reload everything
+        for a_type in ASSET_TYPES:
+            setattr(props, a_type, None)
+        return None
+
+    return apply_catalog_changes(props, changes)
+
+
+def apply_catalog_changes(props, changes):
+    """Apply catalog changes to the asset descriptions in memory.
+
+    Asset types that haven't been loaded yet are skipped as they will be read
+    from the catalog when they are first accessed.
+
+    Args:
+        props (mt_am_props): asset manager props
+        changes (dict{asset_type: CatalogChanges}): changes returned by Catalog.changes_since
+
+    Returns:
+        set[str]: slugs of categories whose contents have changed
+    """
+    touched = set()
+    for a_type, change in changes.items():
+        touched |= change.touched_categories()
+        if not props.asset_descs_loaded(a_type):
+            continue
+
+        upserted = {desc['Slug']: desc for desc in change.upserted}
+        deleted = set(slug for slug, cat_slug in change.deleted if slug not in upserted)
+        descs = getattr(props, a_type)
+
+        # descriptions in replaced categories that weren't upserted have been removed
+        for cat_slug in change.replaced_categories:
+            deleted.update(desc['Slug'] for desc in descs.in_category(cat_slug) if desc['Slug'] not in upserted)
+        descs.remove_many(deleted)
+
+        for slug, desc in upserted.items():
+            old_desc = descs.get(slug)
+            if old_desc is not None:
+                # an edited or moved asset also changes the category it was in
+                touched.add(old_desc['Category'])
+            # replaces the existing description in place
+            descs.append(desc)
+    return touched
+
+
+def register():
+    if not bpy.app.timers.is_registered(watch_catalog):
+        bpy.app.timers.register(watch_catalog, first_interval=POLL_INTERVAL, persistent=True)
+
+
+def unregister():
+    if bpy.app.timers.is_registered(watch_catalog):
+        bpy.app.timers.unregister(watch_catalog)
+    save_search_index()
@@ -6,157 +6,344 @@ from bpy.props import StringProperty
 from .utils import slugify
 from .preferences import get_prefs
 from .delete_from_library import delete_assets
+from .catalog import get_catalog
+from .catalog_watcher import sync_catalog
+from .usage import is_virtual_category
 
-# TODO #1 Create a rename category operator
-def get_descendent_cats(category):
-    """Return all descendents of category as a flat list.
+# user categories are stored as an adjacency list, one category per line
+CATEGORIES_FILE = 'categories.jsonl'
 
-    Args:
-        category (dict): category dict
+# nested categories file the bundled categories and older user libraries use
+NESTED_CATEGORIES_FILE = 'categories.json'
 
-    Returns:
-        list[dict{Name,
-            Slug,
-            Parent,
-            Children[list[categories]]}]: flat list of categories
-    """
-    descendents = []
-    for child in category['Children']:
-        descendents.append(child)
-        descendents.extend(get_descendent_cats(child))
-    return descendents
+# fields written for each category. Children are rebuilt from Parent when loading
+CATEGORY_FIELDS = ('Name', 'Slug', 'Parent', 'Contains')
 
+# the loaded category tree and the (mtime, size) of the file it was loaded from
+_tree_cache = {'stamp': None, 'tree': None}
 
-def get_child_cats(categories, category_slug):
-    """Return children of category.
 
-    Args:
-        categories (list[categories]): categories
-        category_slug (string): category
+# TODO #1 Create a rename category operator
+class CategoryTree:
+    """All categories held in a flat map from slug to category.
 
-    Returns:
-        list[dict{Name,
-            Slug,
-            Parent,
-            Children[list[categories]]}]: list of categories
-    """
-    if category_slug == '':
-        return categories
-    children = []
-    for cat in categories:
-        if cat['Slug'] == category_slug:
-            return cat['Children']
-        else:
-            children = get_child_cats(cat['Children'], category_slug)
-        if children:
-            return children
-    return children
-
-
-def get_parent_cat_slug(categories, category_slug):
-    """Return parent slug of category.
+    Categories are the same dicts as in the nested categories file, {Name, Slug,
+    Parent, Contains, Children}, and each category's Children list holds its child
+    categories, so code that draws the tree can still walk it. Looking up a
+    category, its parent or its children is a single dict lookup though, rather
+    than a walk of the whole tree.
 
-    Args:
-        categories (list[categories]): categories
-        category_slug (string): category slug
+    Change the tree through add() and delete() so the map and the Children lists
+    stay in sync.
 
-    Returns:
-        string: slug
+    Every category also has an interval in a preorder walk of the tree (an Euler
+    tour) containing exactly its subtree, so the slugs of a category and all its
+    descendents are a slice of one list.
     """
-    if category_slug == "":
-        return ""
-    parent = ""
-    for cat in categories:
-        if cat['Slug'] == category_slug:
-            return cat['Parent']
-        else:
-            parent = get_parent_cat_slug(cat['Children'], category_slug)
-        if parent:
-            return parent
-    return parent
-
-
-def get_category(categories, category_slug):
-    """Return the category.
 
-    Args:
-        categories (list[categories]): categories
-        category_slug (string): category slug
+    def __init__(self):
+        self.roots = []
+        self._nodes = {}
+        # preorder slugs and the (start, end) span of each subtree in it, built when needed
+        self._preorder = None
+        self._spans = None
+
+    @classmethod
+    def from_nested(cls, categories):
+        """Return a tree built from a nested list of categories.
+
+        Args:
+            categories (list[categories]): categories with nested Children
+
+        Returns:
+            CategoryTree: tree
+        """
+        tree = cls()
+        tree.merge(categories)
+        return tree
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Return a tree built from an adjacency list.
+
+        Args:
+            rows (list[dict{Name, Slug, Parent, Contains}]): categories. Parents must
+                come before their children.
+
+        Returns:
+            CategoryTree: tree
+        """
+        tree = cls()
+        for row in rows:
+            tree.add(row)
+        return tree
+
+    def __contains__(self, category_slug):
+        return category_slug in self._nodes
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __iter__(self):
+        """Iterate over all categories, parents before their children."""
+        stack = list(reversed(self.roots))
+        while stack:
+            cat = stack.pop()
+            yield cat
+            stack.extend(reversed(cat['Children']))
+
+    def get(self, category_slug):
+        """Return the category.
+
+        Args:
+            category_slug (string): category slug
+
+        Returns:
+            dict{Name,
+                Slug,
+                Parent,
+                Children[list[categories]]}: category, or None if there is no such category
+        """
+        return self._nodes.get(category_slug)
+
+    def children(self, category_slug):
+        """Return children of category.
+
+        Args:
+            category_slug (string): category slug. '' returns the top level categories.
+
+        Returns:
+            list[dict{Name,
+                Slug,
+                Parent,
+                Children[list[categories]]}]: list of categories
+        """
+        if category_slug == '':
+            return self.roots
+        cat = self._nodes.get(category_slug)
+        return cat['Children'] if cat else []
+
+    def parent_slug(self, category_slug):
+        """Return parent slug of category.
+
+        Args:
+            category_slug (string): category slug
+
+        Returns:
+            string: slug, '' for top level or unknown categories
+        """
+        cat = self._nodes.get(category_slug)
+        return cat['Parent'] if cat else ''
+
+    def descendents(self, category_slug):
+        """Return all descendents of category as a flat list.
+
+        Args:
+            category_slug (string): category slug
+
+        Returns:
+            list[dict{Name,
+                Slug,
+                Parent,
+                Children[list[categories]]}]: flat list of categories, parents before their children
+        """
+        cat = self._nodes.get(category_slug)
+        if cat is None:
+            return []
+        descendents = []
+        stack = list(reversed(cat['Children']))
+        while stack:
+            child = stack.pop()
+            descendents.append(child)
+            stack.extend(reversed(child['Children']))
+        return descendents
+
+    def add(self, category):
+        """Add a category as the last child of its parent.
+
+        Args:
+            category (dict{Name, Slug, Parent, Contains}): category. Children are ignored.
+
+        Returns:
+            dict: the added category, or None if the slug is already used or the parent doesn't exist
+        """
+        slug = category['Slug']
+        parent_slug = category.get('Parent', '')
+        if slug in self._nodes or (parent_slug and parent_slug not in self._nodes):
+            return None
+        cat = {field: category.get(field, '') for field in CATEGORY_FIELDS}
+        cat['Children'] = []
+        self._nodes[slug] = cat
+        self.children(parent_slug).append(cat)
+        self._preorder = self._spans = None
+        return cat
+
+    def delete(self, category_slug):
+        """Delete the category and all child categories.
+
+        Args:
+            category_slug (string): category slug
+
+        Returns:
+            list[dict]: deleted categories
+        """
+        cat = self._nodes.get(category_slug)
+        if cat is None:
+            return []
+        deleted = [cat] + self.descendents(category_slug)
+        for removed in deleted:
+            del self._nodes[removed['Slug']]
+        siblings = self.children(cat['Parent'])
+        siblings[:] = [sibling for sibling in siblings if sibling is not cat]
+        self._preorder = self._spans = None
+        return deleted
+
+    def _build_spans(self):
+        """Number the categories in preorder and record the span of each subtree."""
+        preorder = []
+        spans = {}
+        # each category is visited on the way down and again once its subtree is done
+        stack = [(cat, False) for cat in reversed(self.roots)]
+        while stack:
+            cat, done = stack.pop()
+            if done:
+                spans[cat['Slug']] = (spans[cat['Slug']], len(preorder))
+                continue
+            spans[cat['Slug']] = len(preorder)
+            preorder.append(cat['Slug'])
+            stack.append((cat, True))
+            stack.extend((child, False) for child in reversed(cat['Children']))
+        self._preorder = preorder
+        self._spans = spans
+
+    def subtree(self, category_slug):
+        """Return the slugs of a category and all its descendents.
+
+        Args:
+            category_slug (string): category slug
+
+        Returns:
+            list[str]: slugs, parents before their children. Empty if there is no such category
+        """
+        if self._spans is None:
+            self._build_spans()
+        span = self._spans.get(category_slug)
+        if span is None:
+            return []
+        return self._preorder[span[0]:span[1]]
+
+    def merge(self, categories):
+        """Add the categories in a nested list that aren't already in the tree.
+
+        Args:
+            categories (list[categories]): categories with nested Children
+
+        Returns:
+            list[dict]: added categories, parents before their children
+        """
+        added = []
+        stack = list(reversed(categories))
+        while stack:
+            cat = stack.pop()
+            if self.add(cat) is not None:
+                added.append(cat)
+            stack.extend(reversed(cat.get('Children', [])))
+        return added
+
+    def rows(self):
+        """Return the tree as an adjacency list, parents before their children."""
+        return [{field: cat[field] for field in CATEGORY_FIELDS} for cat in self]
+
+
+def get_categories_file():
+    """Return the path of the user categories file."""
+    prefs = get_prefs()
+    return os.path.join(
+        prefs.user_assets_path,
+        "data",
+        CATEGORIES_FILE)
 
-    Returns:
-        dict{Name,
-            Slug,
-            Parent,
-            Children[list[categories]]}: category
-    """
-    if category_slug == "":
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
         return None
-    ret_cat = None
-    for cat in categories:
-        if cat['Slug'] == category_slug:
-            return cat
-        else:
-            ret_cat = get_category(cat['Children'], category_slug)
-        if ret_cat:
-            return ret_cat
-    return ret_cat
+    return (stat.st_mtime_ns, stat.st_size)
 
 
+def load_category_tree():
+    """Return the user categories.
 
-def delete_category(categories, category_slug, prefs):
-    """Delete the category and all child categories.
+    The file is only read if it has changed since it was last loaded, so the
+    same CategoryTree is returned until another Blender instance changes it.
+    A user library that only has a nested categories.json file is converted the
+    first time it is loaded.
 
-    Args:
-        categories (list[categories]): categories
-        category_slug (string): category slug
-        prefs (dict): AssetManager prefs
+    Returns:
+        CategoryTree: categories
     """
-    for cat in categories:
-        if cat['Slug'] == category_slug:
-            categories.remove(cat)
-            break
-        else:
-            delete_category(cat['Children'], category_slug, prefs)
-
-    # Update categories.json file
-    json_file = os.path.join(
-        prefs.user_assets_path,
-        "data",
-        "categories.json")
+    json_path = get_categories_file()
+    stamp = _file_stamp(json_path)
+    if stamp is not None and stamp == _tree_cache['stamp']:
+        return _tree_cache['tree']
 
-    if os.path.exists(json_file):
-        with open(json_file, "w") as write_file:
-            json.dump(categories, write_file, indent=4)
+    if stamp is not None:
+        with open(json_path) as json_file:
+            tree = CategoryTree.from_rows(json.loads(line) for line in json_file if line.strip())
+    else:
+        tree = CategoryTree()
+        nested_path = os.path.join(os.path.dirname(json_path), NESTED_CATEGORIES_FILE)
+        if os.path.exists(nested_path):
+            with open(nested_path) as json_file:
+                tree.merge(json.load(json_file))
+            save_category_tree(tree)
+            return tree
 
+    _tree_cache['stamp'] = stamp
+    _tree_cache['tree'] = tree
+    return tree
 
-def load_categories():
-    """Load categories from .json file."""
-    prefs = get_prefs()
-    categories = []
-    json_path = os.path.join(
-        prefs.user_assets_path,
-        "data",
-        "categories.json"
-    )
 
-    if os.path.exists(json_path):
-        with open(json_path) as json_file:
-            categories = json.load(json_file)
+def save_category_tree(tree):
+    """Write all categories to the user categories file.
 
-    return categories
+    Call holding the catalog lock after reloading the categories with
+    load_category_tree() so categories changed by other Blender instances are kept.
 
+    Args:
+        tree (CategoryTree): categories
+    """
+    json_path = get_categories_file()
+    # replace the file in one step so other instances never read a partial file
+    tmp_file = json_path + '.tmp'
+    with open(tmp_file, "w") as write_file:
+        for row in tree.rows():
+            write_file.write(json.dumps(row) + "\n")
+    os.replace(tmp_file, json_path)
+    _tree_cache['stamp'] = _file_stamp(json_path)
+    _tree_cache['tree'] = tree
 
-def append_category(categories, parent_slug, new_cat):
-    found = False
-    for cat in categories:
-        if cat['Slug'] == parent_slug:
-            cat['Children'].append(new_cat)
-            return True
-        else:
-            found = append_category(cat['Children'], parent_slug, new_cat)
-        if found:
-            return found
-    return found
+
+def append_categories(tree, categories):
+    """Write categories that have been added to the tree to the end of the user categories file.
+
+    Only the new categories are written rather than the whole tree. Call holding
+    the catalog lock after reloading the categories with load_category_tree().
+
+    Args:
+        tree (CategoryTree): categories, including the new ones
+        categories (list[dict]): new categories, parents before their children
+    """
+    json_path = get_categories_file()
+    if not os.path.exists(json_path):
+        save_category_tree(tree)
+        return
+    with open(json_path, "a") as write_file:
+        for cat in categories:
+            write_file.write(json.dumps({field: cat[field] for field in CATEGORY_FIELDS}) + "\n")
+    _tree_cache['stamp'] = _file_stamp(json_path)
+    _tree_cache['tree'] = tree
 
 
 class MT_OT_Delete_Category(bpy.types.Operator):
@@ -173,35 +360,46 @@ class MT_OT_Delete_Category(bpy.types.Operator):
     def execute(self, context):
         prefs = get_prefs()
         props = context.scene.mt_am_props
-        category = get_category(props.active_category["Children"], self.category_slug)
-
-        try:
-            asset_type = category["Contains"].lower()
-            asset_descs = getattr(props, asset_type)
 
-            # construct list containing all sub categories
-            descendent_cats = get_descendent_cats(category)
-            descendent_cats.append(category)
-            category_slugs = [cat["Slug"] for cat in descendent_cats]
-
-            # get all assets
-            selected_assets = [desc for desc in asset_descs if desc["Category"] in category_slugs]
-            delete_assets(selected_assets, prefs, props, asset_type, True)
-        except TypeError:
-            pass
-
-        # delete categories
-        delete_category(props.categories, self.category_slug, prefs)
+        catalog = get_catalog()
+        with catalog.lock():
+            # reload categories and assets so changes made by other Blender instances are kept
+            categories = load_category_tree()
+            category = categories.get(self.category_slug)
+            sync_catalog(props, catalog)
+
+            try:
+                asset_type = category["Contains"].lower()
+                asset_descs = getattr(props, asset_type)
+
+                # the category and all sub categories
+                category_slugs = categories.subtree(self.category_slug)
+
+                # get all assets
+                selected_assets = asset_descs.in_categories(category_slugs)
+                delete_assets(selected_assets, prefs, props, asset_type, True)
+            except TypeError:
+                pass
+
+            # delete categories
+            if categories.delete(self.category_slug):
+                save_category_tree(categories)
+
+        props.categories = categories
+        active_category = props.active_category
+        if active_category is not None and not is_virtual_category(active_category["Slug"]):
+            # the active category may have been deleted here or by another instance,
+            # in which case show the deleted category's parent or the root
+            parent_slug = category["Parent"] if category else ''
+            active_category = categories.get(active_category["Slug"]) or categories.get(parent_slug)
+        props.active_category = active_category
 
         # update sidebar
-        props['child_cats'] = get_child_cats(
-            props.categories,
-            props.active_category["Slug"])
+        props.child_cats = categories.children(active_category["Slug"] if active_category else '')
 
         # update asset bar
         props.assets_updated = True
 
-
         return {'FINISHED'}
 
     def invoke(self, context, event):
@@ -223,47 +421,45 @@ class MT_OT_Add_Category(bpy.types.Operator):
 
     def execute(self, context):
         """Add a new category."""
-        prefs = get_prefs()
         props = context.scene.mt_am_props
         parent_slug = props.active_category["Slug"]
         name = self.new_cat_name
-        categories = props.categories
-        parent_cat = get_category(categories, parent_slug)
         name = name.strip()
 
-        # check sub category doesn't already exist
-        found = False
-        for child in parent_cat["Children"]:
-            if name in child["Name"]:
-                found = True
-                self.report({'INFO'}, "Category already exists")
+        with get_catalog().lock():
+            # reload categories so changes made by other Blender instances are kept
+            categories = load_category_tree()
+            parent_cat = categories.get(parent_slug)
+
+            if parent_cat is None:
+                self.report({'INFO'}, "Category has been deleted")
                 return {'CANCELLED'}
 
-        if not found:
-            new_cat = {
+            # check sub category doesn't already exist
+            for child in parent_cat["Children"]:
+                if name in child["Name"]:
+                    self.report({'INFO'}, "Category already exists")
+                    return {'CANCELLED'}
+
+            new_cat = categories.add({
                 "Name": name,
                 "Slug": parent_slug + "\\" + slugify(name),
                 "Parent": parent_slug,
-                "Contains": parent_cat["Contains"],
-                "Children": []}
-
-            append_category(categories, parent_slug, new_cat)
-
-            # update sidebar
-            props['child_cats'] = get_child_cats(
-                categories,
-                parent_slug)
-
-            # Write categories.json file
-            json_file = os.path.join(
-                prefs.user_assets_path,
-                "data",
-                "categories.json")
-
-            if os.path.exists(json_file):
-                with open(json_file, "w") as write_file:
-                    json.dump(categories, write_file, indent=4)
-            return {'FINISHED'}
+                "Contains": parent_cat["Contains"]})
+
+            if new_cat is None:
+                self.report({'INFO'}, "Category already exists")
+                return {'CANCELLED'}
+
+            # only the new category is written to the categories file
+            append_categories(categories, [new_cat])
+
+        props.categories = categories
+        props.active_category = parent_cat
+
+        # update sidebar
+        props.child_cats = categories.children(parent_slug)
+        return {'FINISHED'}
 
     def invoke(self, context, event):
         """Call when user accesses operator via menu."""
@@ -0,0 +1,123 @@
+"""Command line interface for running asset manager tasks in background mode.
+
+Run through scripts/mt_am_cli.py, which enables the add-on first, e.g.::
+
+    blender -b --python scripts/mt_am_cli.py -- ingest /path/to/tiles --workers 8
+"""
+import argparse
+import bpy
+from .save_asset.batch_ingest import ingest, ingest_worker, FILES_PER_WORKER
+from .rescan import rescan_library, rescan_worker, format_rescan_report
+from .integrity import check_library, quarantine_orphans, STAT_THREADS
+from .duplicates import find_duplicates, merge_duplicates, fingerprint_worker, HASH_THREADS
+
+
+def parse_args(argv):
+    """Parse the command line arguments passed after '--'.
+
+    Args:
+        argv (list[str]): arguments
+
+    Returns:
+        argparse.Namespace: arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="blender -b --python mt_am_cli.py --",
+        description="MakeTile Asset Manager")
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    ingest_parser = commands.add_parser(
+        'ingest',
+        help="Add the objects, materials and collections listed in a manifest to the library")
+    ingest_parser.add_argument('source', help="Folder containing the source .blend files")
+    ingest_parser.add_argument('--manifest', help="Manifest file. Defaults to manifest.json in the source folder")
+    ingest_parser.add_argument('--workers', type=int, default=1, help="Number of Blender worker processes")
+    ingest_parser.add_argument(
+        '--files-per-worker', type=int, default=FILES_PER_WORKER,
+        help="Number of source files saved by each worker process")
+    ingest_parser.add_argument('--no-previews', action='store_true', help="Don't render preview images")
+
+    # used by ingest to start its worker processes
+    worker_parser = commands.add_parser('ingest-worker')
+    worker_parser.add_argument('job')
+    worker_parser.add_argument('result')
+
+    rescan_parser = commands.add_parser(
+        'rescan',
+        help="Rebuild the catalog from the asset files in the user library")
+    rescan_parser.add_argument('--workers', type=int, default=1, help="Number of Blender worker processes")
+    rescan_parser.add_argument('--dry-run', action='store_true', help="Only report what would change")
+
+    # used by rescan to start its worker processes
+    worker_parser = commands.add_parser('rescan-worker')
+    worker_parser.add_argument('job')
+    worker_parser.add_argument('result')
+
+    check_parser = commands.add_parser(
+        'check',
+        help="Report missing asset files and files that don't belong to an asset")
+    check_parser.add_argument('--threads', type=int, default=STAT_THREADS, help="Number of files to check at once")
+    check_parser.add_argument(
+        '--quarantine', action='store_true',
+        help="Move files that don't belong to an asset to the quarantine folder of the user library")
+
+    duplicates_parser = commands.add_parser(
+        'duplicates',
+        help="Report assets with identical files or geometry")
+    duplicates_parser.add_argument('--threads', type=int, default=HASH_THREADS, help="Number of files to hash at once")
+    duplicates_parser.add_argument(
+        '--workers', type=int, default=1, help="Number of Blender worker processes used to compare geometry")
+    duplicates_parser.add_argument(
+        '--merge', action='store_true',
+        help="Merge each group of duplicates into one asset, keeping bundled assets and all files")
+
+    # used by duplicates to start its worker processes
+    worker_parser = commands.add_parser('fingerprint-worker')
+    worker_parser.add_argument('job')
+    worker_parser.add_argument('result')
+
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    """Run a command.
+
+    Args:
+        argv (list[str]): command line arguments passed after '--'
+
+    Returns:
+        int: exit code
+    """
+    args = parse_args(argv)
+    if args.command == 'ingest':
+        return ingest(
+            args.source,
+            args.manifest,
+            args.workers,
+            args.files_per_worker,
+            not args.no_previews)
+    if args.command == 'ingest-worker':
+        return ingest_worker(args.job, args.result)
+    if args.command == 'rescan':
+        print(" » " + format_rescan_report(rescan_library(args.workers, args.dry_run)))
+        return 0
+    if args.command == 'rescan-worker':
+        return rescan_worker(args.job, args.result)
+    if args.command == 'check':
+        report = check_library(args.threads)
+        if args.quarantine:
+            quarantine_orphans(report)
+        report.print_details()
+        return 1 if report.missing else 0
+    if args.command == 'duplicates':
+        report = find_duplicates(args.threads, args.workers)
+        report.print_details()
+        if args.merge:
+            props = bpy.context.scene.mt_am_props
+            removed = sum(merge_duplicates(props, group) for group in report.groups)
+            print(" » Merged %d assets" % removed)
+        return 0
+    if args.command == 'fingerprint-worker':
+        return fingerprint_worker(args.job, args.result)
+    return 1
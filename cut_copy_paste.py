@@ -1,10 +1,11 @@
 import os
-import json
 from copy import deepcopy
 from shutil import copy2
 
 import bpy
 from .preferences import get_prefs
+from .catalog import get_catalog
+from .catalog_watcher import sync_catalog
 from bpy.types import Operator
 from .utils import find_and_rename
 from .append import append_collection, append_material, append_object
@@ -55,83 +56,89 @@ class MT_OT_AM_Paste_Asset(Operator):
         asset_type = copied_asset_descs[0]["Type"]
         active_category = props.active_category
 
-        # get in memory list of asset descs
-        asset_descs = getattr(props, asset_type.lower())
-
-        # cut is simple. We just change the category in the asset description and update the .json
-        if props.cut:
-            for asset in asset_descs:
-                if asset in copied_asset_descs:
-                    asset["Category"] = active_category["Slug"]
-
-        # copy is more complex as we need to duplicate the actual asset
-        else:
-            for asset_desc in copied_asset_descs:
-                if asset_type == "OBJECTS":
+        catalog = get_catalog()
+        with catalog.lock():
+            # merge in changes other Blender instances have made so memory matches the catalog
+            sync_catalog(props, catalog)
+
+            # get in memory list of asset descs
+            asset_descs = getattr(props, asset_type.lower())
+            new_asset_descs = []
+
+            # cut is simple. We just change the category in the asset description and move it in the catalog
+            if props.cut:
+                copied_slugs = [desc["Slug"] for desc in copied_asset_descs]
+                moved = [asset_descs.get(slug) for slug in copied_slugs if slug in asset_descs]
+                catalog.move(asset_type.lower(), moved, active_category["Slug"])
+                asset_descs.move_many(copied_slugs, active_category["Slug"])
+
+            # copy is more complex as we need to duplicate the actual asset.
+            # Write each copy's files before adding it to the catalog so other
+            # instances never see a copy without files
+            else:
+                for asset_desc in copied_asset_descs:
                     # copy asset desc and update it so it has unique slug
                     new_asset_desc = self.copy_asset_desc_and_make_unique(props, asset_desc, prefs, asset_type, active_category["Slug"])
+                    try:
+                        self.write_asset_copy(context, asset_type, asset_desc, new_asset_desc)
+                    except (RuntimeError, OSError) as err:
+                        # don't leave a partly written copy behind
+                        for path_key in ("FilePath", "PreviewImagePath"):
+                            if os.path.exists(new_asset_desc[path_key]):
+                                os.remove(new_asset_desc[path_key])
+                        self.report({'WARNING'}, "Could not copy " + asset_desc["Name"] + ": " + str(err))
+                        continue
+                    # reserves the slug for the next copy
                     asset_descs.append(new_asset_desc)
+                    new_asset_descs.append(new_asset_desc)
+                catalog.insert_many(asset_type.lower(), new_asset_descs)
 
-                    # load asset into Blender
-                    asset = append_object(context, asset_desc)
-
-                    # give it a unique slug
-                    asset.name = new_asset_desc["Slug"]
+        # raise flag to update asset bar
+        props.assets_updated = True
 
-                    # save asset to a new library file
-                    bpy.data.libraries.write(
-                        new_asset_desc["FilePath"],
-                        {asset},
-                        fake_user=True)
+        return {'FINISHED'}
 
-                    # copy image file
-                    copy2(asset_desc["PreviewImagePath"], new_asset_desc["PreviewImagePath"])
+    def write_asset_copy(self, context, asset_type, asset_desc, new_asset_desc):
+        """Write the .blend file and preview image of a copy of an asset.
 
-                    # cleanup
-                    bpy.data.objects.remove(asset)
+        Raises RuntimeError if the asset can't be loaded or written and OSError if
+        the preview image can't be copied.
 
-                elif asset_type == "COLLECTIONS":
-                    new_asset_desc = self.copy_asset_desc_and_make_unique(props, asset_desc, prefs, asset_type, active_category["Slug"])
-                    asset_descs.append(new_asset_desc)
-                    ret = append_collection(context, asset_desc)
-                    asset = ret[0]
-                    asset.name = new_asset_desc["Slug"]
-                    bpy.data.libraries.write(
-                        new_asset_desc["FilePath"],
-                        {asset},
-                        fake_user=True)
-                    copy2(asset_desc["PreviewImagePath"], new_asset_desc["PreviewImagePath"])
-                    bpy.data.collections.remove(asset)
-                else:
-                    new_asset_desc = self.copy_asset_desc_and_make_unique(props, asset_desc, prefs, asset_type, active_category["Slug"])
-                    asset_descs.append(new_asset_desc)
-                    asset = append_material(context, asset_desc)
-                    asset.name = new_asset_desc["Slug"]
-                    bpy.data.libraries.write(
-                        new_asset_desc["FilePath"],
-                        {asset},
-                        fake_user=True)
-                    copy2(asset_desc["PreviewImagePath"], new_asset_desc["PreviewImagePath"])
-                    bpy.data.materials.remove(asset)
-
-        # overwrite .json file with modified list
-        json_file = os.path.join(
-            prefs.user_assets_path,
-            "data",
-            asset_type.lower() + ".json")
-
-        if os.path.exists(json_file):
-            with open(json_file, "w") as write_file:
-                json.dump(asset_descs, write_file, indent=4)
+        Args:
+            context (bpy.context): context
+            asset_type (Enum in {OBJECTS, COLLECTIONS, MATERIALS}): asset type
+            asset_desc (dict): MakeTile asset description of the asset copied
+            new_asset_desc (dict): MakeTile asset description of the copy
+        """
+        if asset_type == "OBJECTS":
+            # load asset into Blender
+            asset = append_object(context, asset_desc)
+            datablocks = bpy.data.objects
+        elif asset_type == "COLLECTIONS":
+            ret = append_collection(context, asset_desc)
+            asset = ret[0] if ret else None
+            datablocks = bpy.data.collections
         else:
-            os.makedirs(json_file)
-            with open(json_file, "w") as write_file:
-                json.dump(asset_descs, write_file, indent=4)
-
-        # raise flag to update asset bar
-        props.assets_updated = True
-
-        return {'FINISHED'}
+            asset = append_material(context, asset_desc)
+            datablocks = bpy.data.materials
+        if asset is None:
+            raise RuntimeError("not found in " + asset_desc["FilePath"])
+
+        try:
+            # give it a unique slug
+            asset.name = new_asset_desc["Slug"]
+
+            # save asset to a new library file
+            bpy.data.libraries.write(
+                new_asset_desc["FilePath"],
+                {asset},
+                fake_user=True)
+
+            # copy image file
+            copy2(asset_desc["PreviewImagePath"], new_asset_desc["PreviewImagePath"])
+        finally:
+            # cleanup
+            datablocks.remove(asset)
 
     def copy_asset_desc_and_make_unique(self, props, asset_desc, prefs, asset_type, cat_slug):
         """Copy the passed in asset description and updates its slug and other items to make it unique.
@@ -149,7 +156,7 @@ class MT_OT_AM_Paste_Asset(Operator):
         asset_descs = getattr(props, asset_type.lower())
 
         # get slugs
-        current_slugs = [desc['Slug'] for desc in asset_descs]
+        current_slugs = asset_descs.slugs()
 
         # get a new unique slug for the asset
         new_slug = find_and_rename(asset_desc["Slug"], current_slugs)
@@ -1,9 +1,10 @@
 import os
-import json
 import bpy
 from bpy.types import Operator
 from bpy.props import BoolProperty
 from .preferences import get_prefs
+from .catalog import get_catalog
+from .catalog_watcher import sync_catalog
 
 # TODO: #6 Ensure preview image is also deleted from boy.data.images
 class MT_OT_AM_Delete_Selected_Assets_from_Library(Operator):
@@ -59,10 +60,18 @@ def delete_assets(selected_assets, prefs, props, asset_type, delete_from_disk=Tr
         asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
         delete_from_disk (bool, optional): Delete .blend file containing asset from disk? Defaults to True.
     """
-    asset_descs = getattr(props, asset_type)
+    catalog = get_catalog()
+    with catalog.lock():
+        # merge in changes other Blender instances have made so memory matches the catalog
+        sync_catalog(props, catalog)
+
+        # remove deleted assets from catalog
+        catalog.delete(asset_type, selected_assets)
+
+        # remove items from in memory list
+        getattr(props, asset_type).remove_many(asset['Slug'] for asset in selected_assets)
+
     for asset in selected_assets:
-        # remove item from in memory list
-        asset_descs.remove(asset)
         # delete preview image
         if os.path.exists(asset["PreviewImagePath"]):
             os.remove(asset["PreviewImagePath"])
@@ -70,17 +79,3 @@ def delete_assets(selected_assets, prefs, props, asset_type, delete_from_disk=Tr
         if delete_from_disk:
             if os.path.exists(asset["FilePath"]):
                 os.remove(asset["FilePath"])
-
-    # overwrite .json file with modified list
-    json_file = os.path.join(
-        prefs.user_assets_path,
-        "data",
-        asset_type + ".json")
-
-    if os.path.exists(json_file):
-        with open(json_file, "w") as write_file:
-            json.dump(asset_descs, write_file, indent=4)
-    else:
-        os.makedirs(json_file)
-        with open(json_file, "w") as write_file:
-            json.dump(asset_descs, write_file, indent=4)
\ No newline at end of file
@@ -0,0 +1,427 @@
+"""Contains functions and operators for finding and merging duplicate assets.
+
+Duplicates are found in two stages. First the .blend file of every asset is
+hashed on a thread pool and assets whose files are byte identical are grouped.
+Then the objects and collections of the remaining assets whose files are
+close in size are opened in background Blender processes, which fingerprint
+their geometry from their vertex and face counts and a hash of their vertex
+coordinates rounded to GEOMETRY_PRECISION. Assets with the same fingerprint
+are grouped as geometry duplicates.
+
+File hashes and fingerprints are cached by modification time and size so later
+checks only read and open files that have changed.
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import bpy
+from bpy.types import Operator
+from bpy.props import BoolProperty, IntProperty
+from .preferences import get_prefs
+from .system import run_cli_in_background
+from .catalog import get_catalog, ASSET_TYPES, LIBRARY_DEFAULT
+from .catalog_watcher import sync_catalog
+from .append import get_datablock_asset, tag_datablock
+from .utils import get_file_hash
+
+HASH_CACHE_FILE = 'hash_cache.json'
+
+# Number of threads used to hash files
+HASH_THREADS = 8
+
+# Assets are only fingerprinted if another asset of their type has a file
+# within this fraction of their file size
+SIZE_TOLERANCE = 0.05
+
+# Vertex coordinates are rounded to this many decimal places before hashing
+GEOMETRY_PRECISION = 4
+
+# Files fingerprinted by each worker process
+FILES_PER_WORKER = 200
+
+
+class DuplicateReport:
+    """Result of a duplicate check.
+
+    Attributes:
+        file_groups (list[list[tuple(asset_type, slug)]]): assets with byte identical files
+        geometry_groups (list[list[tuple(asset_type, slug)]]): assets with the same geometry
+        hashed (int): number of files hashed rather than read from the cache
+        fingerprinted (int): number of files fingerprinted rather than read from the cache
+    """
+
+    __slots__ = ('file_groups', 'geometry_groups', 'hashed', 'fingerprinted')
+
+    def __init__(self):
+        self.file_groups = []
+        self.geometry_groups = []
+        self.hashed = 0
+        self.fingerprinted = 0
+
+    @property
+    def groups(self):
+        """All groups of duplicates, byte identical first."""
+        return self.file_groups + self.geometry_groups
+
+    def summary(self):
+        """Return a one line summary of the report."""
+        return "%d groups of identical files, %d groups of identical geometry (%d files hashed, %d fingerprinted)" % (
+            len(self.file_groups),
+            len(self.geometry_groups),
+            self.hashed,
+            self.fingerprinted)
+
+    def print_details(self):
+        """Print the groups of duplicates to the console."""
+        for kind, groups in (("File", self.file_groups), ("Geometry", self.geometry_groups)):
+            for group in groups:
+                print(" » %s duplicates: %s" % (kind, ", ".join(slug for asset_type, slug in group)))
+        print(" » " + self.summary())
+
+
+def get_geometry_fingerprint(objects, precision=GEOMETRY_PRECISION):
+    """Return a fingerprint of the mesh data of objects that is the same for identical geometry.
+
+    Args:
+        objects (list[bpy.types.Object]): objects
+        precision (int, optional): decimal places coordinates are rounded to. Defaults to GEOMETRY_PRECISION.
+
+    Returns:
+        str: fingerprint, or None if none of the objects are meshes
+    """
+    import numpy as np
+
+    fingerprints = []
+    for obj in objects:
+        mesh = obj.data
+        if not isinstance(mesh, bpy.types.Mesh):
+            continue
+        coords = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+        mesh.vertices.foreach_get('co', coords)
+        # avoids -0.0 and 0.0 hashing differently
+        quantized = np.round(coords, precision) + 0.0
+        fingerprints.append("%d_%d_%s" % (
+            len(mesh.vertices),
+            len(mesh.polygons),
+            hashlib.sha1(quantized.tobytes()).hexdigest()))
+    if not fingerprints:
+        return None
+    # objects in a collection aren't in any particular order
+    return hashlib.sha1("|".join(sorted(fingerprints)).encode('utf-8')).hexdigest()
+
+
+def fingerprint_asset(filepath, asset_type, slug):
+    """Load an object or collection asset, fingerprint its geometry and remove it again.
+
+    Args:
+        filepath (str): path to .blend file
+        asset_type (ENUM in {'objects', 'collections'}): asset type
+        slug (str): asset slug
+
+    Returns:
+        str: fingerprint, or None if the asset couldn't be loaded or has no meshes
+    """
+    try:
+        with bpy.data.libraries.load(filepath) as (data_from, data_to):
+            if slug not in getattr(data_from, asset_type):
+                return None
+            setattr(data_to, asset_type, [slug])
+    except OSError:
+        return None
+
+    loaded = getattr(data_to, asset_type)[0]
+    if asset_type == 'collections':
+        objects = list(loaded.all_objects)
+    else:
+        objects = [loaded]
+    fingerprint = get_geometry_fingerprint(objects)
+
+    # keep memory use flat over many files
+    meshes = [obj.data for obj in objects if isinstance(obj.data, bpy.types.Mesh)]
+    for obj in objects:
+        bpy.data.objects.remove(obj)
+    for mesh in meshes:
+        if mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+    if asset_type == 'collections':
+        bpy.data.collections.remove(loaded)
+    return fingerprint
+
+
+def fingerprint_worker(job_path, result_path):
+    """Fingerprint the assets in a job file and write the results. Call in a worker process.
+
+    Args:
+        job_path (str): path of .json file containing a list of [path, asset_type, slug] lists
+        result_path (str): path of .json file to write the results to
+    """
+    with open(job_path) as read_file:
+        assets = json.load(read_file)
+    fingerprints = {path: fingerprint_asset(path, asset_type, slug) for path, asset_type, slug in assets}
+    with open(result_path, "w") as write_file:
+        json.dump(fingerprints, write_file)
+    return 0
+
+
+def fingerprint_in_workers(assets, workers, data_path):
+    """Fingerprint assets split between background Blender processes.
+
+    Args:
+        assets (list[tuple(path, asset_type, slug)]): assets to fingerprint
+        workers (int): number of worker processes to run at once
+        data_path (str): folder to write job files to
+
+    Returns:
+        dict{path: str}: fingerprints, None if the asset has no geometry.
+            Assets fingerprinted by a worker that failed are left out.
+    """
+    job_folder = tempfile.mkdtemp(prefix="duplicates_", dir=data_path)
+    jobs = []
+    for i in range(0, len(assets), FILES_PER_WORKER):
+        job_path = os.path.join(job_folder, "job_%04d.json" % len(jobs))
+        with open(job_path, "w") as write_file:
+            json.dump(assets[i:i + FILES_PER_WORKER], write_file)
+        jobs.append(job_path)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(
+            lambda job_path: run_cli_in_background(
+                ['fingerprint-worker', job_path, job_path[:-len('.json')] + '_result.json'],
+                job_path[:-len('.json')] + '.log'),
+            jobs))
+
+    fingerprints = {}
+    failed = False
+    for job_path in jobs:
+        try:
+            with open(job_path[:-len('.json')] + '_result.json') as read_file:
+                fingerprints.update(json.load(read_file))
+        except OSError:
+            failed = True
+            print(" » ERROR: Fingerprint worker failed. Log kept in " + job_path[:-len('.json')] + '.log')
+
+    if not failed:
+        shutil.rmtree(job_folder, ignore_errors=True)
+    return fingerprints
+
+
+def load_hash_cache(data_path):
+    """Return the cached hashes and fingerprints of library files.
+
+    Returns:
+        dict{path: dict{MTime, Size, Hash, Fingerprint}}: cache entries by absolute path.
+            Fingerprint is missing if the file hasn't been fingerprinted.
+    """
+    try:
+        with open(os.path.join(data_path, HASH_CACHE_FILE)) as read_file:
+            return json.load(read_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_hash_cache(data_path, cache):
+    """Write the hash cache, replacing the file in one step."""
+    cache_file = os.path.join(data_path, HASH_CACHE_FILE)
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, "w") as write_file:
+        json.dump(cache, write_file)
+    os.replace(tmp_file, cache_file)
+
+
+def group_by(keys):
+    """Return groups of assets that share a key.
+
+    Assets of different types are never grouped together.
+
+    Args:
+        keys (list[tuple(tuple(asset_type, slug), key)]): assets and their keys, in library order
+
+    Returns:
+        list[list[tuple(asset_type, slug)]]: groups of two or more assets
+    """
+    groups = {}
+    for asset, key in keys:
+        if key is not None:
+            groups.setdefault((asset[0], key), []).append(asset)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def get_size_candidates(entries):
+    """Return the assets that have a file close in size to the file of another asset of their type.
+
+    Args:
+        entries (list[tuple(asset_type, slug, path, size)]): assets
+
+    Returns:
+        list[tuple(asset_type, slug, path, size)]: candidates
+    """
+    candidates = []
+    for asset_type in ASSET_TYPES:
+        typed = sorted((entry for entry in entries if entry[0] == asset_type), key=lambda entry: entry[3])
+        for i, entry in enumerate(typed):
+            size = entry[3]
+            if (i > 0 and size - typed[i - 1][3] <= size * SIZE_TOLERANCE) \
+                    or (i + 1 < len(typed) and typed[i + 1][3] - size <= typed[i + 1][3] * SIZE_TOLERANCE):
+                candidates.append(entry)
+    return candidates
+
+
+def find_duplicates(threads=HASH_THREADS, workers=1):
+    """Find assets with byte identical files or identical geometry.
+
+    Args:
+        threads (int, optional): number of threads used to hash files. Defaults to HASH_THREADS.
+        workers (int, optional): number of Blender processes used to fingerprint geometry. Defaults to 1.
+
+    Returns:
+        DuplicateReport: report
+    """
+    prefs = get_prefs()
+    data_path = os.path.join(prefs.user_assets_path, "data")
+    catalog = get_catalog()
+    cache = load_hash_cache(data_path)
+    report = DuplicateReport()
+
+    # assets that share a .blend file are told apart by slug, so only hash files once
+    entries = []
+    seen_paths = set()
+    for asset_type in ASSET_TYPES:
+        for desc in catalog.load(asset_type):
+            path = desc['FilePath']
+            if path in seen_paths:
+                continue
+            seen_paths.add(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((asset_type, desc['Slug'], path, stat))
+
+    new_cache = {}
+    to_hash = []
+    for asset_type, slug, path, stat in entries:
+        cached = cache.get(path)
+        if cached and cached['MTime'] == stat.st_mtime and cached['Size'] == stat.st_size:
+            new_cache[path] = cached
+        else:
+            to_hash.append(path)
+            new_cache[path] = {'MTime': stat.st_mtime, 'Size': stat.st_size}
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for path, file_hash in zip(to_hash, executor.map(get_file_hash, to_hash)):
+            new_cache[path]['Hash'] = file_hash
+    report.hashed = len(to_hash)
+
+    report.file_groups = group_by(
+        [((asset_type, slug), new_cache[path]['Hash']) for asset_type, slug, path, stat in entries])
+
+    # one asset of each group of identical files stands in for the rest
+    identical = set(asset for group in report.file_groups for asset in group[1:])
+    geometry_entries = [
+        (asset_type, slug, path, stat.st_size) for asset_type, slug, path, stat in entries
+        if asset_type != 'materials' and (asset_type, slug) not in identical]
+    candidates = get_size_candidates(geometry_entries)
+
+    to_fingerprint = [
+        (path, asset_type, slug) for asset_type, slug, path, size in candidates
+        if 'Fingerprint' not in new_cache[path]]
+    if to_fingerprint:
+        for path, fingerprint in fingerprint_in_workers(to_fingerprint, workers, data_path).items():
+            new_cache[path]['Fingerprint'] = fingerprint
+    report.fingerprinted = len(to_fingerprint)
+    save_hash_cache(data_path, new_cache)
+
+    report.geometry_groups = group_by(
+        [((asset_type, slug), new_cache[path].get('Fingerprint')) for asset_type, slug, path, size in candidates])
+    return report
+
+
+def merge_duplicates(props, group):
+    """Merge a group of duplicate assets into one of them.
+
+    The first asset from the default library is kept, or the first asset if
+    there is none, and the tags of the others are added to it. The others are
+    removed from the catalog and instances of them in the open file are tagged
+    as instances of the kept asset. Assets from the default library are never
+    removed and no files are touched, so the removed assets' .blend files and
+    preview images are left on disk.
+
+    Args:
+        props (mt_am_props): asset manager props
+        group (list[tuple(asset_type, slug)]): assets of one type
+
+    Returns:
+        int: number of assets removed
+    """
+    asset_type = group[0][0]
+    catalog = get_catalog()
+    with catalog.lock():
+        sync_catalog(props, catalog)
+        asset_descs = getattr(props, asset_type)
+        descs = [asset_descs.get(slug) for a_type, slug in group]
+        descs = [desc for desc in descs if desc is not None]
+        kept = next((desc for desc in descs if desc.get('Library') == LIBRARY_DEFAULT), descs[0] if descs else None)
+        merged = [desc for desc in descs if desc is not kept and desc.get('Library') != LIBRARY_DEFAULT]
+        if kept is None or not merged:
+            return 0
+
+        tags = list(kept['Tags'])
+        for desc in merged:
+            tags.extend(tag for tag in desc['Tags'] if tag not in tags)
+        kept = asset_descs.update(kept['Slug'], Tags=tags)
+        catalog.update(asset_type, kept)
+        catalog.delete(asset_type, merged)
+        asset_descs.remove_many(desc['Slug'] for desc in merged)
+
+    merged_keys = set((asset_type, desc['Slug']) for desc in merged)
+    for datablock in getattr(bpy.data, asset_type):
+        if get_datablock_asset(datablock) in merged_keys:
+            tag_datablock(datablock, kept, asset_type)
+    return len(merged)
+
+
+class MT_OT_AM_Find_Duplicates(Operator):
+    """Find assets with identical files or geometry."""
+
+    bl_idname = "scene.mt_am_find_duplicates"
+    bl_label = "Find Duplicates"
+    bl_description = "Find assets with identical files or geometry. Groups of duplicates are printed to the console"
+
+    merge: BoolProperty(
+        name="Merge Duplicates",
+        description="Keep one asset of each group, adding the tags of the others to it, and remove the others from the catalog. Bundled assets are kept and no files are deleted",
+        default=False
+    )
+
+    threads: IntProperty(
+        name="Threads",
+        description="Number of files to hash at once",
+        default=HASH_THREADS,
+        min=1
+    )
+
+    workers: IntProperty(
+        name="Worker Processes",
+        description="Number of Blender processes used to compare geometry",
+        default=1,
+        min=1
+    )
+
+    def execute(self, context):
+        report = find_duplicates(self.threads, self.workers)
+        report.print_details()
+
+        if self.merge:
+            props = context.scene.mt_am_props
+            removed = sum(merge_duplicates(props, group) for group in report.groups)
+            props.assets_updated = True
+            self.report({'INFO'}, report.summary() + ", %d assets merged" % removed)
+        else:
+            self.report({'INFO'}, report.summary())
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
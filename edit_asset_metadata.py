@@ -1,12 +1,11 @@
 import os
-import json
 import bpy
 from bpy.types import Operator
 from bpy.props import StringProperty
 from bpy.props import EnumProperty
 from .preferences import get_prefs
-from .categories import get_child_cats
 from .utils import tagify
+from .catalog import get_catalog
 
 class MT_OT_AM_Edit_Asset_Metadata(Operator):
     bl_idname = "object.mt_am_edit_asset_metadata"
@@ -58,39 +57,23 @@ class MT_OT_AM_Edit_Asset_Metadata(Operator):
         orig_asset_desc = props.current_asset_desc
         assets = getattr(props, orig_asset_desc["Type"].lower())
 
-        # remove asset from in memory list
-        assets.remove(orig_asset_desc)
-
-        # construct new asset description
-        asset_desc = {
-            "Name": self.Name,
-            "Slug": orig_asset_desc["Slug"],
-            "Category": orig_asset_desc["Category"],
-            "FileName": os.path.basename(self.FilePath),
-            "FilePath": self.FilePath,
-            "PreviewImagePath": self.PreviewImagePath,
-            "PreviewImageName": os.path.basename(self.PreviewImagePath),
-            "Description": self.Description,
-            "URI": self.URI,
-            "Author": self.Author,
-            "License": self.License,
-            "Type": orig_asset_desc["Type"],
-            "Tags": tagify(self.Tags)}
-
-        if orig_asset_desc["Type"] == "COLLECTIONS":
-            asset_desc["RootObject"] = orig_asset_desc["RootObject"]
-
-        # append new asset description
-        assets.append(asset_desc)
-
-        json_file = os.path.join(
-            prefs.user_assets_path,
-            "data",
-            orig_asset_desc["Type"].lower() + ".json")
-
-        if os.path.exists(json_file):
-            with open(json_file, "w") as write_file:
-                json.dump(assets, write_file, indent=4)
+        # update asset description in memory. Keys that aren't editable here
+        # such as RootObject are kept
+        asset_desc = assets.update(
+            orig_asset_desc["Slug"],
+            Name=self.Name,
+            FileName=os.path.basename(self.FilePath),
+            FilePath=self.FilePath,
+            PreviewImagePath=self.PreviewImagePath,
+            PreviewImageName=os.path.basename(self.PreviewImagePath),
+            Description=self.Description,
+            URI=self.URI,
+            Author=self.Author,
+            License=self.License,
+            Tags=tagify(self.Tags))
+
+        # and in catalog
+        get_catalog().update(asset_desc["Type"].lower(), asset_desc)
 
         props.assets_updated = True
         return {'FINISHED'}
@@ -0,0 +1,318 @@
+"""Contains functions and operators for recording the geometry of assets and filtering assets by it.
+
+When an object or collection asset is saved its dimensions, bounding box,
+vertex, face, material and triangle counts and file size are stored in its
+description as Stats. Coordinates and triangle counts are read from the
+evaluated mesh, so modifiers are included, with foreach_get.
+
+For filtering, the stats of every asset are held as one NumPy array per stat,
+so a range filter over the whole library is a few vectorized comparisons.
+Assets without stats, like materials, never pass a range filter. The table is
+built from the catalog once and then follows its revision log, like the search
+index, so asset types that haven't been opened aren't loaded.
+"""
+import os
+import numpy as np
+from bpy.types import Operator
+from bpy.props import EnumProperty, FloatProperty, StringProperty
+from .catalog import get_catalog, ASSET_TYPES
+
+# stats that can be filtered by, with their labels
+STAT_FIELDS = (
+    ('Width', "Width", "Size along X"),
+    ('Depth', "Depth", "Size along Y"),
+    ('Height', "Height", "Size along Z"),
+    ('Vertices', "Vertices", "Number of vertices before modifiers"),
+    ('Faces', "Faces", "Number of faces before modifiers"),
+    ('Triangles', "Triangles", "Number of triangles after modifiers"),
+    ('Materials', "Materials", "Number of materials"),
+    ('FileSize', "File Size", "Size of the .blend file in bytes"))
+
+_stats_tables = {}  # id(catalog): StatsTable
+
+
+def get_geometry_stats(context, asset, asset_type):
+    """Return the geometry stats of an object or collection.
+
+    Object dimensions are in the object's scaled local space, like
+    Object.dimensions. Collection dimensions are in world space.
+
+    Args:
+        context (bpy.context): context
+        asset (bpy.types.Object or bpy.types.Collection): asset
+        asset_type (ENUM in {'OBJECTS', 'COLLECTIONS', 'MATERIALS'}): asset type
+
+    Returns:
+        dict: stats, or None for materials
+    """
+    if asset_type == 'MATERIALS':
+        return None
+    objects = [asset] if asset_type == 'OBJECTS' else list(asset.all_objects)
+    depsgraph = context.evaluated_depsgraph_get()
+
+    coords = []
+    vertices = faces = triangles = 0
+    materials = set()
+    for obj in objects:
+        if obj.type != 'MESH':
+            continue
+        vertices += len(obj.data.vertices)
+        faces += len(obj.data.polygons)
+        materials.update(slot.material.name for slot in obj.material_slots if slot.material is not None)
+
+        obj_eval = obj.evaluated_get(depsgraph)
+        mesh = obj_eval.to_mesh()
+        mesh.calc_loop_triangles()
+        triangles += len(mesh.loop_triangles)
+        co = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+        mesh.vertices.foreach_get('co', co)
+        obj_eval.to_mesh_clear()
+
+        co = co.reshape(-1, 3)
+        if asset_type == 'OBJECTS':
+            co = co * np.array(obj.scale)
+        else:
+            matrix = np.array(obj.matrix_world)
+            co = co @ matrix[:3, :3].T + matrix[:3, 3]
+        coords.append(co)
+
+    if coords and sum(len(co) for co in coords):
+        all_coords = np.concatenate(coords)
+        bounds_min = all_coords.min(axis=0)
+        bounds_max = all_coords.max(axis=0)
+    else:
+        bounds_min = bounds_max = np.zeros(3)
+    dimensions = bounds_max - bounds_min
+
+    return {
+        'Width': float(dimensions[0]),
+        'Depth': float(dimensions[1]),
+        'Height': float(dimensions[2]),
+        'BoundsMin': [float(value) for value in bounds_min],
+        'BoundsMax': [float(value) for value in bounds_max],
+        'Vertices': vertices,
+        'Faces': faces,
+        'Triangles': triangles,
+        'Materials': len(materials),
+        'FileSize': 0}
+
+
+def set_file_size(stats, filepath):
+    """Record the size of an asset's .blend file in its stats once the file has been written."""
+    if stats is not None:
+        try:
+            stats['FileSize'] = os.path.getsize(filepath)
+        except OSError:
+            pass
+
+
+class StatsTable:
+    """The stats of every asset in the catalog, one NumPy array per stat.
+
+    Each asset with stats is given a row when it is added. Rows of removed
+    assets are set to NaN and reused, and the arrays grow by doubling, so
+    changes don't copy the table.
+
+    Attributes:
+        revision (int): catalog revision the table is synced to
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        """Empty the table."""
+        self.revision = 0
+        self._keys = []  # row: (asset_type, slug), or None for a free row
+        self._rows = {}  # (asset_type, slug): row
+        self._free_rows = []
+        self._categories = {}  # asset_type: {slug: category}
+        self._columns = {stat: np.empty(0, dtype=np.float64) for stat, name, description in STAT_FIELDS}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, asset_type, asset_desc):
+        """Add the stats of an asset description, replacing them if they are already in the table.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            asset_desc (AssetDescription): asset description
+        """
+        key = (asset_type, asset_desc['Slug'])
+        self.remove(asset_type, asset_desc['Slug'])
+        stats = asset_desc.get('Stats')
+        if not stats:
+            return
+
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = len(self._keys)
+            self._keys.append(None)
+            for stat, column in self._columns.items():
+                if row >= len(column):
+                    grown = np.full(max(16, 2 * len(column)), np.nan)
+                    grown[:len(column)] = column
+                    self._columns[stat] = grown
+        for stat, column in self._columns.items():
+            value = stats.get(stat)
+            column[row] = np.nan if value is None else value
+        self._keys[row] = key
+        self._rows[key] = row
+        self._categories.setdefault(asset_type, {})[asset_desc['Slug']] = asset_desc['Category']
+
+    def remove(self, asset_type, slug):
+        """Remove the stats of an asset from the table.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            slug (str): asset slug
+        """
+        row = self._rows.pop((asset_type, slug), None)
+        if row is None:
+            return
+        for column in self._columns.values():
+            column[row] = np.nan
+        self._keys[row] = None
+        self._free_rows.append(row)
+        del self._categories[asset_type][slug]
+
+    def rebuild(self, catalog):
+        """Add the stats of every asset description in the catalog.
+
+        Args:
+            catalog (Catalog): catalog
+        """
+        self._reset()
+        self.revision = catalog.revision()
+        # materials have no stats
+        for asset_type in ASSET_TYPES:
+            if asset_type != 'materials':
+                for desc in catalog.load(asset_type):
+                    self.add(asset_type, desc)
+
+    def sync(self, catalog):
+        """Apply the changes made to the catalog since the table was last synced.
+
+        Args:
+            catalog (Catalog): catalog
+        """
+        revision = catalog.revision()
+        if revision == self.revision:
+            return
+        changes = catalog.changes_since(self.revision) if revision > self.revision else None
+        if changes is None:
+            self.rebuild(catalog)
+            return
+
+        for asset_type, change in changes.items():
+            for slug in change.removed_slugs(self._categories.get(asset_type, {})):
+                self.remove(asset_type, slug)
+            for desc in change.upserted:
+                self.add(asset_type, desc)
+        self.revision = revision
+
+    def query(self, ranges):
+        """Return the assets with stats inside every range.
+
+        Args:
+            ranges (iterable[tuple(stat, float, float)]): stat and inclusive minimum and maximum
+
+        Returns:
+            list[tuple(asset_type, slug)]: assets
+        """
+        rows = len(self._keys)
+        mask = np.ones(rows, dtype=bool)
+        for stat, minimum, maximum in ranges:
+            column = self._columns[stat][:rows]
+            # comparisons with NaN are False so free rows and assets without the stat are left out
+            mask &= (column >= minimum) & (column <= maximum)
+        keys = self._keys
+        return [keys[i] for i in np.flatnonzero(mask)]
+
+
+def get_stats_table():
+    """Return the stats table of the user library synced to the catalog.
+
+    Returns:
+        StatsTable: table
+    """
+    catalog = get_catalog()
+    table = _stats_tables.get(id(catalog))
+    if table is None:
+        table = _stats_tables[id(catalog)] = StatsTable()
+    if catalog.exists():
+        table.sync(catalog)
+    return table
+
+
+def get_active_ranges(props):
+    """Return the range filters, usable as a dict key.
+
+    Returns:
+        tuple(tuple(stat, float, float)): stat and inclusive minimum and maximum
+    """
+    return tuple(sorted((stat, minimum, maximum) for stat, (minimum, maximum) in props.range_filters.items()))
+
+
+def format_range(stat, minimum, maximum):
+    """Return a label for a range filter."""
+    name = next(name for field, name, description in STAT_FIELDS if field == stat)
+    return "%s %g - %g" % (name, minimum, maximum)
+
+
+class MT_OT_AM_Add_Range_Filter(Operator):
+    """Only show assets with a geometry stat in a range in the asset bar."""
+
+    bl_idname = "scene.mt_am_add_range_filter"
+    bl_label = "Add Range Filter"
+    bl_description = "Only show assets whose dimensions, face count etc. are within a range"
+    bl_options = {'INTERNAL'}
+
+    stat: EnumProperty(
+        name="Stat",
+        items=STAT_FIELDS,
+        default='Width'
+    )
+
+    minimum: FloatProperty(
+        name="Min",
+        default=0
+    )
+
+    maximum: FloatProperty(
+        name="Max",
+        default=1
+    )
+
+    def execute(self, context):
+        props = context.scene.mt_am_props
+        props.range_filters[self.stat] = (min(self.minimum, self.maximum), max(self.minimum, self.maximum))
+        props.search_page = 0
+        props.assets_updated = True
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+
+class MT_OT_AM_Remove_Range_Filter(Operator):
+    """Stop filtering the asset bar by a geometry stat."""
+
+    bl_idname = "scene.mt_am_remove_range_filter"
+    bl_label = "Remove Range Filter"
+    bl_description = "Remove this range filter"
+    bl_options = {'INTERNAL'}
+
+    stat: StringProperty(
+        name="Stat",
+        default=""
+    )
+
+    def execute(self, context):
+        props = context.scene.mt_am_props
+        props.range_filters.pop(self.stat, None)
+        props.search_page = 0
+        props.assets_updated = True
+        return {'FINISHED'}
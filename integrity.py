@@ -0,0 +1,221 @@
+"""Contains functions and operators for checking the files of the asset library.
+
+The check makes sure that the FilePath and PreviewImagePath of every asset
+description exist and that every .blend and .png file in the objects, materials
+and collections folders of the user library belongs to an asset. Files that don't
+are orphans and can be moved to a quarantine folder.
+
+All files are stat'ed on a thread pool, as on a network share the time taken
+is dominated by waiting for each stat call to return.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from bpy.types import Operator
+from bpy.props import BoolProperty, IntProperty
+from .preferences import get_prefs
+from .catalog import get_catalog, ASSET_TYPES
+
+# Number of threads used to stat files
+STAT_THREADS = 32
+
+ASSET_FILE_EXTENSIONS = ('.blend', '.png')
+
+
+class IntegrityReport:
+    """Result of a library integrity check.
+
+    Attributes:
+        missing (list[tuple(asset_type, slug, path)]): referenced files that don't exist
+        orphans (list[str]): files in the user library that no asset references
+        referenced_count (int): number of referenced files that exist
+        referenced_size (int): total size of referenced files in bytes
+        orphan_size (int): total size of orphan files in bytes
+        quarantine_path (str): folder orphans were moved to, or None
+    """
+
+    __slots__ = ('missing', 'orphans', 'referenced_count', 'referenced_size', 'orphan_size', 'quarantine_path')
+
+    def __init__(self):
+        self.missing = []
+        self.orphans = []
+        self.referenced_count = 0
+        self.referenced_size = 0
+        self.orphan_size = 0
+        self.quarantine_path = None
+
+    def summary(self):
+        """Return a one line summary of the report."""
+        summary = "%d files OK (%.1f MB), %d missing, %d orphans (%.1f MB)" % (
+            self.referenced_count,
+            self.referenced_size / 1048576,
+            len(self.missing),
+            len(self.orphans),
+            self.orphan_size / 1048576)
+        if self.quarantine_path:
+            summary += ", orphans moved to " + self.quarantine_path
+        return summary
+
+    def print_details(self):
+        """Print the missing and orphan files to the console."""
+        for asset_type, slug, path in self.missing:
+            print(" » Missing: %s %s %s" % (asset_type, slug, path))
+        for path in self.orphans:
+            print(" » Orphan: " + path)
+        print(" » " + self.summary())
+
+
+def stat_size(path):
+    """Return the size of a file, or None if it doesn't exist."""
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+
+def list_library_files(assets_path):
+    """Return the asset and preview image files in the asset type folders of the user library.
+
+    Args:
+        assets_path (str): user assets path
+
+    Returns:
+        list[str]: paths
+    """
+    files = []
+    for asset_type in ASSET_TYPES:
+        type_path = os.path.join(assets_path, asset_type)
+        try:
+            with os.scandir(type_path) as entries:
+                files.extend(
+                    entry.path for entry in entries
+                    if entry.name.lower().endswith(ASSET_FILE_EXTENSIONS) and entry.is_file())
+        except OSError:
+            continue
+    return files
+
+
+def get_referenced_files(catalog):
+    """Return the asset and preview image files of every asset description in the catalog.
+
+    Returns:
+        list[tuple(asset_type, slug, path)]: referenced files
+    """
+    referenced = []
+    for asset_type in ASSET_TYPES:
+        for desc in catalog.load(asset_type):
+            for path_key in ('FilePath', 'PreviewImagePath'):
+                referenced.append((asset_type, desc['Slug'], desc[path_key]))
+    return referenced
+
+
+def check_library(threads=STAT_THREADS):
+    """Check that the files referenced by the catalog exist and find orphan files in the user library.
+
+    Args:
+        threads (int, optional): number of threads used to stat files. Defaults to STAT_THREADS.
+
+    Returns:
+        IntegrityReport: report
+    """
+    prefs = get_prefs()
+    assets_path = prefs.user_assets_path
+    catalog = get_catalog()
+
+    referenced = get_referenced_files(catalog)
+    on_disk = list_library_files(assets_path)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        referenced_sizes = list(executor.map(stat_size, [path for a_type, slug, path in referenced]))
+        on_disk_sizes = list(executor.map(stat_size, on_disk))
+
+    report = IntegrityReport()
+    referenced_paths = set()
+    for (asset_type, slug, path), size in zip(referenced, referenced_sizes):
+        norm_path = os.path.normcase(os.path.normpath(path))
+        if size is None:
+            report.missing.append((asset_type, slug, path))
+        elif norm_path not in referenced_paths:
+            report.referenced_count += 1
+            report.referenced_size += size
+        referenced_paths.add(norm_path)
+
+    for path, size in zip(on_disk, on_disk_sizes):
+        if size is not None and os.path.normcase(os.path.normpath(path)) not in referenced_paths:
+            report.orphans.append(path)
+            report.orphan_size += size
+
+    return report
+
+
+def quarantine_orphans(report):
+    """Move the orphan files in a report to a new folder in the quarantine folder of the user library.
+
+    The folder structure of the library is kept so files can be moved back.
+
+    Args:
+        report (IntegrityReport): report
+    """
+    if not report.orphans:
+        return
+
+    prefs = get_prefs()
+    assets_path = prefs.user_assets_path
+    quarantine_path = os.path.join(
+        assets_path,
+        "quarantine",
+        time.strftime("%Y%m%d-%H%M%S"))
+
+    catalog = get_catalog()
+    with catalog.lock():
+        # skip files that belong to assets added by other Blender instances since the check
+        referenced_paths = set(
+            os.path.normcase(os.path.normpath(path)) for a_type, slug, path in get_referenced_files(catalog))
+        for path in report.orphans:
+            if os.path.normcase(os.path.normpath(path)) in referenced_paths:
+                continue
+            dest = os.path.join(quarantine_path, os.path.relpath(path, assets_path))
+            if not os.path.exists(os.path.dirname(dest)):
+                os.makedirs(os.path.dirname(dest))
+            try:
+                os.replace(path, dest)
+            except OSError as err:
+                print(" » Could not quarantine %s: %s" % (path, err))
+
+    report.quarantine_path = quarantine_path
+
+
+class MT_OT_AM_Check_Library_Integrity(Operator):
+    """Check for missing and orphan asset files."""
+
+    bl_idname = "scene.mt_am_check_library_integrity"
+    bl_label = "Check Library"
+    bl_description = "Check that all asset files exist and find files that don't belong to an asset. Details are printed to the console"
+
+    quarantine: BoolProperty(
+        name="Quarantine Orphans",
+        description="Move files that don't belong to an asset to the quarantine folder of the user library",
+        default=False
+    )
+
+    threads: IntProperty(
+        name="Threads",
+        description="Number of files to check at once",
+        default=STAT_THREADS,
+        min=1
+    )
+
+    def execute(self, context):
+        report = check_library(self.threads)
+        if self.quarantine:
+            quarantine_orphans(report)
+        report.print_details()
+
+        if report.missing:
+            self.report({'WARNING'}, report.summary())
+        else:
+            self.report({'INFO'}, report.summary())
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
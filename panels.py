@@ -1,6 +1,22 @@
 import bpy
 from bpy.types import Panel
-from .categories import load_categories
+from .categories import load_category_tree
+from .usage import (
+    VIRTUAL_CATEGORIES,
+    RECENT_SLUG,
+    FREQUENT_SLUG,
+    IN_FILE_SLUG,
+    is_virtual_category,
+    get_used_assets,
+    get_scene_asset_index)
+from .catalog import ASSET_TYPES
+from .search import search_assets, get_facet_counts, SEARCH_PAGE_SIZE, FACETS, FACET_VALUES_SHOWN
+from .geometry_stats import get_active_ranges, format_range
+
+VIRTUAL_CATEGORY_ICONS = {
+    RECENT_SLUG: 'TIME',
+    FREQUENT_SLUG: 'SOLO_ON',
+    IN_FILE_SLUG: 'FILE_BLEND'}
 
 
 class MT_PT_AM_Main_Panel(Panel):
@@ -16,29 +32,117 @@ class MT_PT_AM_Main_Panel(Panel):
         scene = context.scene
         props = context.scene.mt_am_props
         active_category = props.active_category
-        try:
-            child_cats = props['child_cats']
-            if active_category is None and len(child_cats) == 0:
-                child_cats = load_categories()
-        except KeyError:
-            child_cats = load_categories()
+        child_cats = props.child_cats
+        if active_category is None and len(child_cats) == 0:
+            child_cats = load_category_tree().roots
 
         layout = self.layout
 
-        if active_category is not None:
+        row = layout.row(align=True)
+        row.prop(props, 'search_text', text="", icon='VIEWZOOM')
+        row.prop(props, 'fuzzy_search', text="", icon='SORTALPHA')
+        if props.search_text.strip():
+            results, total = search_assets(props, props.search_text, props.search_page)
+            first = props.search_page * SEARCH_PAGE_SIZE
+            row = layout.row()
+            if total:
+                row.label(text="%d-%d of %d" % (first + 1, first + len(results), total))
+            else:
+                row.label(text="No results")
+            sub = row.row(align=True)
+            sub.enabled = props.search_page > 0
+            sub.operator('scene.mt_am_search_page', text="", icon='TRIA_LEFT').step = -1
+            sub = row.row(align=True)
+            sub.enabled = first + len(results) < total
+            sub.operator('scene.mt_am_search_page', text="", icon='TRIA_RIGHT').step = 1
+
+        if active_category is not None and is_virtual_category(active_category['Slug']):
+            layout.operator('view3d.mt_ret_to_parent', text=active_category['Name'], icon='FILE_PARENT')
+            if active_category['Slug'] == IN_FILE_SLUG:
+                # instance counts of the assets in the asset bar
+                counts = get_scene_asset_index(scene).counts
+                col = layout.column(align=True)
+                for asset_desc in get_used_assets(props, IN_FILE_SLUG):
+                    count = counts.get((asset_desc['Type'].lower(), asset_desc['Slug']), 0)
+                    col.label(text="%s (%d)" % (asset_desc['Name'], count))
+        elif active_category is not None:
             op = layout.operator('view3d.mt_ret_to_parent', text=active_category['Name'], icon='FILE_PARENT')
 
+            layout.prop(props, 'asset_order', text="Sort By")
+
             row = layout.row()
             row.label(text='Categories')
+            row.prop(props, 'include_subcategories', text="", icon='OUTLINER')
             row.operator('scene.mt_am_add_category', text="", icon='ADD')
         else:
+            col = layout.column(align=True)
+            for cat in VIRTUAL_CATEGORIES:
+                op = col.operator("view3d.mt_asset_bar", text=cat["Name"], icon=VIRTUAL_CATEGORY_ICONS[cat["Slug"]])
+                op.category_slug = cat["Slug"]
             layout.label(text='Categories')
 
         for cat in child_cats:
             cat_text = cat["Name"]
+            # only show counts of asset types that are loaded so drawing the panel doesn't read the catalog
+            asset_type = cat.get("Contains", "").lower()
+            if asset_type in ASSET_TYPES and props.asset_descs_loaded(asset_type):
+                asset_descs = getattr(props, asset_type)
+                if props.include_subcategories:
+                    count = sum(asset_descs.count(slug) for slug in props.categories.subtree(cat["Slug"]))
+                else:
+                    count = asset_descs.count(cat["Slug"])
+                cat_text += " (%d)" % count
             row = layout.row()
             op = row.operator("view3d.mt_asset_bar", text=cat_text, icon="FILE_FOLDER")
             op.category_slug = cat["Slug"]
             if cat["Parent"]:
                 del_op = row.operator("view3d.mt_delete_category", text="", icon="REMOVE")
                 del_op.category_slug = cat["Slug"]
+
+
+class MT_PT_AM_Filter_Panel(Panel):
+    """Facet and range filters for the assets shown in the asset bar."""
+
+    bl_category = "Asset Manager"
+    bl_idname = "MT_PT_AM_Filter_Panel"
+    bl_parent_id = "MT_PT_AM_Main_Panel"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_label = "Filters"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        props = context.scene.mt_am_props
+        layout = self.layout
+        filters = props.facet_filters
+
+        if any(filters.values()) or props.range_filters:
+            layout.operator('scene.mt_am_clear_filters', icon='X')
+
+        layout.label(text="Geometry")
+        col = layout.column(align=True)
+        for stat, minimum, maximum in get_active_ranges(props):
+            row = col.row(align=True)
+            row.label(text=format_range(stat, minimum, maximum))
+            row.operator('scene.mt_am_remove_range_filter', text="", icon='X').stat = stat
+        col.operator('scene.mt_am_add_range_filter', icon='ADD')
+
+        facet_counts = get_facet_counts(props)
+        for facet in FACETS:
+            chosen = filters.get(facet, set())
+            # always show chosen values so they can be unchosen
+            shown = facet_counts[facet][:FACET_VALUES_SHOWN]
+            shown_values = set(value for value, count in shown)
+            shown.extend((value, 0) for value in sorted(chosen) if value not in shown_values)
+            if not shown:
+                continue
+
+            layout.label(text=facet)
+            col = layout.column(align=True)
+            for value, count in shown:
+                op = col.operator(
+                    'scene.mt_am_toggle_filter',
+                    text="%s (%d)" % (value, count),
+                    depress=value in chosen)
+                op.facet = facet
+                op.value = value
@@ -25,7 +25,8 @@ from bpy.props import (
     FloatVectorProperty,
     FloatProperty,
     IntProperty,
-    BoolProperty)
+    BoolProperty,
+    EnumProperty)
 
 
 class MT_AM_Prefs(bpy.types.AddonPreferences):
@@ -199,9 +200,24 @@ class MT_AM_Prefs(bpy.types.AddonPreferences):
         description="Use GPU for preview renders"
     )
 
+    catalog_layout: EnumProperty(
+        name="Catalog Layout",
+        items=[
+            ("SQLITE", "Database", "Store the asset catalog in a single SQLite database"),
+            ("SHARDED", "Per Category Files", "Store the asset catalog as one .json file per category")],
+        default="SQLITE",
+        description="How the asset catalog is stored on disk"
+    )
+
     def draw(self, context):
         layout = self.layout
         layout.prop(self, 'user_assets_path')
+        layout.prop(self, 'catalog_layout')
+        layout.operator('scene.mt_am_export_catalog', text="Export Catalog to .json")
+        layout.operator('scene.mt_am_rescan_library', text="Rescan Library")
+        layout.operator('scene.mt_am_check_library_integrity', text="Check Library")
+        layout.operator('scene.mt_am_find_duplicates', text="Find Duplicates")
+        layout.operator('scene.mt_am_hash_preview_images', text="Hash Preview Images")
 
 # TODO: Stub - reload_asset_libraries
 def reload_asset_libraries():
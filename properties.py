@@ -1,7 +1,10 @@
 import math
 import bpy
 from bpy.types import PropertyGroup
-from bpy.props import StringProperty, BoolProperty, EnumProperty, PointerProperty
+from bpy.props import StringProperty, BoolProperty, EnumProperty, PointerProperty, IntProperty
+from .catalog import load_asset_descs
+from .asset_list import AssetList
+from .categories import CategoryTree
 
 def get_cat_enums():
     mt_cats = [
@@ -21,6 +24,16 @@ def get_license_enums():
     return mt_licenses
 
 
+def get_asset_order_enums():
+    mt_orders = [
+        ("LIBRARY", "Library Order", "Order assets were added to the library in"),
+        ("NAME", "Name", "Alphabetical order"),
+        ("DATE_ADDED", "Date Added", "Newest first"),
+        ("FILE_SIZE", "File Size", "Largest first"),
+        ("MOST_USED", "Most Used", "Most used first")]
+    return mt_orders
+
+
 def get_type_enums():
     mt_types = [
         ("OBJECT", "Object", ""),
@@ -29,6 +42,21 @@ def get_type_enums():
     return mt_types
 
 
+def update_asset_bar(self, context):
+    """Reinitialise the assets in the asset bar."""
+    self.assets_updated = True
+
+
+def update_search(self, context):
+    """Show the search results in the asset bar, opening it if it isn't shown."""
+    self.search_page = 0
+    if self.asset_bar:
+        self.assets_updated = True
+    elif self.search_text.strip():
+        slug = self.active_category['Slug'] if self.active_category else ""
+        bpy.ops.view3d.mt_asset_bar('INVOKE_DEFAULT', category_slug=slug)
+
+
 class MT_PT_AM_Props(PropertyGroup):
     assets_updated: BoolProperty(
         name="Assets Updated",
@@ -48,15 +76,66 @@ class MT_PT_AM_Props(PropertyGroup):
         description="Whether we are in asset cut mode."
     )
 
-    _categories = []
+    include_subcategories: BoolProperty(
+        name="Include Subcategories",
+        default=False,
+        description="Show the assets in all subcategories of the active category in the asset bar",
+        update=update_asset_bar
+    )
+
+    asset_order: EnumProperty(
+        items=get_asset_order_enums(),
+        name="Sort By",
+        default="LIBRARY",
+        description="Order of the assets in a category in the asset bar. Search results are shown best match first",
+        update=update_asset_bar
+    )
+
+    search_text: StringProperty(
+        name="Search",
+        default="",
+        description="Search asset names, tags, authors and descriptions",
+        options={'TEXTEDIT_UPDATE'},
+        update=update_search
+    )
+
+    fuzzy_search: BoolProperty(
+        name="Fuzzy Search",
+        default=False,
+        description="Also find assets whose names or tags are spelt similarly to the search words",
+        update=update_search
+    )
+
+    search_page: IntProperty(
+        name="Search Page",
+        default=0,
+        min=0,
+        description="The page of search results shown in the asset bar"
+    )
+
+    _categories = CategoryTree()
     _child_cats = []
-    _objects = []
-    _materials = []
-    _collections = []
+    # asset descriptions are loaded from the catalog the first time they are accessed
+    _objects = None
+    _materials = None
+    _collections = None
     _current_asset_desc = None
     _asset_bar = []
     _copied_assets = None
     _active_category = None
+    _facet_filters = {}
+    _range_filters = {}
+
+    def asset_descs_loaded(self, asset_type):
+        """Return whether the asset descriptions of asset_type have been loaded from the catalog.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+
+        Returns:
+            bool: loaded
+        """
+        return getattr(MT_PT_AM_Props, '_' + asset_type) is not None
 
     @property
     def active_category(self):
@@ -66,6 +145,16 @@ class MT_PT_AM_Props(PropertyGroup):
     def active_category(self, value):
         MT_PT_AM_Props._active_category = value
 
+    @property
+    def facet_filters(self):
+        """dict{facet: set[str]}: facet values chosen to filter the asset bar by."""
+        return MT_PT_AM_Props._facet_filters
+
+    @property
+    def range_filters(self):
+        """dict{stat: tuple(float, float)}: ranges of geometry stats to filter the asset bar by."""
+        return MT_PT_AM_Props._range_filters
+
     @property
     def copied_assets(self):
         return MT_PT_AM_Props._copied_assets
@@ -108,6 +197,8 @@ class MT_PT_AM_Props(PropertyGroup):
 
     @property
     def objects(self):
+        if MT_PT_AM_Props._objects is None:
+            MT_PT_AM_Props._objects = AssetList(load_asset_descs('objects'))
         return MT_PT_AM_Props._objects
 
     @objects.setter
@@ -116,6 +207,8 @@ class MT_PT_AM_Props(PropertyGroup):
 
     @property
     def materials(self):
+        if MT_PT_AM_Props._materials is None:
+            MT_PT_AM_Props._materials = AssetList(load_asset_descs('materials'))
         return MT_PT_AM_Props._materials
 
     @materials.setter
@@ -124,6 +217,8 @@ class MT_PT_AM_Props(PropertyGroup):
 
     @property
     def collections(self):
+        if MT_PT_AM_Props._collections is None:
+            MT_PT_AM_Props._collections = AssetList(load_asset_descs('collections'))
         return MT_PT_AM_Props._collections
 
     @collections.setter
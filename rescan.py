@@ -0,0 +1,345 @@
+"""Contains functions and operators for rebuilding the catalog from the asset files in the user library.
+
+Each .blend file in the objects, materials and collections folders of the user
+library is opened in listing only mode, which reads the names of the data blocks
+it contains without loading any of them. The names are reconciled against the
+catalog: descriptions whose file is missing or no longer contains a data block
+named after their slug are removed, and files containing a data block named after
+the file that aren't in the catalog are added to the root category of their type.
+Files that exist but can't be listed, e.g. because they are being written or were
+saved by a newer Blender, are only reported and their descriptions are kept.
+
+The listing of each file is cached by modification time and size so later rescans
+only open files that have changed. Files can be listed by several background
+Blender processes at once.
+"""
+import os
+import json
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import bpy
+from bpy.types import Operator
+from bpy.props import BoolProperty, IntProperty
+from .preferences import get_prefs
+from .system import run_cli_in_background
+from .catalog import get_catalog, ASSET_TYPES, LIBRARY_USER
+from .app_handlers import reset_asset_descriptions
+from .save_asset.add_to_library import make_asset_description
+
+SCAN_CACHE_FILE = 'scan_cache.json'
+
+# Files listed by each worker process. Listing a file is quick compared to
+# starting Blender so each worker is given many files.
+FILES_PER_WORKER = 500
+
+
+def list_datablocks(filepath, asset_type):
+    """Return the names of the data blocks of asset_type in a .blend file without loading them.
+
+    Args:
+        filepath (str): path to .blend file
+        asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+
+    Returns:
+        list[str]: data block names, or None if the file can't be read
+    """
+    try:
+        # nothing is assigned to data_to so nothing is loaded
+        with bpy.data.libraries.load(filepath) as (data_from, data_to):
+            return list(getattr(data_from, asset_type))
+    except OSError:
+        return None
+
+
+def list_files(files):
+    """Return the data block names in each file.
+
+    Args:
+        files (list[tuple(path, asset_type)]): files to list
+
+    Returns:
+        dict{path: list[str]}: data block names, None if the file can't be read
+    """
+    return {path: list_datablocks(path, asset_type) for path, asset_type in files}
+
+
+def rescan_worker(job_path, result_path):
+    """List the files in a job file and write the results. Call in a worker process.
+
+    Args:
+        job_path (str): path of .json file containing a list of [path, asset_type] pairs
+        result_path (str): path of .json file to write the results to
+    """
+    with open(job_path) as read_file:
+        files = json.load(read_file)
+    with open(result_path, "w") as write_file:
+        json.dump(list_files(files), write_file)
+    return 0
+
+
+def list_files_in_workers(files, workers, data_path):
+    """List files split between background Blender processes.
+
+    Args:
+        files (list[tuple(path, asset_type)]): files to list
+        workers (int): number of worker processes to run at once
+        data_path (str): folder to write job files to
+
+    Returns:
+        dict{path: list[str]}: data block names, None if the file can't be read.
+            Files listed by a worker that failed are left out.
+    """
+    job_folder = tempfile.mkdtemp(prefix="rescan_", dir=data_path)
+    jobs = []
+    for i in range(0, len(files), FILES_PER_WORKER):
+        job_path = os.path.join(job_folder, "job_%04d.json" % len(jobs))
+        with open(job_path, "w") as write_file:
+            json.dump(files[i:i + FILES_PER_WORKER], write_file)
+        jobs.append(job_path)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(
+            lambda job_path: run_cli_in_background(
+                ['rescan-worker', job_path, job_path[:-len('.json')] + '_result.json'],
+                job_path[:-len('.json')] + '.log'),
+            jobs))
+
+    listings = {}
+    failed = False
+    for job_path in jobs:
+        try:
+            with open(job_path[:-len('.json')] + '_result.json') as read_file:
+                listings.update(json.load(read_file))
+        except OSError:
+            failed = True
+            print(" » ERROR: Rescan worker failed. Log kept in " + job_path[:-len('.json')] + '.log')
+
+    if not failed:
+        shutil.rmtree(job_folder, ignore_errors=True)
+    return listings
+
+
+def load_scan_cache(data_path):
+    """Return the cached data block listings of library files.
+
+    Returns:
+        dict{relpath: dict{MTime, Size, DataBlocks}}: listings by path relative to the user assets path
+    """
+    try:
+        with open(os.path.join(data_path, SCAN_CACHE_FILE)) as read_file:
+            return json.load(read_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_scan_cache(data_path, cache):
+    """Write the scan cache, replacing the file in one step."""
+    cache_file = os.path.join(data_path, SCAN_CACHE_FILE)
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, "w") as write_file:
+        json.dump(cache, write_file)
+    os.replace(tmp_file, cache_file)
+
+
+def scan_library(assets_path, extra_files=(), workers=1):
+    """Return the data blocks in the asset files of the user library.
+
+    Files whose modification time and size haven't changed since the last scan are
+    read from the scan cache.
+
+    Args:
+        assets_path (str): user assets path
+        extra_files (list[tuple(path, asset_type)]): files outside the asset type folders to scan
+        workers (int, optional): number of worker processes. Files are listed in this
+            process if 1. Defaults to 1.
+
+    Returns:
+        tuple(dict{path: list[str]}, int): data block names by absolute path, None
+            if the file can't be read, and the number of files opened
+    """
+    data_path = os.path.join(assets_path, "data")
+    cache = load_scan_cache(data_path)
+
+    files = []
+    for asset_type in ASSET_TYPES:
+        type_path = os.path.join(assets_path, asset_type)
+        if os.path.isdir(type_path):
+            files.extend(
+                (os.path.join(type_path, name), asset_type)
+                for name in sorted(os.listdir(type_path)) if name.endswith('.blend'))
+    files.extend(extra_files)
+
+    listings = {}
+    stats = {}
+    to_list = []
+    for path, asset_type in files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        relpath = os.path.relpath(path, assets_path)
+        stats[relpath] = (stat.st_mtime, stat.st_size)
+        cached = cache.get(relpath)
+        if cached and cached['MTime'] == stat.st_mtime and cached['Size'] == stat.st_size:
+            listings[path] = cached['DataBlocks']
+        else:
+            to_list.append((path, asset_type))
+
+    if workers > 1 and len(to_list) > FILES_PER_WORKER:
+        listed = list_files_in_workers(to_list, workers, data_path)
+    else:
+        listed = list_files(to_list)
+    listings.update(listed)
+
+    # only keep cache entries of files that still exist and could be read
+    new_cache = {}
+    for path, names in listings.items():
+        relpath = os.path.relpath(path, assets_path)
+        if names is not None:
+            mtime, size = stats[relpath]
+            new_cache[relpath] = {'MTime': mtime, 'Size': size, 'DataBlocks': names}
+    save_scan_cache(data_path, new_cache)
+
+    return listings, len(listed)
+
+
+def new_asset_description(slug, asset_type, asset_save_path):
+    """Return a description for an asset file found in the library that isn't in the catalog."""
+    return make_asset_description(
+        slug,
+        slug,
+        asset_type,
+        asset_type,
+        asset_save_path,
+        Description="",
+        URI="",
+        Author="",
+        License="All Rights Reserved",
+        Tags=[])
+
+
+def rescan_library(workers=1, dry_run=False):
+    """Rebuild the user library part of the catalog from the asset files on disk.
+
+    Bundled assets are left as they are.
+
+    Args:
+        workers (int, optional): number of worker processes used to list files. Defaults to 1.
+        dry_run (bool, optional): Only report what would change. Defaults to False.
+
+    Returns:
+        dict{Scanned, Cached, Added, Removed, Unreadable}: number of files and
+            asset descriptions in each state
+    """
+    prefs = get_prefs()
+    assets_path = prefs.user_assets_path
+    catalog = get_catalog()
+
+    # descriptions that point outside their asset type folder
+    extra_files = []
+    for asset_type in ASSET_TYPES:
+        type_path = os.path.join(assets_path, asset_type)
+        for desc in catalog.load(asset_type):
+            if desc.get('Library', LIBRARY_USER) == LIBRARY_USER \
+                    and os.path.dirname(desc['FilePath']) != type_path:
+                extra_files.append((desc['FilePath'], asset_type))
+
+    listings, listed = scan_library(assets_path, extra_files, workers)
+    report = {
+        'Scanned': listed,
+        'Cached': len(listings) - listed,
+        'Added': 0,
+        'Removed': 0,
+        'Unreadable': sum(1 for names in listings.values() if names is None)}
+
+    # reconcile holding the lock so the catalog can't change under us.
+    # Files added since the scan aren't in listings and are left alone
+    with catalog.lock():
+        for asset_type in ASSET_TYPES:
+            type_path = os.path.join(assets_path, asset_type)
+            descs = catalog.load(asset_type)
+
+            removed = []
+            kept_slugs = set()
+            for desc in descs:
+                if desc.get('Library', LIBRARY_USER) == LIBRARY_USER:
+                    path = desc['FilePath']
+                    exists = os.path.exists(path)
+                    names = listings.get(path)
+                    # unreadable files are left alone as they may only be locked or partly written
+                    if not exists or (names is not None and desc['Slug'] not in names):
+                        removed.append(desc)
+                        continue
+                kept_slugs.add(desc['Slug'])
+
+            added = []
+            for path, names in listings.items():
+                if os.path.dirname(path) != type_path or not names:
+                    continue
+                slug = os.path.splitext(os.path.basename(path))[0]
+                if slug not in kept_slugs and slug in names:
+                    added.append(new_asset_description(slug, asset_type, type_path))
+                    kept_slugs.add(slug)
+
+            report['Removed'] += len(removed)
+            report['Added'] += len(added)
+            if dry_run:
+                for desc in removed:
+                    print(" » Would remove %s (%s)" % (desc['Slug'], desc['FilePath']))
+                for desc in added:
+                    print(" » Would add %s (%s)" % (desc['Slug'], desc['FilePath']))
+                continue
+
+            if removed:
+                catalog.delete(asset_type, removed)
+            if added:
+                catalog.insert_many(asset_type, added, replace=False)
+
+    return report
+
+
+def format_rescan_report(report):
+    """Return a one line summary of a rescan report."""
+    return "Scanned %d files (%d unchanged), added %d, removed %d, %d unreadable" % (
+        report['Scanned'] + report['Cached'],
+        report['Cached'],
+        report['Added'],
+        report['Removed'],
+        report['Unreadable'])
+
+
+class MT_OT_AM_Rescan_Library(Operator):
+    """Rebuild the catalog from the asset files in the user library."""
+
+    bl_idname = "scene.mt_am_rescan_library"
+    bl_label = "Rescan Library"
+    bl_description = "Add asset files missing from the catalog and remove assets whose files are missing"
+
+    workers: IntProperty(
+        name="Worker Processes",
+        description="Number of Blender processes used to read asset files",
+        default=1,
+        min=1
+    )
+
+    dry_run: BoolProperty(
+        name="Dry Run",
+        description="Only report what would change in the console",
+        default=False
+    )
+
+    def execute(self, context):
+        report = rescan_library(self.workers, self.dry_run)
+
+        if not self.dry_run:
+            # reload asset descriptions from the catalog
+            props = context.scene.mt_am_props
+            reset_asset_descriptions(props, ASSET_TYPES)
+            props.assets_updated = True
+
+        self.report({'INFO'}, format_rescan_report(report))
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
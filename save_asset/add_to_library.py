@@ -1,10 +1,14 @@
 """Contains helper fiunctions for adding assets to MakeTile library..."""
 
 import os
-import json
+import time
 import bpy
 from ..utils import slugify, tagify, find_and_rename
 from ..preferences import get_prefs
+from ..catalog import get_catalog
+from ..catalog_watcher import sync_catalog
+from ..similar import get_preview_hash
+from ..geometry_stats import get_geometry_stats, set_file_size
 
 
 def create_preview_obj_enums(self, context):
@@ -101,50 +105,84 @@ def add_asset_to_library(self, context, asset, asset_type, asset_desc):
         asset_type.lower()
     )
 
-    json_path = os.path.join(
-        assets_path,
-        "data"
-    )
+    # used to find assets that look similar
+    preview_hash = get_preview_hash(asset_desc['PreviewImagePath'])
+    if preview_hash:
+        asset_desc['PreviewHash'] = preview_hash
+
+    # used to filter assets by dimensions, face count etc.
+    stats = get_geometry_stats(context, asset, asset_type)
+    if stats is not None:
+        asset_desc['Stats'] = stats
+
+    catalog = get_catalog()
+    with catalog.lock():
+        # pick up assets saved by other Blender instances since the description was made
+        sync_catalog(props, catalog)
+        if asset_desc['Slug'] in assets:
+            rename_asset_desc(asset_desc, find_and_rename(asset_desc['Slug'], assets.slugs()))
 
-    # update current objects list
-    assets = assets.append(asset_desc)
+        # save asset to library file. This is done holding the lock as the slug
+        # is only final here, and the file size is only known once it is written
+        if not os.path.exists(asset_save_path):
+            os.makedirs(asset_save_path)
 
-    if not os.path.exists(json_path):
-        os.makedirs(json_path)
+        write_asset_file(asset, asset_desc['Slug'], asset_desc['FilePath'])
+        set_file_size(stats, asset_desc['FilePath'])
+
+        # write description to catalog
+        catalog.insert(asset_type.lower(), asset_desc)
+
+        # update current objects list
+        assets.append(asset_desc)
+
+    # change asset name back to pretty name
+    asset.name = asset_desc['Name']
 
-    # open user asset description file and then write description to file
-    file_assets = []
-    json_file = os.path.join(json_path, asset_type.lower() + '.json')
+    self.report({'INFO'}, asset_desc['Name'] + " added to Library.")
 
-    if os.path.exists(json_file):
-        with open(json_file) as read_file:
-            file_assets = json.load(read_file)
+    return asset_desc
 
-    file_assets.append(asset_desc)
 
-    # write description to .json file
-    with open(json_file, "w") as write_file:
-        json.dump(file_assets, write_file, indent=4)
+def write_asset_file(asset, slug, filepath):
+    """Save the asset in its own .blend file under its slug.
 
-    # save asset to library file
-    if not os.path.exists(asset_save_path):
-        os.makedirs(asset_save_path)
+    The asset is left named after its slug.
 
+    Args:
+        asset (bpy.types.object, material, collection): the asset to save
+        slug (str): asset slug
+        filepath (str): path of .blend file to write
+    """
     # change asset name to asset slug
-    asset.name = asset_desc['Slug']
+    asset.name = slug
 
     # save asset in individual file
     bpy.data.libraries.write(
-        os.path.join(asset_desc['FilePath']),
+        filepath,
         {asset},
         fake_user=True)
 
-    # change asset name back to pretty name
-    asset.name = asset_desc['Name']
 
-    self.report({'INFO'}, asset_desc['Name'] + " added to Library.")
+def rename_asset_desc(asset_desc, new_slug):
+    """Give an asset description that hasn't been added to the library yet a new slug.
 
-    return asset_desc
+    Renames its preview image if it has already been rendered.
+
+    Args:
+        asset_desc (dict): asset description
+        new_slug (str): new slug
+    """
+    asset_save_path = os.path.dirname(asset_desc['FilePath'])
+    imagepath = os.path.join(asset_save_path, new_slug + '.png')
+    if os.path.exists(asset_desc['PreviewImagePath']):
+        os.replace(asset_desc['PreviewImagePath'], imagepath)
+
+    asset_desc['Slug'] = new_slug
+    asset_desc['FileName'] = new_slug + '.blend'
+    asset_desc['FilePath'] = os.path.join(asset_save_path, new_slug + '.blend')
+    asset_desc['PreviewImageName'] = new_slug + '.png'
+    asset_desc['PreviewImagePath'] = imagepath
 
 
 def construct_asset_description(props, asset_type, assets_path, asset, **kwargs):
@@ -164,31 +202,48 @@ def construct_asset_description(props, asset_type, assets_path, asset, **kwargs)
     )
 
     slug = slugify(asset.name)
-    current_slugs = [asset['Slug'] for asset in assets]
+    current_slugs = assets.slugs()
 
     # check if slug already exists and increment and rename if not.
     new_slug = find_and_rename(slug, current_slugs)
 
     pretty_name = asset.name  # when we reimport an asset we will rename it to this
 
+    return make_asset_description(pretty_name, new_slug, category, asset_type, asset_save_path, **kwargs)
+
+
+def make_asset_description(name, slug, category, asset_type, asset_save_path, **kwargs):
+    """Return a new asset description.
+
+    Args:
+        name (str): pretty name
+        slug (str): unique asset slug
+        category (str): category slug
+        asset_type (enum in {OBJECTS, COLLECTIONS, MATERIALS}): asset type
+        asset_save_path (str): folder the asset and its preview image are saved in
+
+    Returns:
+        dict: asset_desc
+    """
     filepath = os.path.join(
         asset_save_path,
-        new_slug + '.blend')
+        slug + '.blend')
 
     imagepath = os.path.join(
         asset_save_path,
-        new_slug + '.png')
+        slug + '.png')
 
     # construct dict for saving to .json cache file
     asset_desc = {
-        "Name": pretty_name,
-        "Slug": new_slug,
+        "Name": name,
+        "Slug": slug,
         "Category": category,
-        "FileName": new_slug + '.blend',
+        "FileName": slug + '.blend',
         "FilePath": filepath,
         "PreviewImagePath": imagepath,
-        "PreviewImageName": new_slug + '.png',
-        "Type": asset_type.upper()}
+        "PreviewImageName": slug + '.png',
+        "Type": asset_type.upper(),
+        "DateAdded": int(time.time())}
 
     for key, value in kwargs.items():
         asset_desc[key] = value
@@ -0,0 +1,419 @@
+"""Contains functions for adding many assets to the MakeTile library from the command line.
+
+The source .blend files and the objects, materials and collections to save from each
+of them are listed in a manifest together with their metadata. The files are split
+between background Blender worker processes which save each asset and render its
+preview into a staging folder. Once all workers have finished the staged files are
+moved into the user library and the new asset descriptions are added to the catalog
+in one go, so the catalog is only locked briefly at the start and end of the run.
+
+Manifest format. Paths in Files are relative to the source folder. Tags can be a
+list or a comma separated string and metadata not given for an asset is taken from
+the file Defaults and then the manifest Defaults::
+
+    {
+        "Defaults": {"Author": "", "License": "All Rights Reserved", "Tags": []},
+        "Files": {
+            "walls/stone_wall.blend": {
+                "Defaults": {"Category": "objects\\\\walls"},
+                "OBJECTS": {"Stone Wall": {"Description": "", "Tags": "wall, stone"}},
+                "MATERIALS": {"Stone": {"PreviewObject": "Wall", "DisplacementMaterial": true}},
+                "COLLECTIONS": {"Wall Set": {"Name": "Stone Wall Set", "RootObject": "Base"}}
+            }
+        }
+    }
+"""
+import os
+import json
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import bpy
+from ..utils import slugify, tagify, find_and_rename
+from ..preferences import get_prefs
+from ..system import run_cli_in_background
+from ..catalog import get_catalog
+from ..categories import load_category_tree
+from .add_to_library import (
+    check_category_type,
+    make_asset_description,
+    write_asset_file,
+    rename_asset_desc)
+from .save_collections import parent_collection_to_root
+from .preview_rendering import render_preview_in_background
+from ..similar import get_preview_hash
+from ..geometry_stats import get_geometry_stats, set_file_size
+
+ASSET_TYPES = ('OBJECTS', 'MATERIALS', 'COLLECTIONS')
+
+# Metadata keys copied into asset descriptions
+METADATA_KEYS = ('Description', 'URI', 'Author', 'License', 'Tags')
+
+# Source files saved by each worker process. Blender takes a few seconds to
+# start so each worker is given several files.
+FILES_PER_WORKER = 20
+
+
+class ConsoleReporter:
+    """Stands in for an operator when calling functions that report to the user in background mode."""
+
+    def report(self, report_type, message):
+        print(" » %s: %s" % (', '.join(sorted(report_type)), message))
+
+
+def find_source_files(source_path):
+    """Return the .blend files in the source folder and its sub folders.
+
+    Args:
+        source_path (str): source folder
+
+    Returns:
+        set[str]: paths relative to source_path using / as separator
+    """
+    found = set()
+    for dirpath, dirnames, filenames in os.walk(source_path):
+        for filename in filenames:
+            if filename.lower().endswith('.blend'):
+                relpath = os.path.relpath(os.path.join(dirpath, filename), source_path)
+                found.add(relpath.replace(os.sep, '/'))
+    return found
+
+
+def get_asset_metadata(manifest, file_entry, asset_metadata):
+    """Return the metadata of an asset with the file and manifest defaults filled in.
+
+    Args:
+        manifest (dict): manifest
+        file_entry (dict): manifest entry of the source file
+        asset_metadata (dict): metadata of the asset in the manifest
+
+    Returns:
+        dict: metadata
+    """
+    metadata = {
+        "Description": "",
+        "URI": "",
+        "Author": "",
+        "License": "All Rights Reserved",
+        "Tags": []}
+    metadata.update(manifest.get('Defaults', {}))
+    metadata.update(file_entry.get('Defaults', {}))
+    metadata.update(asset_metadata or {})
+    if isinstance(metadata['Tags'], str):
+        metadata['Tags'] = tagify(metadata['Tags'])
+    return metadata
+
+
+def get_library_slugs(catalog, assets_path, asset_type):
+    """Return the set of slugs in use for asset_type in the catalog and the library folder.
+
+    Files in the library folder that aren't in the catalog are included so they
+    aren't overwritten.
+    """
+    slugs = set(desc['Slug'] for desc in catalog.load(asset_type.lower()))
+    type_path = os.path.join(assets_path, asset_type.lower())
+    if os.path.isdir(type_path):
+        slugs.update(os.path.splitext(name)[0] for name in os.listdir(type_path) if name.endswith('.blend'))
+    return slugs
+
+
+def plan_ingest(source_path, manifest, staging_path, assets_path):
+    """Return the files to ingest with a description of each asset to save from them.
+
+    Each asset is given a slug that is unique in the library and paths in the staging folder.
+
+    Args:
+        source_path (str): source folder
+        manifest (dict): manifest
+        staging_path (str): folder workers save assets to
+        assets_path (str): user assets path
+
+    Returns:
+        tuple(list[dict{SourceFile, Assets}], list[str]): files to ingest, warnings
+    """
+    catalog = get_catalog()
+    categories = load_category_tree()
+    found = find_source_files(source_path)
+    warnings = []
+
+    with catalog.lock():
+        slugs = {a_type: get_library_slugs(catalog, assets_path, a_type) for a_type in ASSET_TYPES}
+
+    for relpath in sorted(found - set(manifest.get('Files', {}))):
+        warnings.append(relpath + " is not in the manifest and was skipped")
+
+    files = []
+    for relpath, file_entry in sorted(manifest.get('Files', {}).items()):
+        if relpath not in found:
+            warnings.append(relpath + " is in the manifest but was not found")
+            continue
+
+        assets = []
+        for asset_type in ASSET_TYPES:
+            for name, asset_metadata in file_entry.get(asset_type, {}).items():
+                metadata = get_asset_metadata(manifest, file_entry, asset_metadata)
+                category = categories.get(metadata.get('Category', ''))
+                if category is None:
+                    category = asset_type.lower()
+                else:
+                    category = check_category_type(category, asset_type)
+
+                pretty_name = metadata.get('Name', name)
+                asset_desc = make_asset_description(
+                    pretty_name,
+                    find_and_rename(slugify(pretty_name), slugs[asset_type]),
+                    category,
+                    asset_type,
+                    os.path.join(staging_path, asset_type.lower()),
+                    **{key: metadata[key] for key in METADATA_KEYS})
+
+                assets.append({
+                    "DataBlock": name,
+                    "Options": metadata,
+                    "Desc": asset_desc})
+
+        files.append({
+            "SourceFile": os.path.join(source_path, relpath),
+            "Assets": assets})
+
+    return files, warnings
+
+
+def ingest_file(reporter, job, file_entry, results):
+    """Save the assets listed for a source file to the staging folder. Call in a worker process.
+
+    Args:
+        reporter (ConsoleReporter): reporter
+        job (dict): worker job
+        file_entry (dict{SourceFile, Assets}): file to ingest
+        results (dict{Assets, Errors}): results the saved asset descriptions and errors are added to
+    """
+    source_file = file_entry['SourceFile']
+    bpy.ops.wm.open_mainfile(filepath=source_file, load_ui=False)
+
+    for asset in file_entry['Assets']:
+        asset_desc = asset['Desc']
+        asset_type = asset_desc['Type']
+        options = asset['Options']
+        datablock = getattr(bpy.data, asset_type.lower()).get(asset['DataBlock'])
+
+        try:
+            if datablock is None:
+                raise LookupError(asset['DataBlock'] + " not found")
+
+            if asset_type == 'OBJECTS' and datablock.type != 'MESH':
+                raise TypeError(datablock.name + " is not a mesh object")
+
+            if asset_type == 'MATERIALS' and options.get('DisplacementMaterial', True):
+                datablock['mt_material'] = True
+
+            if asset_type == 'COLLECTIONS':
+                root = bpy.data.objects.get(options.get('RootObject', ''))
+                if root is None:
+                    # create a new empty root at the origin
+                    root = bpy.data.objects.new(datablock.name + ' Root', None)
+                    datablock.objects.link(root)
+                    root.show_in_front = True
+                parent_collection_to_root(datablock, root)
+                asset_desc['RootObject'] = root.name
+
+            save_path = os.path.dirname(asset_desc['FilePath'])
+            if not os.path.exists(save_path):
+                os.makedirs(save_path)
+
+            if job['RenderPreviews']:
+                preview_obj_path = os.path.join(
+                    job['PreviewObjectsPath'],
+                    options.get('PreviewObject', job['PreviewObject']) + '.blend')
+                if not render_preview_in_background(
+                        reporter,
+                        asset_desc['PreviewImagePath'],
+                        job['ScenePath'],
+                        job['PreviewScene'],
+                        datablock,
+                        asset_type,
+                        preview_obj_path):
+                    reporter.report({'WARNING'}, "No preview rendered for " + asset_desc['Name'])
+                else:
+                    preview_hash = get_preview_hash(asset_desc['PreviewImagePath'])
+                    if preview_hash:
+                        asset_desc['PreviewHash'] = preview_hash
+
+            stats = get_geometry_stats(bpy.context, datablock, asset_type)
+            write_asset_file(datablock, asset_desc['Slug'], asset_desc['FilePath'])
+            if stats is not None:
+                set_file_size(stats, asset_desc['FilePath'])
+                asset_desc['Stats'] = stats
+            results['Assets'].append(asset_desc)
+        except (LookupError, TypeError, RuntimeError, OSError) as err:
+            results['Errors'].append("%s: %s: %s" % (source_file, asset['DataBlock'], err))
+
+
+def ingest_worker(job_path, result_path):
+    """Save the assets in a job file to the staging folder and write the results. Call in a worker process.
+
+    Args:
+        job_path (str): path of .json job file written by ingest()
+        result_path (str): path of .json file to write the results to
+    """
+    with open(job_path) as read_file:
+        job = json.load(read_file)
+
+    reporter = ConsoleReporter()
+    results = {"Assets": [], "Errors": []}
+    try:
+        for file_entry in job['Files']:
+            print(" » Ingesting " + file_entry['SourceFile'])
+            try:
+                ingest_file(reporter, job, file_entry, results)
+            except Exception as err:
+                # the source file couldn't be opened or an asset failed in a way
+                # ingest_file doesn't expect. Carry on with the other files
+                results['Errors'].append("%s: %s: %s" % (file_entry['SourceFile'], type(err).__name__, err))
+    finally:
+        # assets already staged are merged even if the worker is stopped
+        with open(result_path, "w") as write_file:
+            json.dump(results, write_file)
+    return 0
+
+
+def rename_staged_asset(asset_desc, new_slug):
+    """Give an asset saved in the staging folder a new slug, renaming it in its .blend file.
+
+    Args:
+        asset_desc (dict): asset description with paths in the staging folder
+        new_slug (str): new slug
+    """
+    attr = asset_desc['Type'].lower()
+    old_path = asset_desc['FilePath']
+    with bpy.data.libraries.load(old_path) as (data_from, data_to):
+        setattr(data_to, attr, [asset_desc['Slug']])
+    datablock = getattr(data_to, attr)[0]
+
+    rename_asset_desc(asset_desc, new_slug)
+    write_asset_file(datablock, new_slug, asset_desc['FilePath'])
+    getattr(bpy.data, attr).remove(datablock)
+    os.remove(old_path)
+
+
+def merge_results(asset_descs, assets_path):
+    """Move the staged assets into the user library and add them to the catalog.
+
+    Assets given a slug by another Blender instance while the workers were
+    running are renamed.
+
+    Args:
+        asset_descs (list[dict]): asset descriptions with paths in the staging folder
+        assets_path (str): user assets path
+    """
+    catalog = get_catalog()
+    with catalog.lock():
+        descs_by_type = {}
+        for asset_type in ASSET_TYPES:
+            descs = [desc for desc in asset_descs if desc['Type'] == asset_type]
+            if not descs:
+                continue
+
+            slugs = get_library_slugs(catalog, assets_path, asset_type)
+            type_path = os.path.join(assets_path, asset_type.lower())
+            if not os.path.exists(type_path):
+                os.makedirs(type_path)
+
+            for desc in descs:
+                if desc['Slug'] in slugs:
+                    rename_staged_asset(desc, find_and_rename(desc['Slug'], slugs))
+                else:
+                    slugs.add(desc['Slug'])
+
+                for path_key in ('FilePath', 'PreviewImagePath'):
+                    staged_path = desc[path_key]
+                    desc[path_key] = os.path.join(type_path, os.path.basename(staged_path))
+                    if os.path.exists(staged_path):
+                        os.replace(staged_path, desc[path_key])
+            descs_by_type[asset_type.lower()] = descs
+
+        # one revision, so other instances never see some types of a batch without the rest
+        catalog.insert_by_type(descs_by_type)
+
+
+def ingest(source_path, manifest_path=None, workers=1, files_per_worker=FILES_PER_WORKER, render_previews=True):
+    """Add the assets listed in a manifest to the user library using background worker processes.
+
+    Args:
+        source_path (str): folder containing the source .blend files
+        manifest_path (str, optional): manifest. Defaults to manifest.json in source_path.
+        workers (int, optional): number of worker processes to run at once. Defaults to 1.
+        files_per_worker (int, optional): source files per worker process. Defaults to FILES_PER_WORKER.
+        render_previews (bool, optional): render preview images. Defaults to True.
+
+    Returns:
+        int: 0 if all assets were added, otherwise 1
+    """
+    prefs = get_prefs()
+    assets_path = prefs.user_assets_path
+    source_path = os.path.abspath(source_path)
+    if manifest_path is None:
+        manifest_path = os.path.join(source_path, "manifest.json")
+
+    with open(manifest_path) as read_file:
+        manifest = json.load(read_file)
+
+    data_path = os.path.join(assets_path, "data")
+    if not os.path.exists(data_path):
+        os.makedirs(data_path)
+    # stage on the same drive as the library so files can be moved into it in one step
+    staging_path = tempfile.mkdtemp(prefix="ingest_", dir=data_path)
+
+    files, warnings = plan_ingest(source_path, manifest, staging_path, assets_path)
+    for warning in warnings:
+        print(" » WARNING: " + warning)
+
+    job_template = {
+        "RenderPreviews": render_previews,
+        "ScenePath": os.path.join(prefs.default_assets_path, "previews", "preview_scenes.blend"),
+        "PreviewScene": prefs.preview_scene,
+        "PreviewObjectsPath": os.path.join(prefs.default_assets_path, "previews", "objects"),
+        "PreviewObject": manifest.get('Defaults', {}).get('PreviewObject', 'Wall')}
+
+    # write one job file per worker process
+    jobs = []
+    for i in range(0, len(files), files_per_worker):
+        job = dict(job_template, Files=files[i:i + files_per_worker])
+        job_path = os.path.join(staging_path, "job_%04d.json" % len(jobs))
+        with open(job_path, "w") as write_file:
+            json.dump(job, write_file)
+        jobs.append(job_path)
+
+    print(" » Ingesting %d files with %d workers" % (len(files), workers))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return_codes = list(executor.map(
+            lambda job_path: run_cli_in_background(
+                ['ingest-worker', job_path, job_path[:-len('.json')] + '_result.json'],
+                job_path[:-len('.json')] + '.log'),
+            jobs))
+
+    asset_descs = []
+    errors = []
+    for job_path, return_code in zip(jobs, return_codes):
+        try:
+            with open(job_path[:-len('.json')] + '_result.json') as read_file:
+                results = json.load(read_file)
+        except OSError:
+            errors.append("Worker for %s exited with code %d" % (job_path, return_code))
+            continue
+        asset_descs.extend(results['Assets'])
+        errors.extend(results['Errors'])
+
+    merge_results(asset_descs, assets_path)
+
+    for error in errors:
+        print(" » ERROR: " + error)
+    print(" » Added %d assets to the library with %d errors" % (len(asset_descs), len(errors)))
+
+    if errors:
+        # keep the worker logs
+        print(" » Worker logs kept in " + staging_path)
+        return 1
+
+    shutil.rmtree(staging_path, ignore_errors=True)
+    return 0
@@ -1,5 +1,6 @@
 import os
 import bpy
+from mathutils import Vector, Matrix
 from ..preferences import get_prefs
 
 
@@ -51,30 +52,7 @@ def render_material_preview(self, context, image_path, scene_path, scene_name, m
 
         context.collection.objects.link(preview_obj)
 
-        # add material to object if not on it already
-        if material.name not in preview_obj.data.materials:
-            preview_obj.data.materials.append(material)
-            material_index = list(preview_obj.material_slots.keys()).index(material.name)
-
-            try:
-                # add material only to preview_vert_group
-                vert_group = preview_obj.vertex_groups['preview_vert_group']
-                vert_group_index = vert_group.index
-                verts = [v.index for v in preview_obj.data.vertices
-                         if vert_group_index in [vg.group for vg in v.groups]]
-
-                for poly in preview_obj.data.polygons:
-                    count = 0
-                    for vert in poly.vertices:
-                        if vert in verts:
-                            count += 1
-                    if count == len(poly.vertices):
-                        poly.material_index = material_index
-
-            except KeyError:
-                # add material to entire object if no preview_vert_group
-                for poly in preview_obj.data.polygons:
-                    poly.material_index = material_index
+        assign_preview_material(preview_obj, material)
 
         render = context.scene.render
 
@@ -126,6 +104,39 @@ def render_material_preview(self, context, image_path, scene_path, scene_name, m
     return False
 
 
+def assign_preview_material(preview_obj, material):
+    """Assign the material to the preview_vert_group of the preview object, or the whole object if it has none.
+
+    Args:
+        preview_obj (bpy.types.Object): preview object
+        material (bpy.types.Material): material
+    """
+    # add material to object if not on it already
+    if material.name not in preview_obj.data.materials:
+        preview_obj.data.materials.append(material)
+        material_index = list(preview_obj.material_slots.keys()).index(material.name)
+
+        try:
+            # add material only to preview_vert_group
+            vert_group = preview_obj.vertex_groups['preview_vert_group']
+            vert_group_index = vert_group.index
+            verts = [v.index for v in preview_obj.data.vertices
+                     if vert_group_index in [vg.group for vg in v.groups]]
+
+            for poly in preview_obj.data.polygons:
+                count = 0
+                for vert in poly.vertices:
+                    if vert in verts:
+                        count += 1
+                if count == len(poly.vertices):
+                    poly.material_index = material_index
+
+        except KeyError:
+            # add material to entire object if no preview_vert_group
+            for poly in preview_obj.data.polygons:
+                poly.material_index = material_index
+
+
 def render_object_preview(self, context, image_path, scene_path, scene_name, obj):
     """Render a preview of the passed in object.
 
@@ -328,3 +339,98 @@ def link_preview_scene(self, scene_name, scene_path):
             self.report({'ERROR'}, scene_path + ' not found. Aborting')
             return False
     return bpy.data.scenes[scene_name]
+
+
+def render_preview_in_background(self, image_path, scene_path, scene_name, asset, asset_type, preview_obj_path=None):
+    """Render a preview of the passed in asset without a window.
+
+    Used when saving assets in background mode, where the scene can't be switched
+    and there's no 3D view to frame the camera from. Renders with Cycles on the
+    CPU as EEVEE needs a display.
+
+    Args:
+        image_path (str): Where to save preview image
+        scene_path (str): Path to preview scene .blend file
+        scene_name (str): name of preview scene to use
+        asset (bpy.types.Object, Material or Collection): asset to render
+        asset_type (ENUM in 'OBJECTS', 'MATERIALS', 'COLLECTIONS'): asset type
+        preview_obj_path (str, optional): .blend file containing the preview object
+            to render materials on. The object must have the same name as the file.
+
+    Returns:
+        bool: whether the preview was rendered
+    """
+    preview_scene = link_preview_scene(self, scene_name, scene_path)
+    if not preview_scene:
+        return False
+
+    render_obj = None
+    camera = preview_scene.camera
+    camera_loc = camera.location.copy()
+
+    if asset_type == 'OBJECTS':
+        # copy object with all modifiers applied
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        mesh = bpy.data.meshes.new_from_object(asset.evaluated_get(depsgraph))
+        if not mesh.vertices:
+            self.report({'WARNING'}, asset.name + " has no geometry. Preview render aborted")
+            return False
+        render_obj = bpy.data.objects.new("dupe", mesh)
+
+        # move the centre of the geometry to the world origin and scale it so it fits in view of camera
+        coords = [v.co for v in mesh.vertices]
+        low = Vector([min(co[i] for co in coords) for i in range(3)])
+        high = Vector([max(co[i] for co in coords) for i in range(3)])
+        mesh.transform(Matrix.Translation(-(low + high) / 2))
+        size = max(high - low)
+        if size > 0:
+            render_obj.scale *= 2 / size
+        preview_scene.collection.objects.link(render_obj)
+
+    elif asset_type == 'MATERIALS':
+        if preview_obj_path is None or not os.path.isfile(preview_obj_path):
+            self.report({'WARNING'}, "Preview object not found. Preview render aborted")
+            return False
+        preview_obj_name = os.path.splitext(os.path.basename(preview_obj_path))[0]
+        with bpy.data.libraries.load(preview_obj_path) as (data_from, data_to):
+            if preview_obj_name not in data_from.objects:
+                self.report({'WARNING'}, "Preview object not found. Preview render aborted")
+                return False
+            data_to.objects = [preview_obj_name]
+        render_obj = data_to.objects[0]
+        assign_preview_material(render_obj, asset)
+        preview_scene.collection.objects.link(render_obj)
+        preview_scene.cycles.feature_set = 'EXPERIMENTAL'
+
+    else:
+        preview_scene.collection.children.link(asset)
+
+        # frame the bounding boxes of all objects in the collection with the camera
+        coords = []
+        for obj in asset.all_objects:
+            for corner in obj.bound_box:
+                coords.extend(obj.matrix_world @ Vector(corner))
+        if coords:
+            depsgraph = preview_scene.view_layers[0].depsgraph
+            camera.location = camera.camera_fit_coords(depsgraph, coords)[0]
+
+    # the preview scene is appended to the file being saved from so its settings don't need restoring
+    render = preview_scene.render
+    render.engine = 'CYCLES'
+    preview_scene.cycles.device = 'CPU'
+    render.film_transparent = True
+    render.resolution_x = 512
+    render.resolution_y = 512
+    render.filepath = image_path
+
+    bpy.ops.render.render(write_still=True, scene=preview_scene.name)
+
+    # unlink asset from preview scene and reset camera
+    if render_obj is not None:
+        preview_scene.collection.objects.unlink(render_obj)
+        bpy.data.objects.remove(render_obj)
+    else:
+        preview_scene.collection.children.unlink(asset)
+    camera.location = camera_loc
+
+    return os.path.isfile(image_path)
@@ -286,26 +286,7 @@ def add_collection_to_library(self, context):
     else:
         root = bpy.data.objects[root_obj_name]
 
-    root.mt_object_props.geometry_type = 'BASE'
-
-    # we need to make sure we parent all objects, including those in sub collections
-    # to our root
-    colls = set(get_all_descendent_collections(collection))
-    colls.add(collection)
-
-    all_obs = set()
-
-    for coll in colls:
-        for obj in coll.objects:
-            all_obs.add(obj)
-
-    # parent all objects that don't already have a parent
-    # to the root object
-    for ob in all_obs:
-        if ob != root:
-            if ob.parent is None:
-                ob.parent = root
-                ob.matrix_parent_inverse = root.matrix_world.inverted()
+    parent_collection_to_root(collection, root)
 
     tags = tagify(self.Tags)
 
@@ -356,3 +337,34 @@ def add_collection_to_library(self, context):
         return {'FINISHED'}
 
     return {'CANCELLED'}
+
+
+def parent_collection_to_root(collection, root):
+    """Parent all objects in the collection and its sub collections that don't have a parent to root.
+
+    Args:
+        collection (bpy.types.Collection): collection
+        root (bpy.types.Object): root object
+    """
+    # root.mt_object_props is registered by MakeTile which isn't loaded when saving in background mode
+    if hasattr(root, 'mt_object_props'):
+        root.mt_object_props.geometry_type = 'BASE'
+
+    # we need to make sure we parent all objects, including those in sub collections
+    # to our root
+    colls = set(get_all_descendent_collections(collection))
+    colls.add(collection)
+
+    all_obs = set()
+
+    for coll in colls:
+        for obj in coll.objects:
+            all_obs.add(obj)
+
+    # parent all objects that don't already have a parent
+    # to the root object
+    for ob in all_obs:
+        if ob != root:
+            if ob.parent is None:
+                ob.parent = root
+                ob.matrix_parent_inverse = root.matrix_world.inverted()
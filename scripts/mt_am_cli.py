@@ -0,0 +1,31 @@
+"""Run MakeTile Asset Manager commands in background mode.
+
+    blender -b --python mt_am_cli.py -- <command> [arguments]
+
+Enables the add-on this script is part of if it isn't already enabled and runs
+the command with cli.main(). Run with -- -h for a list of commands.
+"""
+import os
+import sys
+import importlib
+import addon_utils
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+
+    addon_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    addon_name = os.path.basename(addon_path)
+
+    # allows running from a copy of the add-on that isn't installed
+    if os.path.dirname(addon_path) not in sys.path:
+        sys.path.append(os.path.dirname(addon_path))
+
+    if not addon_utils.check(addon_name)[1]:
+        addon_utils.enable(addon_name, default_set=False)
+
+    cli = importlib.import_module(addon_name + '.cli')
+    sys.exit(cli.main(argv))
+
+
+main()
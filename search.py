@@ -0,0 +1,867 @@
+"""Contains the search index of the asset library and the search and filter operators.
+
+The index maps every token in the Name, Tags, Author and Description of an asset
+to the assets containing it, with a weight depending on the field it was found
+in. The sorted list of tokens is used to expand the last word of a query, which
+is usually still being typed, to all tokens starting with it.
+
+The index is kept in step with the catalog by applying the changes made since
+the catalog revision it was last synced to, so assets added or edited by this or
+any other Blender instance are indexed without reading the whole catalog. It is
+saved to the data folder of the user library so it doesn't have to be rebuilt
+when Blender starts.
+
+In fuzzy mode each word of a query is matched to similar words in the names and
+tags of assets, so misspelt words still find assets. Candidate words are found
+from a trigram index over the words in names and tags, so only words sharing
+trigrams with the query word are scored.
+
+Assets can also be filtered by their Tags, Author, License and Type. Each value
+of these facets has a bitset, a Python int with the bit of every asset id with
+that value set, so combining filters and counting the assets with each value
+are integer operations rather than loops over the asset descriptions.
+"""
+import os
+import re
+import json
+import math
+import heapq
+from bisect import bisect_left, insort
+from bpy.types import Operator
+from bpy.props import IntProperty, StringProperty
+from .preferences import get_prefs
+from .catalog import get_catalog, get_asset_descs, ASSET_TYPES
+from .usage import is_virtual_category, get_used_asset_keys
+from .geometry_stats import get_stats_table, get_active_ranges
+
+SEARCH_INDEX_FILE = 'search_index.json'
+
+# bump when the format of the index file or the tokens changes so old indices are rebuilt
+SEARCH_INDEX_VERSION = 4
+
+# weight of a token found in each field
+SEARCH_FIELDS = (
+    ('Name', 8),
+    ('Tags', 4),
+    ('Author', 2),
+    ('Description', 1))
+
+# tokens that only start with the last word of a query score less than an exact match
+PREFIX_FACTOR = 0.5
+
+# shorter words aren't expanded as they are the start of too many tokens to be useful
+MIN_PREFIX_LENGTH = 2
+
+# fields fuzzy search matches words in
+FUZZY_FIELDS = ('Name', 'Tags')
+
+# minimum trigram similarity of a word to match a query word in fuzzy mode
+FUZZY_THRESHOLD = 0.3
+
+# maximum number of similar words each query word is matched to in fuzzy mode
+FUZZY_WORDS = 20
+
+# number of search results shown in the asset bar at once
+SEARCH_PAGE_SIZE = 100
+
+# fields assets can be filtered by
+FACETS = ('Tags', 'Author', 'License', 'Type')
+
+# number of values of each facet shown in the filter panel
+FACET_VALUES_SHOWN = 10
+
+_search_indices = {}
+
+# the last page of results returned by search_assets() so redrawing the panel doesn't search again
+_last_search = {'key': None, 'results': None}
+
+# the last facet counts returned by get_facet_counts()
+_last_facet_counts = {'key': None, 'counts': None}
+
+
+def tokenize(text):
+    """Return the lower case words in text.
+
+    Args:
+        text (str): text
+
+    Returns:
+        list[str]: tokens
+    """
+    return re.findall(r'[^\W_]+', text.lower())
+
+
+def get_search_tokens(asset_desc):
+    """Return the weighted tokens of an asset description.
+
+    Args:
+        asset_desc (AssetDescription): asset description
+
+    Returns:
+        dict{token: weight}: tokens
+    """
+    tokens = {}
+    for field, weight in SEARCH_FIELDS:
+        value = asset_desc.get(field) or ''
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(value)
+        for token in tokenize(value):
+            tokens[token] = tokens.get(token, 0) + weight
+    return tokens
+
+
+def get_fuzzy_tokens(asset_desc):
+    """Return the tokens of an asset description fuzzy search matches.
+
+    Args:
+        asset_desc (AssetDescription): asset description
+
+    Returns:
+        list[str]: tokens
+    """
+    tokens = set()
+    for field in FUZZY_FIELDS:
+        value = asset_desc.get(field) or ''
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(value)
+        tokens.update(tokenize(value))
+    return sorted(tokens)
+
+
+def get_trigrams(token):
+    """Return the trigrams of a token.
+
+    The token is padded so the start and end of the word count as trigrams,
+    e.g. 'door' gives '  d', ' do', 'doo', 'oor', 'or '.
+
+    Args:
+        token (str): token
+
+    Returns:
+        set[str]: trigrams
+    """
+    padded = '  ' + token + ' '
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def get_facet_values(asset_desc):
+    """Return the values of each facet of an asset description.
+
+    Args:
+        asset_desc (AssetDescription): asset description
+
+    Returns:
+        dict{facet: list[str]}: values
+    """
+    values = {}
+    for facet in FACETS:
+        value = asset_desc.get(facet) or []
+        if not isinstance(value, (list, tuple)):
+            value = [value]
+        values[facet] = [v for v in value if v]
+    return values
+
+
+def bitset_from_ids(ids):
+    """Return a bitset with the bits of ids set.
+
+    Args:
+        ids (iterable[int]): ids
+
+    Returns:
+        int: bitset
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def ids_from_bitset(bits):
+    """Return the ids whose bits are set in a bitset.
+
+    Args:
+        bits (int): bitset
+
+    Returns:
+        list[int]: ids in ascending order
+    """
+    digits = bin(bits)[:1:-1]
+    ids = []
+    i = digits.find('1')
+    while i != -1:
+        ids.append(i)
+        i = digits.find('1', i + 1)
+    return ids
+
+
+def popcount(bits):
+    """Return the number of bits set in a bitset."""
+    return bin(bits).count('1')
+
+
+class SearchIndex:
+    """Inverted index of the searchable text of every asset in the catalog.
+
+    Each asset is given an integer id when it is indexed. Ids of removed assets
+    are reused so bitsets stay short.
+
+    Attributes:
+        revision (int): catalog revision the index is synced to
+    """
+
+    def __init__(self):
+        self.revision = 0
+        self._docs = []  # id: [asset_type, slug, category, tokens, facet values, fuzzy tokens] or None
+        self._ids = {}  # (asset_type, slug): id
+        self._free_ids = []
+        self._postings = {}  # token: {id: weight}
+        self._vocab = []  # sorted tokens
+        self._fuzzy_vocab = {}  # token in names and tags: number of assets
+        self._trigrams = {}  # trigram: set of tokens in _fuzzy_vocab
+        self._trigram_counts = {}  # token in _fuzzy_vocab: number of trigrams
+        self._facets = {facet: {} for facet in FACETS}  # facet: {value: bitset}
+        self._categories = {}  # category slug: bitset
+        self._all = 0  # bitset of all indexed assets
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def dirty(self):
+        """Whether the index has changed since it was last saved."""
+        return self._dirty
+
+    def add(self, asset_type, asset_desc):
+        """Index an asset description, replacing it if it is already indexed.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            asset_desc (AssetDescription): asset description
+        """
+        key = (asset_type, asset_desc['Slug'])
+        if key in self._ids:
+            self.remove(asset_type, asset_desc['Slug'])
+        if self._free_ids:
+            doc_id = self._free_ids.pop()
+        else:
+            doc_id = len(self._docs)
+            self._docs.append(None)
+
+        tokens = get_search_tokens(asset_desc)
+        facet_values = get_facet_values(asset_desc)
+        fuzzy_tokens = get_fuzzy_tokens(asset_desc)
+        self._docs[doc_id] = [
+            asset_type, asset_desc['Slug'], asset_desc['Category'], list(tokens), facet_values, fuzzy_tokens]
+        self._ids[key] = doc_id
+        for token, weight in tokens.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                insort(self._vocab, token)
+            posting[doc_id] = weight
+        self._add_fuzzy_tokens(fuzzy_tokens)
+
+        bit = 1 << doc_id
+        for facet, values in facet_values.items():
+            facet_bits = self._facets[facet]
+            for value in values:
+                facet_bits[value] = facet_bits.get(value, 0) | bit
+        self._categories[asset_desc['Category']] = self._categories.get(asset_desc['Category'], 0) | bit
+        self._all |= bit
+        self._dirty = True
+
+    def remove(self, asset_type, slug):
+        """Remove an asset from the index.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            slug (str): asset slug
+        """
+        doc_id = self._ids.pop((asset_type, slug), None)
+        if doc_id is None:
+            return
+        asset_type, slug, cat_slug, tokens, facet_values, fuzzy_tokens = self._docs[doc_id]
+        for token in tokens:
+            posting = self._postings[token]
+            del posting[doc_id]
+            if not posting:
+                del self._postings[token]
+                del self._vocab[bisect_left(self._vocab, token)]
+
+        for token in fuzzy_tokens:
+            self._fuzzy_vocab[token] -= 1
+            if not self._fuzzy_vocab[token]:
+                del self._fuzzy_vocab[token]
+                del self._trigram_counts[token]
+                for trigram in get_trigrams(token):
+                    self._trigrams[trigram].discard(token)
+                    if not self._trigrams[trigram]:
+                        del self._trigrams[trigram]
+
+        mask = ~(1 << doc_id)
+        for facet, values in facet_values.items():
+            facet_bits = self._facets[facet]
+            for value in values:
+                facet_bits[value] &= mask
+                if not facet_bits[value]:
+                    del facet_bits[value]
+        self._categories[cat_slug] &= mask
+        if not self._categories[cat_slug]:
+            del self._categories[cat_slug]
+        self._all &= mask
+        self._docs[doc_id] = None
+        self._free_ids.append(doc_id)
+        self._dirty = True
+
+    def _add_fuzzy_tokens(self, tokens):
+        """Count the tokens of an asset for fuzzy search, adding new ones to the trigram index."""
+        for token in tokens:
+            count = self._fuzzy_vocab.get(token, 0)
+            if not count:
+                trigrams = get_trigrams(token)
+                for trigram in trigrams:
+                    self._trigrams.setdefault(trigram, set()).add(token)
+                self._trigram_counts[token] = len(trigrams)
+            self._fuzzy_vocab[token] = count + 1
+
+    def rebuild(self, catalog):
+        """Index every asset description in the catalog.
+
+        Args:
+            catalog (Catalog): catalog
+        """
+        self.__init__()
+        self.revision = catalog.revision()
+        for asset_type in ASSET_TYPES:
+            for desc in catalog.load(asset_type):
+                self.add(asset_type, desc)
+        self._dirty = True
+
+    def sync(self, catalog):
+        """Apply the changes made to the catalog since the index was last synced.
+
+        Args:
+            catalog (Catalog): catalog
+        """
+        revision = catalog.revision()
+        if revision == self.revision:
+            return
+        changes = catalog.changes_since(self.revision) if revision > self.revision else None
+        if changes is None:
+            self.rebuild(catalog)
+            return
+
+        for asset_type, change in changes.items():
+            upserted = set(desc['Slug'] for desc in change.upserted)
+            removed = set(slug for slug, cat_slug in change.deleted if slug not in upserted)
+            if change.replaced_categories:
+                # assets in replaced categories that weren't upserted have been removed
+                removed.update(
+                    doc[1] for doc in self._docs
+                    if doc is not None and doc[0] == asset_type
+                    and doc[2] in change.replaced_categories and doc[1] not in upserted)
+            for slug in removed:
+                self.remove(asset_type, slug)
+            for desc in change.upserted:
+                self.add(asset_type, desc)
+        self.revision = revision
+        self._dirty = True
+
+    def _match(self, token, prefix):
+        """Return the ids and weights of the assets matching a query token.
+
+        Args:
+            token (str): query token
+            prefix (bool): also match tokens starting with token
+
+        Returns:
+            dict{id: float}: weights
+        """
+        if not prefix:
+            return self._postings.get(token, {})
+
+        matches = {}
+        start = bisect_left(self._vocab, token)
+        for i in range(start, len(self._vocab)):
+            vocab_token = self._vocab[i]
+            if not vocab_token.startswith(token):
+                break
+            factor = 1 if vocab_token == token else PREFIX_FACTOR
+            for doc_id, weight in self._postings[vocab_token].items():
+                weight = weight * factor
+                if weight > matches.get(doc_id, 0):
+                    matches[doc_id] = weight
+        return matches
+
+    def similar_tokens(self, token, limit=FUZZY_WORDS):
+        """Return the tokens in names and tags most similar to a token.
+
+        Similarity is the number of trigrams two tokens share divided by the number
+        of trigrams either has. Only tokens sharing a trigram with token are scored.
+
+        Args:
+            token (str): token
+            limit (int, optional): maximum number of tokens. Defaults to FUZZY_WORDS.
+
+        Returns:
+            list[tuple(str, float)]: tokens with a similarity of at least FUZZY_THRESHOLD, most similar first
+        """
+        trigrams = get_trigrams(token)
+        shared = {}
+        for trigram in trigrams:
+            for candidate in self._trigrams.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        similar = []
+        for candidate, count in shared.items():
+            similarity = count / (len(trigrams) + self._trigram_counts[candidate] - count)
+            if similarity >= FUZZY_THRESHOLD:
+                similar.append((candidate, similarity))
+        return heapq.nlargest(limit, similar, key=lambda item: item[1])
+
+    def _fuzzy_match(self, token):
+        """Return the ids and weights of the assets with tokens similar to a query token.
+
+        Args:
+            token (str): query token
+
+        Returns:
+            dict{id: float}: weights
+        """
+        matches = {}
+        for similar, similarity in self.similar_tokens(token):
+            for doc_id, weight in self._postings[similar].items():
+                weight = weight * similarity
+                if weight > matches.get(doc_id, 0):
+                    matches[doc_id] = weight
+        return matches
+
+    def _score(self, query, fuzzy=False):
+        """Return the scores of the assets matching every word of a query.
+
+        The last word also matches tokens it is the start of unless the query ends
+        in a space. In fuzzy mode each word matches the tokens in names and tags
+        most similar to it instead. Matches are scored by the field the word was
+        found in and how rare the word is.
+
+        Args:
+            query (str): query
+            fuzzy (bool, optional): match similar words. Defaults to False.
+
+        Returns:
+            dict{id: float}: scores
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return {}
+        last_is_prefix = not query[-1].isspace()
+
+        doc_count = len(self._ids)
+        scores = None
+        # match the most specific tokens first so the candidate set is small
+        for i, token in sorted(enumerate(tokens), key=lambda item: -len(item[1])):
+            if fuzzy:
+                matches = self._fuzzy_match(token)
+            else:
+                prefix = last_is_prefix and i == len(tokens) - 1 and len(token) >= MIN_PREFIX_LENGTH
+                matches = self._match(token, prefix)
+            idf = math.log(1 + doc_count / (1 + len(matches)))
+            if scores is None:
+                scores = {doc_id: weight * idf for doc_id, weight in matches.items()}
+            else:
+                scores = {
+                    doc_id: score + matches[doc_id] * idf
+                    for doc_id, score in scores.items() if doc_id in matches}
+            if not scores:
+                return {}
+        return scores
+
+    def search(self, query, offset=0, limit=SEARCH_PAGE_SIZE, mask=None, fuzzy=False):
+        """Return the assets matching every word of a query, best matches first.
+
+        Args:
+            query (str): query
+            offset (int, optional): number of results to skip. Defaults to 0.
+            limit (int, optional): number of results to return. Defaults to SEARCH_PAGE_SIZE.
+            mask (int, optional): bitset of the assets to include, e.g. from filter_mask(). Defaults to None.
+            fuzzy (bool, optional): match words similar to those in the query. Defaults to False.
+
+        Returns:
+            tuple(list[tuple(asset_type, slug)], int): a page of results and the total number of results
+        """
+        scores = self._score(query, fuzzy)
+        if mask is not None and scores:
+            scores = {doc_id: scores[doc_id] for doc_id in ids_from_bitset(mask & bitset_from_ids(scores))}
+
+        best = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])
+        return [tuple(self._docs[doc_id][:2]) for doc_id, score in best[offset:]], len(scores)
+
+    def match_mask(self, query, fuzzy=False):
+        """Return the bitset of the assets matching every word of a query."""
+        return bitset_from_ids(self._score(query, fuzzy))
+
+    def category_mask(self, *cat_slugs):
+        """Return the bitset of the assets in any of the categories."""
+        mask = 0
+        for cat_slug in cat_slugs:
+            mask |= self._categories.get(cat_slug, 0)
+        return mask
+
+    def key_mask(self, keys):
+        """Return the bitset of the assets with the asset types and slugs."""
+        ids = self._ids
+        return bitset_from_ids(ids[key] for key in keys if key in ids)
+
+    def all_mask(self):
+        """Return the bitset of all assets."""
+        return self._all
+
+    def filter_mask(self, filters, skip_facet=None):
+        """Return the bitset of the assets passing facet filters.
+
+        An asset passes if it has any of the chosen values of every filtered facet.
+
+        Args:
+            filters (dict{facet: set[str]}): chosen values of each facet
+            skip_facet (str, optional): facet to leave out. Defaults to None.
+
+        Returns:
+            int: bitset
+        """
+        mask = self._all
+        for facet, values in filters.items():
+            if facet == skip_facet or not values:
+                continue
+            facet_bits = self._facets[facet]
+            either = 0
+            for value in values:
+                either |= facet_bits.get(value, 0)
+            mask &= either
+        return mask
+
+    def facet_counts(self, facet, base_mask, filters):
+        """Return the number of assets with each value of a facet.
+
+        Counts the assets in base_mask that pass the filters on the other facets,
+        so the counts are the number of assets each value would show.
+
+        Args:
+            facet (str): facet
+            base_mask (int): bitset of the assets to count
+            filters (dict{facet: set[str]}): chosen values of each facet
+
+        Returns:
+            list[tuple(str, int)]: values with at least one asset, most common first
+        """
+        mask = base_mask & self.filter_mask(filters, skip_facet=facet)
+        counts = []
+        for value, bits in self._facets[facet].items():
+            count = popcount(bits & mask)
+            if count:
+                counts.append((value, count))
+        counts.sort(key=lambda item: (-item[1], item[0]))
+        return counts
+
+    def keys(self, mask):
+        """Return the asset type and slug of the assets in a bitset.
+
+        Args:
+            mask (int): bitset
+
+        Returns:
+            set[tuple(asset_type, slug)]: assets
+        """
+        docs = self._docs
+        return set(tuple(docs[doc_id][:2]) for doc_id in ids_from_bitset(mask))
+
+    def to_dict(self):
+        """Return the index as a dict that can be written to a .json file."""
+        return {
+            'Version': SEARCH_INDEX_VERSION,
+            'Revision': self.revision,
+            'Docs': self._docs,
+            # flattened to [id, weight, id, weight...] as json keys must be strings
+            'Postings': {
+                token: [value for item in posting.items() for value in item]
+                for token, posting in self._postings.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Return an index read from a .json file.
+
+        Args:
+            data (dict): dict returned by to_dict()
+
+        Returns:
+            SearchIndex: index, or None if it was written by another version
+        """
+        if data.get('Version') != SEARCH_INDEX_VERSION:
+            return None
+        index = cls()
+        index.revision = data['Revision']
+        index._docs = data['Docs']
+        for doc_id, doc in enumerate(index._docs):
+            if doc is None:
+                index._free_ids.append(doc_id)
+            else:
+                index._ids[(doc[0], doc[1])] = doc_id
+        index._postings = {
+            token: dict(zip(posting[::2], posting[1::2]))
+            for token, posting in data['Postings'].items()}
+        index._vocab = sorted(index._postings)
+
+        # bitsets are rebuilt from the facet values of each asset as they are large to store
+        facet_ids = {facet: {} for facet in FACETS}
+        category_ids = {}
+        for doc_id, doc in enumerate(index._docs):
+            if doc is None:
+                continue
+            index._add_fuzzy_tokens(doc[5])
+            for facet, values in doc[4].items():
+                for value in values:
+                    facet_ids[facet].setdefault(value, []).append(doc_id)
+            category_ids.setdefault(doc[2], []).append(doc_id)
+        index._facets = {
+            facet: {value: bitset_from_ids(ids) for value, ids in values.items()}
+            for facet, values in facet_ids.items()}
+        index._categories = {cat_slug: bitset_from_ids(ids) for cat_slug, ids in category_ids.items()}
+        index._all = bitset_from_ids(index._ids.values())
+        return index
+
+    def save(self, path):
+        """Write the index to a .json file, replacing the file in one step.
+
+        Args:
+            path (str): path to .json file
+        """
+        tmp_file = path + '.tmp'
+        with open(tmp_file, "w") as write_file:
+            json.dump(self.to_dict(), write_file, separators=(',', ':'))
+        os.replace(tmp_file, path)
+        self._dirty = False
+
+
+def get_search_index_path():
+    """Return the path of the search index file of the user library."""
+    prefs = get_prefs()
+    return os.path.join(
+        prefs.user_assets_path,
+        "data",
+        SEARCH_INDEX_FILE)
+
+
+def get_search_index():
+    """Return the search index of the user library synced to the catalog.
+
+    The index is read from the search index file the first time it is needed and
+    rebuilt from the catalog if there is no file or it can't be read.
+
+    Returns:
+        SearchIndex: index
+    """
+    path = get_search_index_path()
+    index = _search_indices.get(path)
+    if index is None:
+        try:
+            with open(path) as read_file:
+                index = SearchIndex.from_dict(json.load(read_file))
+        except (OSError, ValueError, KeyError, TypeError):
+            index = None
+        if index is None:
+            index = SearchIndex()
+        _search_indices[path] = index
+
+    catalog = get_catalog()
+    if catalog.exists():
+        index.sync(catalog)
+    return index
+
+
+def save_search_index():
+    """Write the search index to the search index file if it has changed."""
+    for path, index in _search_indices.items():
+        if index.dirty and os.path.isdir(os.path.dirname(path)):
+            index.save(path)
+
+
+def search_assets(props, query, page=0):
+    """Return a page of asset descriptions matching a search query and the facet and range filters.
+
+    Args:
+        props (mt_am_props): asset manager props
+        query (str): query
+        page (int, optional): page of results. Defaults to 0.
+
+    Returns:
+        tuple(list[AssetDescription], int): asset descriptions and the total number of results
+    """
+    index = get_search_index()
+    filters = get_active_filters(props)
+    ranges = get_active_ranges(props)
+    key = (get_search_index_path(), query, page, index.revision, filters, ranges, props.fuzzy_search)
+    if _last_search['key'] == key:
+        results, total = _last_search['results']
+    else:
+        mask = index.filter_mask(dict(filters)) if filters else None
+        range_mask = get_range_mask(props, index)
+        if range_mask is not None:
+            mask = range_mask if mask is None else mask & range_mask
+        results, total = index.search(
+            query, page * SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE, mask, props.fuzzy_search)
+        _last_search['key'] = key
+        _last_search['results'] = (results, total)
+
+    # asset types that haven't been loaded are only read for the results shown
+    return get_asset_descs(props, results), total
+
+
+def get_active_filters(props):
+    """Return the facet filters that have values chosen.
+
+    Returns:
+        tuple(tuple(facet, frozenset[str])): filters, usable as a dict key
+    """
+    return tuple(
+        (facet, frozenset(values)) for facet, values in sorted(props.facet_filters.items()) if values)
+
+
+def get_listing_mask(props, index):
+    """Return the bitset of the assets the asset bar lists before they are filtered.
+
+    These are the search results while searching, otherwise the assets in the active category.
+    """
+    if props.search_text.strip():
+        return index.match_mask(props.search_text, props.fuzzy_search)
+    if props.active_category:
+        if is_virtual_category(props.active_category['Slug']):
+            return index.key_mask(get_used_asset_keys(props.active_category['Slug']))
+        if props.include_subcategories:
+            return index.category_mask(*props.categories.subtree(props.active_category['Slug']))
+        return index.category_mask(props.active_category['Slug'])
+    return index.all_mask()
+
+
+def get_range_mask(props, index):
+    """Return the bitset of the assets passing the range filters, or None if there are none."""
+    ranges = get_active_ranges(props)
+    if not ranges:
+        return None
+    return index.key_mask(get_stats_table().query(ranges))
+
+
+def filter_assets(props, asset_descs):
+    """Return the asset descriptions that pass the facet and range filters.
+
+    Args:
+        props (mt_am_props): asset manager props
+        asset_descs (list[AssetDescription]): asset descriptions listed in the asset bar
+
+    Returns:
+        list[AssetDescription]: asset descriptions in the same order
+    """
+    filters = get_active_filters(props)
+    if not filters and not props.range_filters:
+        return asset_descs
+    index = get_search_index()
+    mask = index.filter_mask(dict(filters)) & get_listing_mask(props, index)
+    range_mask = get_range_mask(props, index)
+    if range_mask is not None:
+        mask &= range_mask
+    keys = index.keys(mask)
+    return [desc for desc in asset_descs if (desc['Type'].lower(), desc['Slug']) in keys]
+
+
+def get_facet_counts(props):
+    """Return the number of listed assets with each value of each facet.
+
+    Returns:
+        dict{facet: list[tuple(str, int)]}: values and counts, most common first
+    """
+    index = get_search_index()
+    filters = get_active_filters(props)
+    active_slug = props.active_category['Slug'] if props.active_category else None
+    # the assets in the Recent and Frequent categories change as assets are used
+    used_keys = tuple(get_used_asset_keys(active_slug)) if is_virtual_category(active_slug) else None
+    key = (
+        get_search_index_path(), index.revision, props.search_text.strip(), props.fuzzy_search,
+        active_slug, props.include_subcategories, len(props.categories), filters, get_active_ranges(props),
+        used_keys)
+    if _last_facet_counts['key'] != key:
+        base_mask = get_listing_mask(props, index)
+        range_mask = get_range_mask(props, index)
+        if range_mask is not None:
+            base_mask &= range_mask
+        _last_facet_counts['key'] = key
+        _last_facet_counts['counts'] = {
+            facet: index.facet_counts(facet, base_mask, dict(filters)) for facet in FACETS}
+    return _last_facet_counts['counts']
+
+
+class MT_OT_AM_Search_Page(Operator):
+    """Show the next or previous page of search results in the asset bar."""
+
+    bl_idname = "scene.mt_am_search_page"
+    bl_label = "Search Results Page"
+    bl_description = "Show more search results"
+    bl_options = {'INTERNAL'}
+
+    step: IntProperty(
+        name="Step",
+        default=1
+    )
+
+    def execute(self, context):
+        props = context.scene.mt_am_props
+        props.search_page = max(props.search_page + self.step, 0)
+        props.assets_updated = True
+        return {'FINISHED'}
+
+
+class MT_OT_AM_Toggle_Filter(Operator):
+    """Show or hide assets with a facet value in the asset bar."""
+
+    bl_idname = "scene.mt_am_toggle_filter"
+    bl_label = "Toggle Filter"
+    bl_description = "Only show assets with this value. Assets with any of the chosen values of a field are shown"
+    bl_options = {'INTERNAL'}
+
+    facet: StringProperty(
+        name="Facet"
+    )
+
+    value: StringProperty(
+        name="Value"
+    )
+
+    def execute(self, context):
+        props = context.scene.mt_am_props
+        values = props.facet_filters.setdefault(self.facet, set())
+        if self.value in values:
+            values.remove(self.value)
+        else:
+            values.add(self.value)
+        props.search_page = 0
+        props.assets_updated = True
+        return {'FINISHED'}
+
+
+class MT_OT_AM_Clear_Filters(Operator):
+    """Show all assets in the asset bar."""
+
+    bl_idname = "scene.mt_am_clear_filters"
+    bl_label = "Clear Filters"
+    bl_description = "Clear all filters"
+    bl_options = {'INTERNAL'}
+
+    def execute(self, context):
+        props = context.scene.mt_am_props
+        props.facet_filters.clear()
+        props.range_filters.clear()
+        props.search_page = 0
+        props.assets_updated = True
+        return {'FINISHED'}
@@ -0,0 +1,387 @@
+"""Contains functions and operators for finding assets with similar preview images.
+
+A 64 bit difference hash (dHash) of each asset's preview image is stored in its
+description as PreviewHash when the asset is saved. The image is shrunk to 9 x 8
+pixels of grey and each bit records whether a pixel is brighter than the one to
+its left, so small changes to a tile, like its length, change few bits.
+
+Finding similar assets looks up the hashes within a Hamming distance of the
+asset's hash in a BK-tree, which only compares the query with the hashes in the
+branches that can hold matches. The tree is built from the catalog once and
+then follows its revision log, like the search index, so only the hashes are
+kept in memory and asset types that haven't been opened aren't loaded.
+"""
+import os
+import numpy as np
+import bpy
+from bpy.types import Operator
+from bpy.props import IntProperty
+from .catalog import get_catalog, ASSET_TYPES
+from .catalog_watcher import sync_catalog
+from .usage import SIMILAR_SLUG, set_similar_assets
+
+# width and height of the grey image a hash is made from. The width is one more
+# than the number of bits per row as each bit compares two pixels
+HASH_WIDTH = 9
+HASH_HEIGHT = 8
+
+# default number of bits the hashes of similar assets can differ by
+SIMILAR_DISTANCE = 10
+
+_similarity_indices = {}  # id(catalog): SimilarityIndex
+
+
+def hamming_distance(hash_a, hash_b):
+    """Return the number of bits two hashes differ by."""
+    return bin(hash_a ^ hash_b).count('1')
+
+
+def get_image_hash(pixels, width, height):
+    """Return the difference hash of an image.
+
+    Args:
+        pixels (numpy.ndarray): RGBA pixels as floats, one row after another
+        width (int): image width
+        height (int): image height
+
+    Returns:
+        int: 64 bit hash
+    """
+    rgba = pixels.reshape(height, width, 4)
+    # luminance, with transparent pixels treated as black
+    grey = (rgba[:, :, 0] * 0.299 + rgba[:, :, 1] * 0.587 + rgba[:, :, 2] * 0.114) * rgba[:, :, 3]
+
+    # average the pixels in each cell of a HASH_WIDTH x HASH_HEIGHT grid
+    rows = np.linspace(0, height, HASH_HEIGHT + 1).astype(int)
+    cols = np.linspace(0, width, HASH_WIDTH + 1).astype(int)
+    sums = np.add.reduceat(np.add.reduceat(grey, rows[:-1], axis=0), cols[:-1], axis=1)
+    small = sums / np.outer(np.diff(rows), np.diff(cols))
+
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), 'big')
+
+
+def get_preview_hash(image_path):
+    """Return the difference hash of a preview image as a hex string.
+
+    Args:
+        image_path (str): path to image
+
+    Returns:
+        str: hash, or None if the image can't be read or is too small
+    """
+    if not os.path.isfile(image_path):
+        return None
+    already_loaded = any(
+        os.path.normcase(bpy.path.abspath(image.filepath)) == os.path.normcase(image_path)
+        for image in bpy.data.images)
+    try:
+        image = bpy.data.images.load(image_path, check_existing=True)
+    except RuntimeError:
+        return None
+
+    width, height = image.size
+    preview_hash = None
+    if width >= HASH_WIDTH and height >= HASH_HEIGHT:
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+        preview_hash = "%016x" % get_image_hash(pixels, width, height)
+
+    # don't leave images loaded just to hash them
+    if not already_loaded:
+        bpy.data.images.remove(image)
+    return preview_hash
+
+
+class BKTree:
+    """Hashes indexed by Hamming distance for finding the hashes close to a query.
+
+    Each node holds a hash, the items with that hash and its children keyed by
+    their distance from it. By the triangle inequality only children whose
+    distance is within max_distance of the query's distance from the node can
+    hold matches.
+    """
+
+    def __init__(self):
+        self._root = None
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def add(self, value, item):
+        """Add an item with a hash.
+
+        Args:
+            value (int): hash
+            item: item returned by find
+        """
+        self._len += 1
+        node = self._root
+        if node is None:
+            self._root = [value, [item], {}]
+            return
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def find(self, value, max_distance):
+        """Return the items with hashes within max_distance bits of a hash.
+
+        Args:
+            value (int): hash
+            max_distance (int): number of bits
+
+        Returns:
+            list[tuple(int, item)]: distances and items, closest first
+        """
+        results = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, item) for item in node[1])
+            low = distance - max_distance
+            high = distance + max_distance
+            for child_distance, child in node[2].items():
+                if low <= child_distance <= high:
+                    stack.append(child)
+        results.sort(key=lambda result: result[0])
+        return results
+
+
+class SimilarityIndex:
+    """Preview hashes of every asset in the catalog, in a BK-tree.
+
+    A BK-tree can't remove entries, so removed and rehashed assets are only
+    dropped from the current hashes and their entries are skipped when the tree
+    is searched. The tree is rebuilt once it holds more stale entries than live ones.
+
+    Attributes:
+        revision (int): catalog revision the index is synced to
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        """Empty the index."""
+        self.revision = 0
+        self._tree = BKTree()
+        self._hashes = {}  # (asset_type, slug): hash
+        self._categories = {}  # asset_type: {slug: category}
+        self._stale = 0  # entries in the tree that aren't current hashes
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def add(self, asset_type, asset_desc):
+        """Index the preview hash of an asset description, replacing it if it is already indexed.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            asset_desc (AssetDescription): asset description
+        """
+        key = (asset_type, asset_desc['Slug'])
+        old_hash = self._hashes.get(key)
+        preview_hash = asset_desc.get('PreviewHash')
+        value = int(preview_hash, 16) if preview_hash else None
+        if value is None or value != old_hash:
+            self.remove(asset_type, asset_desc['Slug'])
+            if value is None:
+                return
+            self._tree.add(value, key)
+            self._hashes[key] = value
+        self._categories.setdefault(asset_type, {})[asset_desc['Slug']] = asset_desc['Category']
+
+    def remove(self, asset_type, slug):
+        """Remove an asset from the index.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            slug (str): asset slug
+        """
+        if self._hashes.pop((asset_type, slug), None) is None:
+            return
+        del self._categories[asset_type][slug]
+        self._stale += 1
+        if self._stale > len(self._hashes):
+            self._tree = BKTree()
+            for key, value in self._hashes.items():
+                self._tree.add(value, key)
+            self._stale = 0
+
+    def rebuild(self, catalog):
+        """Index the preview hash of every asset description in the catalog.
+
+        Args:
+            catalog (Catalog): catalog
+        """
+        self._reset()
+        self.revision = catalog.revision()
+        for asset_type in ASSET_TYPES:
+            for desc in catalog.load(asset_type):
+                self.add(asset_type, desc)
+
+    def sync(self, catalog):
+        """Apply the changes made to the catalog since the index was last synced.
+
+        Args:
+            catalog (Catalog): catalog
+        """
+        revision = catalog.revision()
+        if revision == self.revision:
+            return
+        changes = catalog.changes_since(self.revision) if revision > self.revision else None
+        if changes is None:
+            self.rebuild(catalog)
+            return
+
+        for asset_type, change in changes.items():
+            for slug in change.removed_slugs(self._categories.get(asset_type, {})):
+                self.remove(asset_type, slug)
+            for desc in change.upserted:
+                self.add(asset_type, desc)
+        self.revision = revision
+
+    def find(self, value, max_distance):
+        """Return the assets with preview hashes within max_distance bits of a hash.
+
+        Args:
+            value (int): hash
+            max_distance (int): number of bits
+
+        Returns:
+            list[tuple(int, tuple(asset_type, slug))]: distances and assets, closest first
+        """
+        # an asset can have stale entries in range as well as its current one
+        results = {}
+        for distance, key in self._tree.find(value, max_distance):
+            current = self._hashes.get(key)
+            if current is not None and key not in results:
+                results[key] = hamming_distance(value, current)
+        return sorted(
+            ((distance, key) for key, distance in results.items() if distance <= max_distance),
+            key=lambda result: result[0])
+
+
+def get_similarity_index():
+    """Return the preview hash index of the user library synced to the catalog.
+
+    Returns:
+        SimilarityIndex: index
+    """
+    catalog = get_catalog()
+    index = _similarity_indices.get(id(catalog))
+    if index is None:
+        index = _similarity_indices[id(catalog)] = SimilarityIndex()
+    if catalog.exists():
+        index.sync(catalog)
+    return index
+
+
+def find_similar(asset_desc, max_distance=SIMILAR_DISTANCE):
+    """Return the assets with preview images similar to an asset's.
+
+    Args:
+        asset_desc (AssetDescription): asset description
+        max_distance (int, optional): number of bits hashes can differ by. Defaults to SIMILAR_DISTANCE.
+
+    Returns:
+        list[tuple(asset_type, slug)]: assets, most similar first, starting with the asset itself
+    """
+    preview_hash = asset_desc.get('PreviewHash') or get_preview_hash(asset_desc['PreviewImagePath'])
+    if not preview_hash:
+        return []
+    key = (asset_desc['Type'].lower(), asset_desc['Slug'])
+    similar = [item for distance, item in get_similarity_index().find(int(preview_hash, 16), max_distance)
+               if item != key]
+    return [key] + similar
+
+
+def hash_preview_images(props):
+    """Store the preview hash of assets saved before preview hashes were stored.
+
+    Args:
+        props (mt_am_props): asset manager props
+
+    Returns:
+        int: number of assets hashed
+    """
+    catalog = get_catalog()
+    hashed = 0
+    for asset_type in ASSET_TYPES:
+        asset_descs = getattr(props, asset_type)
+        hashes = {}
+        for desc in asset_descs:
+            if not desc.get('PreviewHash'):
+                preview_hash = get_preview_hash(desc['PreviewImagePath'])
+                if preview_hash:
+                    hashes[desc['Slug']] = preview_hash
+        if not hashes:
+            continue
+
+        with catalog.lock():
+            sync_catalog(props, catalog)
+            updated = [
+                asset_descs.update(slug, PreviewHash=preview_hash)
+                for slug, preview_hash in hashes.items() if slug in asset_descs]
+            catalog.update_many(asset_type, updated)
+        hashed += len(updated)
+    return hashed
+
+
+class MT_OT_AM_Find_Similar(Operator):
+    """Show assets with preview images similar to this asset's in the asset bar."""
+
+    bl_idname = "scene.mt_am_find_similar"
+    bl_label = "Find Similar"
+    bl_description = "Show assets that look similar to this one"
+
+    max_distance: IntProperty(
+        name="Max Difference",
+        description="Number of the 64 bits of the preview hashes that can differ",
+        default=SIMILAR_DISTANCE,
+        min=0,
+        max=64
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.mt_am_props.current_asset_desc is not None
+
+    def execute(self, context):
+        props = context.scene.mt_am_props
+        asset_desc = props.current_asset_desc
+        similar = find_similar(asset_desc, self.max_distance)
+        if not similar:
+            self.report({'WARNING'}, "No preview image to compare for " + asset_desc['Name'])
+            return {'CANCELLED'}
+
+        set_similar_assets("Similar to " + asset_desc['Name'], similar)
+        # search results would be shown instead
+        props.search_text = ""
+        bpy.ops.view3d.mt_asset_bar('INVOKE_DEFAULT', category_slug=SIMILAR_SLUG)
+        self.report({'INFO'}, "%d similar assets" % (len(similar) - 1))
+        return {'FINISHED'}
+
+
+class MT_OT_AM_Hash_Preview_Images(Operator):
+    """Hash the preview images of assets saved before similar assets could be found."""
+
+    bl_idname = "scene.mt_am_hash_preview_images"
+    bl_label = "Hash Preview Images"
+    bl_description = "Hash the preview images of older assets so similar assets can be found"
+
+    def execute(self, context):
+        hashed = hash_preview_images(context.scene.mt_am_props)
+        self.report({'INFO'}, "Hashed %d preview images" % hashed)
+        return {'FINISHED'}
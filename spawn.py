@@ -2,6 +2,7 @@ import bpy
 from .raycast import mouse_raycast, floor_raycast
 from .utils import find_vertex_group_of_face, assign_mat_to_vert_group
 from .append import append_collection, append_material, append_object
+from .usage import record_asset_use
 
 def spawn_object(context, asset, x, y):
     """Spawn an object at the cursor based on the passed in asset description.
@@ -41,6 +42,8 @@ def spawn_object(context, asset, x, y):
     # push an undo action to the stack
     bpy.ops.ed.undo_push()
 
+    record_asset_use(context, asset)
+
     return obj
 
 
@@ -87,6 +90,8 @@ def spawn_collection(context, asset, x, y):
     # push an undo action to the stack
     bpy.ops.ed.undo_push()
 
+    record_asset_use(context, asset)
+
     return collection
 
 def spawn_material(context, asset, x, y):
@@ -140,4 +145,5 @@ def spawn_material(context, asset, x, y):
 
         # push an undo action to the stack
         bpy.ops.ed.undo_push()
+        record_asset_use(context, asset)
     return mat
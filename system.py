@@ -17,6 +17,7 @@
 # ##### END GPL LICENSE BLOCK #####
 
 import os
+import subprocess
 import bpy
 
 
@@ -39,4 +40,21 @@ def get_addon_path():
 
 def get_addon_name():
     """return file path name of calling file."""
-    return os.path.basename(get_addon_path())
\ No newline at end of file
+    return os.path.basename(get_addon_path())
+
+def run_cli_in_background(args, log_path):
+    """Run an asset manager command line command in a background Blender process and wait for it.
+
+    Args:
+        args (list[str]): command and its arguments, see cli.py
+        log_path (str): file the output of the process is written to
+
+    Returns:
+        int: process return code
+    """
+    cli_script = os.path.join(get_addon_path(), "scripts", "mt_am_cli.py")
+    with open(log_path, "w") as log_file:
+        return subprocess.run(
+            [bpy.app.binary_path, '-b', '--python', cli_script, '--'] + list(args),
+            stdout=log_file,
+            stderr=subprocess.STDOUT).returncode
@@ -314,6 +314,8 @@ class MT_AM_Edit_Asset_Menu(bpy.types.Menu):
         # layout.operator("object.mt_copy_asset")
         layout.operator("object.mt_paste_asset")
         layout.operator("object.delete_selected_assets_from_library")
+        layout.operator("object.mt_am_update_instances")
+        layout.operator("scene.mt_am_find_similar")
 
         layout.separator()
 
@@ -0,0 +1,202 @@
+"""Contains the operator for updating the instances of an asset in the open file to the library version.
+
+Instances are found by the custom properties append.py tags spawned datablocks
+with. The asset's .blend file is loaded once and its mesh and material data is
+swapped onto every instance, so instances keep their transforms, parents and
+modifiers and the update is a single undo step.
+"""
+import os
+import re
+import bpy
+from bpy.types import Operator
+from bpy.props import BoolProperty
+from .append import get_datablock_asset, tag_datablock, FILE_HASH_PROP
+from .utils import get_file_hash
+
+# the suffix Blender adds to the names of datablocks appended more than once
+NAME_SUFFIX = re.compile(r'\.\d{3}$')
+
+
+def get_instances(asset_desc, outdated_only=True):
+    """Return the datablocks in the open file that are instances of an asset.
+
+    Args:
+        asset_desc (AssetDescription): asset description
+        outdated_only (bool, optional): leave out instances of the current version of the asset file. Defaults to True.
+
+    Returns:
+        list[bpy.types.ID]: objects, collections or materials
+    """
+    asset_type = asset_desc['Type'].lower()
+    key = (asset_type, asset_desc['Slug'])
+    datablocks = getattr(bpy.data, asset_type)
+    file_hash = get_file_hash(asset_desc['FilePath']) if outdated_only else None
+    return [
+        datablock for datablock in datablocks
+        if get_datablock_asset(datablock) == key
+        and (file_hash is None or datablock.get(FILE_HASH_PROP) != file_hash)]
+
+
+def base_name(name):
+    """Return a datablock name without the numeric suffix Blender adds to duplicate names."""
+    return NAME_SUFFIX.sub('', name)
+
+
+def load_asset(asset_desc):
+    """Load the objects or material of an asset from its .blend file without linking them to a scene.
+
+    Args:
+        asset_desc (AssetDescription): asset description
+
+    Returns:
+        list[bpy.types.Object] or list[bpy.types.Material]: loaded datablocks, empty if the asset wasn't found
+    """
+    filepath = asset_desc['FilePath']
+    asset_type = asset_desc['Type'].lower()
+    if not os.path.isfile(filepath):
+        return []
+
+    with bpy.data.libraries.load(filepath) as (data_from, data_to):
+        if asset_desc['Slug'] not in getattr(data_from, asset_type):
+            return []
+        setattr(data_to, asset_type, [asset_desc['Slug']])
+
+    loaded = getattr(data_to, asset_type)[0]
+    if asset_type == 'objects':
+        return [loaded]
+    if asset_type == 'collections':
+        objects = list(loaded.all_objects)
+        bpy.data.collections.remove(loaded)
+        return objects
+    return [loaded]
+
+
+def swap_object_data(obj, new_obj):
+    """Give an object the mesh and object level materials of another.
+
+    Args:
+        obj (bpy.types.Object): instance to update
+        new_obj (bpy.types.Object): loaded object
+
+    Returns:
+        bool: whether the object was updated
+    """
+    if obj.type != new_obj.type or new_obj.data is None:
+        return False
+    # assigning the mesh resizes the object's material slots to the mesh's, which are
+    # the slots of new_obj, so every slot of new_obj has a slot here to copy it to
+    obj.data = new_obj.data
+    for slot, new_slot in zip(obj.material_slots, new_obj.material_slots):
+        # copy data links too so object materials of the old version don't cover the new ones
+        slot.link = new_slot.link
+        if new_slot.link == 'OBJECT':
+            slot.material = new_slot.material
+    return True
+
+
+def update_instances(asset_desc, instances):
+    """Update instances of an asset to the version in the asset's .blend file.
+
+    Object instances share the loaded mesh. The objects of collection
+    instances are matched to the loaded objects by name. Material instances
+    are replaced by the loaded material. Meshes and materials left without
+    users are removed. Instances none of whose data could be swapped, e.g.
+    collections whose objects have all been renamed, are skipped and keep
+    their tags so they are still found as outdated.
+
+    Args:
+        asset_desc (AssetDescription): asset description
+        instances (list[bpy.types.ID]): instances returned by get_instances
+
+    Returns:
+        tuple(int, int): number of instances updated and skipped, or None if the asset couldn't be loaded
+    """
+    asset_type = asset_desc['Type'].lower()
+    loaded = load_asset(asset_desc)
+    if not loaded:
+        return None
+
+    if asset_type == 'materials':
+        new_mat = loaded[0]
+        new_mat.name = asset_desc['Name']
+        for mat in instances:
+            mat.user_remap(new_mat)
+            bpy.data.materials.remove(mat)
+        tag_datablock(new_mat, asset_desc, asset_type)
+        return len(instances), 0
+
+    old_meshes = set()
+    updated = 0
+    if asset_type == 'objects':
+        for obj in instances:
+            old_mesh = obj.data
+            if swap_object_data(obj, loaded[0]):
+                old_meshes.add(old_mesh)
+                tag_datablock(obj, asset_desc, asset_type)
+                updated += 1
+    else:
+        new_objects = {base_name(obj.name): obj for obj in loaded}
+        for collection in instances:
+            swapped = 0
+            for obj in collection.all_objects:
+                new_obj = new_objects.get(base_name(obj.name))
+                old_mesh = obj.data
+                if new_obj is not None and swap_object_data(obj, new_obj):
+                    old_meshes.add(old_mesh)
+                    swapped += 1
+            if swapped:
+                tag_datablock(collection, asset_desc, asset_type)
+                updated += 1
+
+    # the loaded objects were only needed for their data
+    for obj in loaded:
+        bpy.data.objects.remove(obj)
+    old_mats = set()
+    for mesh in old_meshes:
+        if isinstance(mesh, bpy.types.Mesh) and mesh.users == 0:
+            old_mats.update(mat for mat in mesh.materials if mat is not None)
+            bpy.data.meshes.remove(mesh)
+    for mat in old_mats:
+        if mat.users == 0:
+            bpy.data.materials.remove(mat)
+    return updated, len(instances) - updated
+
+
+class MT_OT_AM_Update_Instances(Operator):
+    """Update every instance of an asset in this file to the version in the library."""
+
+    bl_idname = "object.mt_am_update_instances"
+    bl_label = "Update Instances"
+    bl_description = "Replace the mesh and material data of every instance of this asset in the file with the library version"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    include_current: BoolProperty(
+        name="Include Up To Date",
+        description="Also update instances spawned from the current version of the asset file",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.mt_am_props.current_asset_desc is not None
+
+    def execute(self, context):
+        asset_desc = context.scene.mt_am_props.current_asset_desc
+        instances = get_instances(asset_desc, outdated_only=not self.include_current)
+        if not instances:
+            self.report({'INFO'}, "No instances of " + asset_desc['Name'] + " need updating")
+            return {'CANCELLED'}
+
+        result = update_instances(asset_desc, instances)
+        if result is None:
+            self.report({'WARNING'}, "Could not load " + asset_desc['FilePath'])
+            return {'CANCELLED'}
+
+        updated, skipped = result
+        if skipped:
+            self.report(
+                {'WARNING'},
+                "Updated %d instances of %s, skipped %d with no matching objects" % (updated, asset_desc['Name'], skipped))
+        else:
+            self.report({'INFO'}, "Updated %d instances of %s" % (updated, asset_desc['Name']))
+        return {'FINISHED'} if updated else {'CANCELLED'}
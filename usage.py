@@ -0,0 +1,467 @@
+"""Contains the asset usage log and the Recent and Frequent virtual categories.
+
+Every time an asset is spawned a line recording its use is appended to a log in
+the data folder of the user library, so recording a use never rewrites the file.
+The log is replayed into a count and last used time per asset when it is first
+needed and lines appended by other Blender instances are read as they appear.
+Once the log holds many more lines than assets used it is compacted to one line
+per asset.
+
+The Recent and Frequent categories list the assets with the latest last used
+times and the highest counts. Their preview images are loaded once and stay in
+memory so they can be shown without reading from disk.
+
+The In This File category lists the assets with instances in the current scene.
+Spawned datablocks are tagged with the slug of their asset and an index of the
+tagged objects and collections in each scene is kept up to date from depsgraph
+updates, so only added, removed and edited objects are looked at.
+
+The Similar category isn't shown in the side bar. It lists the results of the
+last Find Similar, see similar.py.
+"""
+import os
+import json
+import time
+import heapq
+import bpy
+from bpy.app.handlers import persistent
+from .preferences import get_prefs
+from .catalog import get_asset_descs, CatalogLock, CatalogLockTimeout
+from .asset_list import set_use_counts
+from .append import get_datablock_asset
+
+USAGE_LOG_FILE = 'usage_log.jsonl'
+
+# the log is compacted when it has this many times more lines than assets used...
+COMPACT_FACTOR = 4
+
+# ...and at least this many lines
+MIN_COMPACT_LINES = 1000
+
+# number of assets in the Recent and Frequent categories
+QUICK_BAR_SIZE = 50
+
+# seconds to wait for another instance to finish writing the usage log. Spawning
+# an asset carries on without recording its use rather than wait longer
+USAGE_LOCK_TIMEOUT = 1.0
+
+RECENT_SLUG = ':recent'
+FREQUENT_SLUG = ':frequent'
+IN_FILE_SLUG = ':in_file'
+SIMILAR_SLUG = ':similar'
+
+VIRTUAL_CATEGORIES = [
+    {
+        "Name": "Recent",
+        "Slug": RECENT_SLUG,
+        "Parent": "",
+        "Contains": "ALL",
+        "Children": []},
+    {
+        "Name": "Frequent",
+        "Slug": FREQUENT_SLUG,
+        "Parent": "",
+        "Contains": "ALL",
+        "Children": []},
+    {
+        "Name": "In This File",
+        "Slug": IN_FILE_SLUG,
+        "Parent": "",
+        "Contains": "ALL",
+        "Children": []}]
+
+SIMILAR_CATEGORY = {
+    "Name": "Similar",
+    "Slug": SIMILAR_SLUG,
+    "Parent": "",
+    "Contains": "ALL",
+    "Children": []}
+
+# assets listed in the Similar category
+_similar_assets = []
+
+_usage_logs = {}
+
+# scene pointer: SceneAssetIndex
+_scene_indices = {}
+
+
+class UsageLog:
+    """Use counts and last used times of assets, backed by an append only log file."""
+
+    def __init__(self, path):
+        self.path = path
+        # a lock of its own, as the catalog lock can be held for a long time
+        self._lock = CatalogLock(path + '.lock', USAGE_LOCK_TIMEOUT)
+        self._usage = {}  # (asset_type, slug): [count, last used]
+        self._offset = 0  # bytes of the log file read so far
+        self._lines = 0  # lines in the log file
+
+    def refresh(self):
+        """Read lines appended to the log since it was last read.
+
+        The whole log is read again if another Blender instance has compacted it.
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size < self._offset:
+            self._usage = {}
+            self._offset = 0
+            self._lines = 0
+            self._counts_changed()
+        if size == self._offset:
+            return
+
+        with open(self.path, 'rb') as read_file:
+            read_file.seek(self._offset)
+            data = read_file.read(size - self._offset)
+        # leave a partly written last line to be read next time
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line.decode('utf-8'))
+                self._add(entry['Type'], entry['Slug'], entry['Count'], entry['Time'])
+            except (ValueError, KeyError):
+                continue
+            self._lines += 1
+        self._offset += end
+        if end:
+            self._counts_changed()
+
+    def _add(self, asset_type, slug, count, used_time):
+        usage = self._usage.get((asset_type, slug))
+        if usage is None:
+            self._usage[(asset_type, slug)] = [count, used_time]
+        else:
+            usage[0] += count
+            usage[1] = max(usage[1], used_time)
+
+    def _counts_changed(self):
+        """Give the MOST_USED order a snapshot of the counts, so it is sorted again when next listed."""
+        set_use_counts({key: usage[0] for key, usage in self._usage.items()})
+
+    def record(self, asset_type, slug):
+        """Record that an asset has been used.
+
+        Raises CatalogLockTimeout if another instance holds the log lock for longer
+        than USAGE_LOCK_TIMEOUT.
+
+        Args:
+            asset_type (ENUM in {'objects', 'collections', 'materials'}): asset type
+            slug (str): asset slug
+        """
+        used_time = time.time()
+        line = json.dumps({'Type': asset_type, 'Slug': slug, 'Count': 1, 'Time': used_time}) + '\n'
+
+        # hold the lock so compaction by another instance can't drop the line
+        with self._lock:
+            self.refresh()
+            with open(self.path, 'a') as write_file:
+                write_file.write(line)
+            self._add(asset_type, slug, 1, used_time)
+            self._offset += len(line.encode('utf-8'))
+            self._lines += 1
+            self._counts_changed()
+
+            if self._lines > max(MIN_COMPACT_LINES, COMPACT_FACTOR * len(self._usage)):
+                self.compact()
+
+    def compact(self):
+        """Rewrite the log with one line per asset. Call holding the log lock."""
+        tmp_file = self.path + '.tmp'
+        with open(tmp_file, 'w') as write_file:
+            for (asset_type, slug), (count, used_time) in self._usage.items():
+                write_file.write(json.dumps(
+                    {'Type': asset_type, 'Slug': slug, 'Count': count, 'Time': used_time}) + '\n')
+        os.replace(tmp_file, self.path)
+        self._offset = os.path.getsize(self.path)
+        self._lines = len(self._usage)
+
+    def count(self, asset_type, slug):
+        """Return the number of times an asset has been used."""
+        usage = self._usage.get((asset_type, slug))
+        return usage[0] if usage else 0
+
+    def most_recent(self, limit=QUICK_BAR_SIZE):
+        """Return the most recently used assets, most recent first.
+
+        Returns:
+            list[tuple(asset_type, slug)]: assets
+        """
+        return [key for key, usage in heapq.nlargest(limit, self._usage.items(), key=lambda item: item[1][1])]
+
+    def most_used(self, limit=QUICK_BAR_SIZE):
+        """Return the most used assets, most used first. Ties go to the most recently used.
+
+        Returns:
+            list[tuple(asset_type, slug)]: assets
+        """
+        return [key for key, usage in heapq.nlargest(limit, self._usage.items(), key=lambda item: item[1])]
+
+
+def get_object_assets(obj):
+    """Return the assets an object is an instance of or uses the materials of.
+
+    Args:
+        obj (bpy.types.Object): object
+
+    Returns:
+        tuple(tuple(asset_type, slug)): assets
+    """
+    assets = []
+    key = get_datablock_asset(obj)
+    if key is not None:
+        assets.append(key)
+    for slot in obj.material_slots:
+        if slot.material is not None:
+            key = get_datablock_asset(slot.material)
+            if key is not None and key not in assets:
+                assets.append(key)
+    return tuple(assets)
+
+
+def walk_collections(collection):
+    """Yield the child collections of a collection and all their children."""
+    for child in collection.children:
+        yield child
+        yield from walk_collections(child)
+
+
+class SceneAssetIndex:
+    """Number of instances of each library asset in a scene.
+
+    An object counts as one instance of the asset it was spawned from and of
+    each library material it uses. A collection counts as one instance of the
+    asset it was spawned from.
+    """
+
+    def __init__(self):
+        self.counts = {}  # (asset_type, slug): instances
+        self._objects = {}  # object pointer: assets
+        self._collections = {}  # collection pointer: assets
+
+    def _set(self, entries, pointer, assets):
+        """Replace the assets counted for an object or collection."""
+        counts = self.counts
+        for key in entries.pop(pointer, ()):
+            counts[key] -= 1
+            if not counts[key]:
+                del counts[key]
+        if assets is None:
+            return
+        entries[pointer] = assets
+        for key in assets:
+            counts[key] = counts.get(key, 0) + 1
+
+    def sync_objects(self, scene):
+        """Count objects added to and forget objects removed from the scene since the last sync."""
+        current = {obj.as_pointer(): obj for obj in scene.objects}
+        for pointer in [pointer for pointer in self._objects if pointer not in current]:
+            self._set(self._objects, pointer, None)
+        for pointer, obj in current.items():
+            if pointer not in self._objects:
+                self._set(self._objects, pointer, get_object_assets(obj))
+
+    def sync_collections(self, scene):
+        """Count the collections in the scene again. Scenes have few collections."""
+        for pointer in list(self._collections):
+            self._set(self._collections, pointer, None)
+        for collection in walk_collections(scene.collection):
+            key = get_datablock_asset(collection)
+            self._set(self._collections, collection.as_pointer(), (key,) if key else ())
+
+    def update(self, scene, depsgraph):
+        """Apply the changes in a depsgraph update.
+
+        Args:
+            scene (bpy.types.Scene): scene
+            depsgraph (bpy.types.Depsgraph): depsgraph
+        """
+        objects = []
+        meshes = set()
+        for update in depsgraph.updates:
+            datablock = update.id.original
+            if isinstance(datablock, bpy.types.Object):
+                objects.append(datablock)
+            elif isinstance(datablock, bpy.types.Mesh):
+                meshes.add(datablock.as_pointer())
+
+        # materials can be assigned to the mesh rather than the object
+        if meshes:
+            objects.extend(
+                obj for obj in scene.objects if obj.data is not None and obj.data.as_pointer() in meshes)
+        for obj in objects:
+            self._set(self._objects, obj.as_pointer(), get_object_assets(obj))
+
+        # deleted objects aren't in the updates
+        if len(self._objects) != len(scene.objects):
+            self.sync_objects(scene)
+        if depsgraph.id_type_updated('COLLECTION'):
+            self.sync_collections(scene)
+
+    def most_used(self):
+        """Return the assets with instances in the scene, most instances first.
+
+        Returns:
+            list[tuple(asset_type, slug)]: assets
+        """
+        return sorted(self.counts, key=lambda key: -self.counts[key])
+
+
+def get_scene_asset_index(scene):
+    """Return the asset index of a scene, building it the first time it is needed.
+
+    Args:
+        scene (bpy.types.Scene): scene
+
+    Returns:
+        SceneAssetIndex: index
+    """
+    index = _scene_indices.get(scene.as_pointer())
+    if index is None:
+        index = _scene_indices[scene.as_pointer()] = SceneAssetIndex()
+        index.sync_objects(scene)
+        index.sync_collections(scene)
+    return index
+
+
+@persistent
+def update_scene_asset_index(scene, depsgraph=None):
+    """Keep the asset index of a scene up to date. Scenes without an index are left alone."""
+    index = _scene_indices.get(scene.as_pointer())
+    if index is None:
+        return
+    if depsgraph is None:
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+    counts = dict(index.counts)
+    index.update(scene, depsgraph)
+
+    if index.counts != counts and hasattr(scene, 'mt_am_props'):
+        props = scene.mt_am_props
+        if props.active_category and props.active_category['Slug'] == IN_FILE_SLUG:
+            props.assets_updated = True
+
+
+@persistent
+def clear_scene_asset_indices(dummy):
+    """Forget the asset indices when a file is loaded or an undo step restores the scenes."""
+    _scene_indices.clear()
+
+
+def get_usage_log():
+    """Return the usage log of the user library with lines appended by other instances read.
+
+    Returns:
+        UsageLog: usage log
+    """
+    prefs = get_prefs()
+    path = os.path.join(
+        prefs.user_assets_path,
+        "data",
+        USAGE_LOG_FILE)
+    usage_log = _usage_logs.get(path)
+    if usage_log is None:
+        usage_log = _usage_logs[path] = UsageLog(path)
+    usage_log.refresh()
+    return usage_log
+
+
+def record_asset_use(context, asset_desc):
+    """Record that an asset has been spawned.
+
+    Args:
+        context (bpy.context): context
+        asset_desc (AssetDescription): asset description
+    """
+    asset_type = asset_desc['Type'].lower()
+    try:
+        get_usage_log().record(asset_type, asset_desc['Slug'])
+    except (OSError, CatalogLockTimeout) as err:
+        # the asset has already been spawned so don't fail the operator
+        print(" » Could not record asset use: " + str(err))
+        return
+
+    props = context.scene.mt_am_props
+    if props.active_category and props.active_category['Slug'] in (RECENT_SLUG, FREQUENT_SLUG):
+        props.assets_updated = True
+
+
+def is_virtual_category(cat_slug):
+    """Return whether a category slug is one of the VIRTUAL_CATEGORIES or the Similar category."""
+    return cat_slug in (RECENT_SLUG, FREQUENT_SLUG, IN_FILE_SLUG, SIMILAR_SLUG)
+
+
+def get_virtual_category(cat_slug):
+    """Return the virtual category with the slug, or None."""
+    for cat in VIRTUAL_CATEGORIES + [SIMILAR_CATEGORY]:
+        if cat['Slug'] == cat_slug:
+            return cat
+    return None
+
+
+def set_similar_assets(name, asset_keys):
+    """Set the assets listed in the Similar category.
+
+    Args:
+        name (str): category name shown in the side bar
+        asset_keys (list[tuple(asset_type, slug)]): assets
+    """
+    SIMILAR_CATEGORY['Name'] = name
+    _similar_assets[:] = asset_keys
+
+
+def get_used_asset_keys(cat_slug):
+    """Return the assets listed in a virtual category.
+
+    Returns:
+        list[tuple(asset_type, slug)]: assets
+    """
+    if cat_slug == IN_FILE_SLUG:
+        return get_scene_asset_index(bpy.context.scene).most_used()
+    if cat_slug == SIMILAR_SLUG:
+        return list(_similar_assets)
+    usage_log = get_usage_log()
+    if cat_slug == RECENT_SLUG:
+        return usage_log.most_recent()
+    return usage_log.most_used()
+
+
+def get_used_assets(props, cat_slug):
+    """Return the asset descriptions listed in a virtual category.
+
+    Assets that have been deleted since they were used are left out. Only the
+    listed assets are read from the catalog, so asset types that haven't been
+    loaded stay unloaded.
+
+    Args:
+        props (mt_am_props): asset manager props
+        cat_slug (str): slug of one of the VIRTUAL_CATEGORIES
+
+    Returns:
+        list[AssetDescription]: asset descriptions
+    """
+    return get_asset_descs(props, get_used_asset_keys(cat_slug))
+
+
+def preload_quick_bar_previews():
+    """Timer callback that loads the preview images of the Recent and Frequent assets.
+
+    Loaded images stay in memory so opening either category doesn't read from disk.
+    """
+    from .assets import append_preview_images
+
+    scene = bpy.context.scene
+    if scene is None or not hasattr(scene, 'mt_am_props'):
+        return None
+    props = scene.mt_am_props
+    for cat_slug in (RECENT_SLUG, FREQUENT_SLUG):
+        append_preview_images(get_used_assets(props, cat_slug))
+    return None
+
+
+bpy.app.handlers.depsgraph_update_post.append(update_scene_asset_index)
+bpy.app.handlers.load_post.append(clear_scene_asset_indices)
+bpy.app.handlers.undo_post.append(clear_scene_asset_indices)
+bpy.app.handlers.redo_post.append(clear_scene_asset_indices)
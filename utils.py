@@ -1,4 +1,6 @@
+import os
 import re
+import hashlib
 import bpy
 
 
@@ -150,13 +152,16 @@ def find_and_rename(slug, current_slugs):
     Parameters
     obj : bpy.types.ID
     slug : str
-    current_slugs : list of str
+    current_slugs : list or set of str
 
     Returns
     slug : str
     """
     if slug not in current_slugs:
-        current_slugs.append(slug)
+        if isinstance(current_slugs, set):
+            current_slugs.add(slug)
+        else:
+            current_slugs.append(slug)
         return slug
 
     match = re.search(r'\d+$', slug)
@@ -192,3 +197,38 @@ def tagify(tag_string):
         tags = [tag.strip() for tag in tags]
         tags = [tag.lower() for tag in tags]
     return tags
+
+
+# path: (mtime_ns, size, hash) of files hashed this session
+_file_hashes = {}
+
+
+def get_file_hash(path):
+    """Return the SHA1 hash of a file's contents, or None if it can't be read.
+
+    Hashes are cached by modification time and size so a file is only read
+    again after it has changed.
+
+    Args:
+        path (str): file path
+
+    Returns:
+        str: hex digest
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    cached = _file_hashes.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    file_hash = hashlib.sha1()
+    try:
+        with open(path, 'rb') as read_file:
+            for chunk in iter(lambda: read_file.read(1048576), b''):
+                file_hash.update(chunk)
+    except OSError:
+        return None
+    _file_hashes[path] = (stat.st_mtime_ns, stat.st_size, file_hash.hexdigest())
+    return _file_hashes[path][2]